@@ -1,4 +1,8 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ConsultorioApiConfig(AppConfig):
@@ -8,3 +12,28 @@ class ConsultorioApiConfig(AppConfig):
     def ready(self):
         """Import application signals at startup."""
         import consultorio_API.signals  # noqa: F401
+
+        self._iniciar_barrido_citas()
+
+    def _iniciar_barrido_citas(self):
+        """
+        Start the overdue-cita sweeper only where it is wanted: the serving
+        process of ``runserver``, or any process that opts in with
+        ``CITAS_VENCIDAS_EN_PROCESO`` (e.g. a single WSGI worker). Shells,
+        scripts and other commands never start it.
+        """
+        intervalo = getattr(settings, "CITAS_VENCIDAS_INTERVALO", 0)
+        if not intervalo:
+            return
+        if not (getattr(settings, "CITAS_VENCIDAS_EN_PROCESO", False) or self._es_runserver()):
+            return
+
+        from .citas_vencidas import iniciar_barrido_periodico
+        iniciar_barrido_periodico(intervalo)
+
+    @staticmethod
+    def _es_runserver():
+        if len(sys.argv) < 2 or sys.argv[1] != "runserver":
+            return False
+        # Under the autoreloader only the child process (RUN_MAIN) serves requests.
+        return "--noreload" in sys.argv or os.environ.get("RUN_MAIN") == "true"
@@ -3,6 +3,7 @@ from django.dispatch import receiver
 from django.apps import apps
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from .auditoria_utils import registrar, registrar_login, registrar_logout
+from .auditoria_eventos import anotar
 import threading
 
 # Thread local para almacenar el request actual
@@ -84,7 +85,7 @@ def audit_post_save(sender, instance, created, **kwargs):
     accion = f'crear_{sender.__name__.lower()}' if created else f'editar_{sender.__name__.lower()}'
     descripcion = f"{'Creó' if created else 'Editó'} {sender.__name__}: {str(instance)}"
     
-    registrar(usuario, accion, instance, descripcion, request)
+    anotar(usuario, accion, instance, descripcion, request)
 
 # --- eliminaciones ---
 @receiver(pre_delete)
@@ -106,4 +107,4 @@ def audit_pre_delete(sender, instance, using, **kwargs):
     
     if usuario:
         descripcion = f"Eliminó {sender.__name__}: {str(instance)}"
-        registrar(usuario, f'eliminar_{sender.__name__.lower()}', instance, descripcion, request)
+        anotar(usuario, f'eliminar_{sender.__name__.lower()}', instance, descripcion, request)
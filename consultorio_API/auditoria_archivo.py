@@ -0,0 +1,149 @@
+# consultorio_API/auditoria_archivo.py
+# -*- coding: utf-8 -*-
+"""
+Archivo mensual de la auditoría antigua.
+
+:func:`archivar` mueve los registros de ``Auditoria`` anteriores a una fecha
+a archivos ``auditoria-AAAA-MM.jsonl.gz`` (uno por mes, una fila JSON por
+línea) y los borra de la tabla. Cada lote se escribe y se sincroniza en disco
+antes de borrarse: si el proceso se interrumpe, a lo sumo quedan filas
+repetidas en el archivo, nunca perdidas.
+
+:func:`buscar` recorre sólo los archivos de los meses pedidos y filtra línea
+a línea, sin cargarlos completos en memoria.
+
+Se usa con ``manage.py archivar_auditoria`` y ``manage.py buscar_auditoria``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from . import auditoria_estadisticas
+from .models import Auditoria
+
+CAMPOS = (
+    "id", "fecha", "usuario_id", "usuario__username", "accion", "descripcion",
+    "ip_address", "user_agent", "content_type__app_label", "content_type__model",
+    "object_id", "cambios",
+)
+
+
+def directorio_por_defecto() -> Path:
+    return Path(getattr(settings, "AUDITORIA_ARCHIVO_DIR",
+                        os.path.join(settings.BASE_DIR, "archivo_auditoria")))
+
+
+def _local(dt: datetime) -> datetime:
+    return timezone.localtime(dt).replace(tzinfo=None) if timezone.is_aware(dt) else dt
+
+
+def _archivo(directorio: Path, mes: date) -> Path:
+    return directorio / f"auditoria-{mes:%Y-%m}.jsonl.gz"
+
+
+def limite_meses(meses: int, ahora: Optional[datetime] = None) -> datetime:
+    """Inicio del mes de hace ``meses`` meses: se archivan meses completos."""
+    ahora = ahora or timezone.now()
+    total = ahora.year * 12 + ahora.month - 1 - meses
+    inicio = datetime(total // 12, total % 12 + 1, 1)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+# ───────────────────────── Archivar ─────────────────────────
+def _escribir(directorio: Path, filas) -> None:
+    por_mes = {}
+    for fila in filas:
+        por_mes.setdefault(_local(fila["fecha"]).date().replace(day=1), []).append(fila)
+
+    for mes, del_mes in por_mes.items():
+        # "ab" añade un miembro gzip nuevo; gzip.open lee todos seguidos
+        with open(_archivo(directorio, mes), "ab") as crudo:
+            with gzip.GzipFile(fileobj=crudo, mode="ab") as salida:
+                for fila in del_mes:
+                    linea = json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False)
+                    salida.write(linea.encode("utf-8") + b"\n")
+            crudo.flush()
+            os.fsync(crudo.fileno())
+
+
+def archivar(antes_de: datetime, directorio: Optional[Path] = None,
+             batch_size: int = 1000) -> int:
+    """Archiva y borra los registros con ``fecha < antes_de``; devuelve cuántos."""
+    directorio = Path(directorio or directorio_por_defecto())
+    directorio.mkdir(parents=True, exist_ok=True)
+    viejos = Auditoria.objects.filter(fecha__lt=antes_de).order_by("fecha", "id")
+
+    total = 0
+    while True:
+        filas = list(viejos.values(*CAMPOS)[:batch_size])
+        if not filas:
+            if total:
+                auditoria_estadisticas.invalidar()
+            return total
+        _escribir(directorio, filas)
+        with transaction.atomic():
+            Auditoria.objects.filter(pk__in=[f["id"] for f in filas]).delete()
+        total += len(filas)
+
+
+# ───────────────────────── Buscar ─────────────────────────
+def _meses(directorio: Path, desde: Optional[date], hasta: Optional[date]):
+    for ruta in sorted(directorio.glob("auditoria-*.jsonl.gz")):
+        mes = datetime.strptime(ruta.name[len("auditoria-"):-len(".jsonl.gz")], "%Y-%m").date()
+        if desde and mes < desde.replace(day=1):
+            continue
+        if hasta and mes > hasta:
+            continue
+        yield ruta
+
+
+def buscar(directorio: Optional[Path] = None, desde: Optional[date] = None,
+           hasta: Optional[date] = None, usuario: Optional[str] = None,
+           accion: Optional[str] = None, modelo: Optional[str] = None,
+           object_id: Optional[str] = None, texto: Optional[str] = None) -> Iterator[dict]:
+    """
+    Registros archivados que cumplen todos los filtros, en orden cronológico.
+
+    ``usuario`` es el username, ``accion`` y ``texto`` buscan subcadenas (sin
+    distinguir mayúsculas) en la acción y la descripción.
+    """
+    directorio = Path(directorio or directorio_por_defecto())
+    if not directorio.is_dir():
+        return
+    inicio = datetime.combine(desde, time.min) if desde else None
+    fin = datetime.combine(hasta, time.max) if hasta else None
+    accion = accion.lower() if accion else None
+    texto = texto.lower() if texto else None
+
+    for ruta in _meses(directorio, desde, hasta):
+        with gzip.open(ruta, "rt", encoding="utf-8") as entrada:
+            for linea in entrada:
+                fila = json.loads(linea)
+                fecha = _local(datetime.fromisoformat(fila["fecha"]))
+                if inicio and fecha < inicio or fin and fecha > fin:
+                    continue
+                if usuario and fila["usuario__username"] != usuario:
+                    continue
+                if accion and accion not in fila["accion"].lower():
+                    continue
+                if modelo and fila["content_type__model"] != modelo:
+                    continue
+                if object_id and fila["object_id"] != str(object_id):
+                    continue
+                if texto and texto not in (fila["descripcion"] or "").lower():
+                    continue
+                yield fila
+
+
+__all__ = ["archivar", "buscar", "directorio_por_defecto", "limite_meses"]
@@ -0,0 +1,157 @@
+# consultorio_API/auditoria_cola.py
+# -*- coding: utf-8 -*-
+"""
+Escritura diferida de registros de :class:`~consultorio_API.models.Auditoria`.
+
+``auditoria_utils.registrar`` ya no inserta dentro de la petición: arma la
+fila y la entrega a :func:`encolar`. Si ``AUDITORIA_ASINCRONA`` está activo,
+la fila entra (al confirmar la transacción) en una cola acotada del proceso y
+un hilo en segundo plano la inserta junto con las demás con ``bulk_create``
+cada ``AUDITORIA_INTERVALO`` segundos o en cuanto se juntan
+``AUDITORIA_LOTE`` filas. Sin él (tests, comandos) se guarda en el acto, como
+antes.
+
+``bulk_create`` no emite ``post_save``: las acciones que notifican a los
+administradores (``NotificationManager.ACCIONES_CRITICAS``) se guardan una a
+una para conservar esa notificación. Si la cola se llena, quien registra
+escribe su fila directamente; al salir el proceso se vacía lo pendiente.
+Si un lote falla, se reintenta fila por fila y sólo se descarta la que falla.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Auditoria
+from .notifications import NotificationManager
+
+logger = logging.getLogger(__name__)
+
+# Filas pendientes antes de que quien registra escriba por su cuenta
+MAX_PENDIENTES = 5000
+
+_cola: "queue.Queue[Auditoria]" = queue.Queue(maxsize=MAX_PENDIENTES)
+_lock = threading.Lock()
+_lock_hilo = threading.Lock()
+_hilo: Optional[threading.Thread] = None
+_despertar = threading.Event()
+
+
+def _asincrona() -> bool:
+    return getattr(settings, "AUDITORIA_ASINCRONA", False)
+
+
+def _lote() -> int:
+    return getattr(settings, "AUDITORIA_LOTE", 200)
+
+
+def _intervalo() -> float:
+    return getattr(settings, "AUDITORIA_INTERVALO", 2.0)
+
+
+def _guardar(entradas: List[Auditoria]) -> None:
+    masivas = []
+    for entrada in entradas:
+        if entrada.accion in NotificationManager.ACCIONES_CRITICAS:
+            entrada.save()  # dispara la notificación a administradores
+        else:
+            masivas.append(entrada)
+    if masivas:
+        Auditoria.objects.bulk_create(masivas, batch_size=_lote())
+
+
+def _guardar_uno_a_uno(entradas: List[Auditoria]) -> int:
+    """Reintenta un lote fallido fila por fila; sólo se pierde la fila que falla."""
+    guardadas = 0
+    for entrada in entradas:
+        if entrada.pk is not None:
+            guardadas += 1  # crítica ya guardada antes del fallo
+            continue
+        try:
+            with transaction.atomic():
+                entrada.save()
+            guardadas += 1
+        except Exception:
+            logger.exception(
+                "Se descarta un registro de auditoría (%s, usuario %s)",
+                entrada.accion, entrada.usuario_id,
+            )
+    return guardadas
+
+
+def vaciar() -> int:
+    """Escribe todo lo pendiente en la cola; devuelve cuántas filas escribió."""
+    total = 0
+    with _lock:
+        while True:
+            entradas = []
+            try:
+                while len(entradas) < _lote():
+                    entradas.append(_cola.get_nowait())
+            except queue.Empty:
+                pass
+            if not entradas:
+                return total
+            try:
+                _guardar(entradas)
+                total += len(entradas)
+            except Exception:
+                logger.exception(
+                    "Falló el lote de %s registros de auditoría; se escriben uno a uno",
+                    len(entradas),
+                )
+                total += _guardar_uno_a_uno(entradas)
+
+
+def _ciclo() -> None:
+    while True:
+        _despertar.wait(_intervalo())
+        _despertar.clear()
+        try:
+            vaciar()
+        finally:
+            close_old_connections()
+
+
+def _iniciar_hilo() -> None:
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    with _lock_hilo:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_ciclo, name="auditoria-escritor", daemon=True)
+            _hilo.start()
+
+
+def _poner(entrada: Auditoria) -> None:
+    try:
+        _cola.put_nowait(entrada)
+    except queue.Full:
+        # Contrapresión: mejor una petición más lenta que perder la auditoría
+        _guardar([entrada])
+        return
+    _iniciar_hilo()
+    if _cola.qsize() >= _lote():
+        _despertar.set()
+
+
+def encolar(entrada: Auditoria) -> None:
+    """Registra ``entrada`` (sin guardar) según el modo configurado."""
+    if not _asincrona():
+        _guardar([entrada])
+        return
+    # Sólo se audita lo que llega a confirmarse
+    transaction.on_commit(lambda: _poner(entrada))
+
+
+atexit.register(vaciar)
+
+
+__all__ = ["MAX_PENDIENTES", "encolar", "vaciar"]
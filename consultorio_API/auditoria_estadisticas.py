@@ -0,0 +1,126 @@
+# consultorio_API/auditoria_estadisticas.py
+# -*- coding: utf-8 -*-
+"""
+Resumen de estadísticas del panel de auditoría.
+
+El panel mostraba totales, rankings y la actividad de la semana recalculando
+todo sobre la tabla completa en cada página (y en cada refresco automático).
+:func:`obtener` entrega un resumen guardado en la caché que se recalcula como
+mucho cada ``AUDITORIA_ESTADISTICAS_TTL`` segundos:
+
+* total y registros de hoy en un solo ``aggregate``;
+* un ``GROUP BY`` por usuario y otro por modelo, que sirven a la vez para el
+  top 10 y para las listas de filtro (sin ``DISTINCT`` aparte);
+* los últimos 7 días en un único ``GROUP BY`` por fecha.
+
+:func:`invalidar` descarta el resumen (p. ej. tras archivar auditoría).
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import cache_consultorio
+from .models import Auditoria, Usuario
+
+CLAVE = f"{cache_consultorio.PREFIJO}:auditoria:estadisticas"
+TOP = 10
+DIAS = 7
+
+
+def _ttl() -> int:
+    return getattr(settings, "AUDITORIA_ESTADISTICAS_TTL", 60)
+
+
+def _hoy() -> date:
+    return timezone.localdate() if settings.USE_TZ else timezone.now().date()
+
+
+def _inicio(dia: date) -> datetime:
+    inicio = datetime.combine(dia, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def _top(filas):
+    return sorted(filas, key=lambda f: -f["total"])[:TOP]
+
+
+def calcular(hoy: Optional[date] = None) -> dict:
+    """Calcula el resumen completo contra la tabla (sin caché)."""
+    hoy = hoy or _hoy()
+    registros = Auditoria.objects.order_by()
+
+    totales = registros.aggregate(
+        total=Count("id"),
+        hoy=Count("id", filter=Q(fecha__gte=_inicio(hoy))),
+    )
+
+    por_usuario = list(
+        registros.values("usuario_id", "usuario__first_name",
+                         "usuario__last_name", "usuario__username")
+        .annotate(total=Count("id"))
+    )
+    por_modelo = list(
+        registros.values("content_type_id", "content_type__model")
+        .annotate(total=Count("id"))
+    )
+    acciones = list(
+        registros.values("accion").annotate(total=Count("id")).order_by("-total")[:TOP]
+    )
+    ips = list(
+        registros.exclude(ip_address__isnull=True)
+        .values("ip_address").annotate(total=Count("id")).order_by("-total")[:TOP]
+    )
+
+    # Los 7 días previos a hoy, en una sola consulta
+    primero = hoy - timedelta(days=DIAS)
+    por_dia = dict(
+        registros.filter(fecha__gte=_inicio(primero), fecha__lt=_inicio(hoy))
+        .annotate(dia=TruncDate("fecha"))
+        .values("dia").annotate(total=Count("id"))
+        .values_list("dia", "total")
+    )
+    actividad = [
+        {"fecha": dia, "count": por_dia.get(dia, 0)}
+        for dia in (primero + timedelta(days=i) for i in range(DIAS))
+    ]
+
+    ids_usuarios = [f["usuario_id"] for f in por_usuario if f["usuario_id"]]
+    ids_modelos = [f["content_type_id"] for f in por_modelo]
+
+    return {
+        "stats": {
+            "total_registros": totales["total"],
+            "registros_hoy": totales["hoy"],
+            "usuarios_activos": _top(por_usuario),
+            "acciones_comunes": acciones,
+            "modelos_modificados": _top(por_modelo),
+            "ips_activas": ips,
+            "actividad_diaria": actividad,
+        },
+        "usuarios_filtro": list(
+            Usuario.objects.filter(id__in=ids_usuarios).order_by("first_name", "last_name")
+        ),
+        "modelos_filtro": list(
+            ContentType.objects.filter(id__in=ids_modelos).order_by("model")
+        ),
+    }
+
+
+def obtener() -> dict:
+    """Resumen vigente; se recalcula cuando expira en la caché."""
+    return cache_consultorio.obtener_o_calcular(CLAVE, calcular, timeout=_ttl())
+
+
+def invalidar() -> None:
+    cache_consultorio.obtener_cache().delete(CLAVE)
+
+
+__all__ = ["calcular", "invalidar", "obtener"]
@@ -0,0 +1,191 @@
+# consultorio_API/auditoria_eventos.py
+# -*- coding: utf-8 -*-
+"""
+Despacho único de auditoría por objeto.
+
+Un mismo guardado de ``Cita`` dispara varias señales que quieren auditar
+(el ``post_save`` genérico de ``audit_generic``, la creación, el cambio de
+estado, la asignación de médico…). En lugar de escribir una fila cada una,
+las señales llaman a :func:`anotar` y las anotaciones sobre el mismo objeto
+se fusionan en un solo :class:`EventoAuditoria`: la acción más relevante, las
+descripciones sin repetir y un diff estructurado ``{campo: [antes, después]}``
+que se guarda en ``Auditoria.cambios``.
+
+Las anotaciones hechas dentro de una transacción se entregan al confirmarla
+(si se revierte, se descartan). Dentro de una petición (``AuditMiddleware``)
+se acumulan hasta el final de la respuesta; fuera de ambas se escriben en el
+acto. La escritura final la hace ``auditoria_utils.registrar``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+Clave = Tuple[str, str]
+
+
+def _prioridad(accion: str) -> int:
+    """Cuál acción da nombre al registro cuando se fusionan varias."""
+    accion = accion.lower()
+    if accion.startswith("eliminar"):
+        return 5
+    if accion.startswith("crear"):
+        return 4
+    if accion.startswith("cancelar"):
+        return 3
+    if accion.startswith("editar"):
+        return 1
+    return 2  # cambiar_estado_cita, asignar_medico_cita, iniciar_consulta…
+
+
+@dataclass
+class EventoAuditoria:
+    usuario: Any
+    accion: str
+    objeto: Any
+    descripciones: List[str] = field(default_factory=list)
+    campos: Dict[str, list] = field(default_factory=dict)
+    acciones: List[str] = field(default_factory=list)
+    request: Any = None
+    object_id: Optional[str] = None  # el pk se pierde al borrar el objeto
+
+    def fusionar(self, otro: "EventoAuditoria") -> None:
+        if _prioridad(otro.accion) > _prioridad(self.accion):
+            self.accion = otro.accion
+            self.usuario = otro.usuario or self.usuario
+        self.usuario = self.usuario or otro.usuario
+        self.request = self.request or otro.request
+        for accion in otro.acciones:
+            if accion not in self.acciones:
+                self.acciones.append(accion)
+        for texto in otro.descripciones:
+            if texto not in self.descripciones:
+                self.descripciones.append(texto)
+        for campo, (antes, despues) in otro.campos.items():
+            if campo in self.campos:
+                self.campos[campo][1] = despues  # se conserva el valor original
+            else:
+                self.campos[campo] = [antes, despues]
+
+    @property
+    def descripcion(self) -> str:
+        return "; ".join(self.descripciones)
+
+    @property
+    def cambios(self) -> dict:
+        campos = {c: v for c, v in self.campos.items() if v[0] != v[1]}
+        return {"acciones": self.acciones, "campos": campos}
+
+
+def _clave(evento: EventoAuditoria) -> Clave:
+    return (evento.objeto._meta.label_lower, evento.object_id)
+
+
+def _agregar(pendientes: Dict[Clave, EventoAuditoria], evento: EventoAuditoria) -> None:
+    clave = _clave(evento)
+    if clave in pendientes:
+        pendientes[clave].fusionar(evento)
+    else:
+        pendientes[clave] = evento
+
+
+def _emitir(eventos: Iterable[EventoAuditoria]) -> None:
+    from .auditoria_utils import registrar
+
+    for evento in eventos:
+        if not evento.usuario:
+            continue
+        try:
+            registrar(
+                evento.usuario, evento.accion, evento.objeto,
+                evento.descripcion, evento.request,
+                cambios=evento.cambios, object_id=evento.object_id,
+            )
+        except Exception:
+            logger.exception("No se pudo registrar la auditoría de %s", evento.accion)
+
+
+# ───────────────────────── Ámbitos ─────────────────────────
+def _entregar(pendientes: Dict[Clave, EventoAuditoria]) -> None:
+    peticion = getattr(_local, "peticion", None)
+    if peticion is None:
+        _emitir(pendientes.values())
+        return
+    for evento in pendientes.values():
+        _agregar(peticion, evento)
+
+
+def _pendientes_transaccion() -> Dict[Clave, EventoAuditoria]:
+    """
+    Buffer de la transacción en curso. Sigue vigente mientras su callback
+    ``on_commit`` siga registrado: Django lo descarta si se revierte la
+    transacción (o el savepoint en que se registró).
+    """
+    conexion = transaction.get_connection()
+    actual = getattr(_local, "transaccion", None)
+    if actual is not None and any(f is actual[0] for _, f, *_ in conexion.run_on_commit):
+        return actual[1]
+
+    pendientes: Dict[Clave, EventoAuditoria] = {}
+
+    def _confirmada():
+        if getattr(_local, "transaccion", None) is registro:
+            _local.transaccion = None
+        _entregar(pendientes)
+
+    registro = (_confirmada, pendientes)
+    _local.transaccion = registro
+    transaction.on_commit(_confirmada)
+    return pendientes
+
+
+def abrir_peticion() -> None:
+    _local.peticion = {}
+    _local.transaccion = None
+
+
+def cerrar_peticion() -> None:
+    """Escribe lo acumulado durante la petición."""
+    pendientes = getattr(_local, "peticion", None)
+    _local.peticion = None
+    if pendientes:
+        _emitir(pendientes.values())
+
+
+# ───────────────────────── API ─────────────────────────
+def anotar(usuario, accion: str, objeto, descripcion: str = "", request=None,
+           campos: Optional[Dict[str, list]] = None) -> None:
+    """Anota una acción sobre ``objeto``; se fusiona con las demás del mismo objeto."""
+    evento = EventoAuditoria(
+        usuario=usuario,
+        accion=accion,
+        objeto=objeto,
+        descripciones=[descripcion] if descripcion else [],
+        campos={c: list(v) for c, v in (campos or {}).items()},
+        acciones=[accion],
+        request=request,
+        object_id=str(objeto.pk),
+    )
+    if transaction.get_connection().in_atomic_block:
+        _agregar(_pendientes_transaccion(), evento)
+    elif getattr(_local, "peticion", None) is not None:
+        _agregar(_local.peticion, evento)
+    else:
+        _emitir([evento])
+
+
+__all__ = [
+    "EventoAuditoria",
+    "abrir_peticion",
+    "anotar",
+    "cerrar_peticion",
+]
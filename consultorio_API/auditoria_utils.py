@@ -1,5 +1,6 @@
 from django.contrib.contenttypes.models import ContentType
 from .models import Auditoria
+from .auditoria_cola import encolar
 
 def get_client_ip(request):
     """Obtiene la IP real del cliente"""
@@ -10,7 +11,8 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
-def registrar(usuario, accion, objeto, descripcion="", request=None):
+def registrar(usuario, accion, objeto, descripcion="", request=None,
+              cambios=None, object_id=None):
     """
     Crea un registro en Auditoria con información completa.
     - usuario:     instancia Usuario que ejecuta la acción
@@ -18,6 +20,11 @@ def registrar(usuario, accion, objeto, descripcion="", request=None):
     - objeto:      instancia sobre la que se actúa
     - descripcion: texto opcional
     - request:     objeto request para capturar IP y user agent
+    - cambios:     diff estructurado (ver ``auditoria_eventos``)
+    - object_id:   pk del objeto si ya no lo tiene (objeto eliminado)
+
+    La escritura la hace ``auditoria_cola``: en diferido y por lotes si
+    ``AUDITORIA_ASINCRONA`` está activo, en el acto si no.
     """
     ip_address = None
     user_agent = ""
@@ -26,15 +33,16 @@ def registrar(usuario, accion, objeto, descripcion="", request=None):
         ip_address = get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
     
-    Auditoria.objects.create(
+    encolar(Auditoria(
         usuario=usuario,
         accion=accion,
         descripcion=descripcion[:500],   # por si te pasas
         ip_address=ip_address,
         user_agent=user_agent,
         content_type=ContentType.objects.get_for_model(objeto),
-        object_id=objeto.pk,
-    )
+        object_id=objeto.pk if object_id is None else object_id,
+        cambios=cambios or {},
+    ))
 
 def registrar_login(usuario, request, exitoso=True):
     """Registra intentos de login"""
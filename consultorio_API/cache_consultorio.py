@@ -0,0 +1,211 @@
+# consultorio_API/cache_consultorio.py
+# -*- coding: utf-8 -*-
+"""
+Caché de los endpoints de dashboard y cola con invalidación por consultorio.
+
+Cada entrada depende de uno o más *ámbitos* (``consultorio:<id>``,
+``medico:<id>``, ``consultas_espera`` o ``global``). Cada ámbito tiene un
+número de generación y la clave de la entrada lo incluye, así que invalidar
+un ámbito es sólo incrementar su generación: las entradas viejas dejan de
+encontrarse y expiran solas. Funciona igual con LocMem, archivos, Memcached
+o Redis porque no requiere enumerar claves.
+
+Las generaciones viven en su propio alias (``CONSULTORIO_CACHE_GENERACIONES_ALIAS``)
+para que el descarte por ``MAX_ENTRIES`` de las respuestas no las borre, y
+empiezan en un valor aleatorio: si aun así se pierde una, la nueva no vuelve
+a dar por válidas las entradas viejas.
+
+``global`` es el ámbito de los datos de todo el sistema (vistas de
+administrador): sólo se incrementa cuando quien invalida lo pide.
+
+Las señales de ``signals.py`` llaman a :func:`invalidar_cita` y
+:func:`invalidar_consulta` cuando se guarda o elimina una cita o consulta;
+la invalidación se aplica al confirmar la transacción.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import secrets
+from datetime import date
+from typing import Any, Callable, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+PREFIJO = "consultorio"
+GLOBAL = "global"
+# Consultas en espera de todos los consultorios (cola virtual)
+CONSULTAS_ESPERA = "consultas_espera"
+
+
+def _alias() -> str:
+    return getattr(settings, "CONSULTORIO_CACHE_ALIAS", "default")
+
+
+def obtener_cache():
+    """Caché de la aplicación (alias ``CONSULTORIO_CACHE_ALIAS``)."""
+    return caches[_alias()]
+
+
+def incr_atomico(cache) -> bool:
+    """
+    ¿``cache.incr`` es atómico entre procesos? Redis y Memcached sí; archivos y
+    BD hacen get + set (dos workers a la vez pierden un incremento). LocMem
+    lo es dentro de su proceso, que es todo lo que comparte.
+    """
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.core.cache.backends.memcached import BaseMemcachedCache
+    from django.core.cache.backends.redis import RedisCache
+
+    return isinstance(cache, (RedisCache, BaseMemcachedCache, LocMemCache))
+
+
+def _cache_generaciones():
+    return caches[getattr(settings, "CONSULTORIO_CACHE_GENERACIONES_ALIAS", _alias())]
+
+
+def _semilla() -> int:
+    return secrets.randbits(48)
+
+
+def _timeout() -> int:
+    return getattr(settings, "CONSULTORIO_CACHE_TIMEOUT", 300)
+
+
+# ───────────────────────── Ámbitos ─────────────────────────
+def ambito_consultorio(consultorio_id) -> str:
+    return f"consultorio:{consultorio_id}"
+
+
+def ambito_medico(medico_id) -> str:
+    return f"medico:{medico_id}"
+
+
+def ambitos_usuario(user) -> List[str]:
+    """Ámbitos de los que dependen los datos que ve ``user`` según su rol."""
+    if user.rol == "admin":
+        return [GLOBAL]
+    ambitos = []
+    if user.consultorio_id:
+        ambitos.append(ambito_consultorio(user.consultorio_id))
+    if user.rol == "medico":
+        ambitos.append(ambito_medico(user.pk))
+    return ambitos or [GLOBAL]
+
+
+def _generaciones(ambitos: Iterable[str]) -> List[int]:
+    ambitos = sorted(set(ambitos))
+    claves = [f"{PREFIJO}:gen:{a}" for a in ambitos]
+    cache = _cache_generaciones()
+    actuales = cache.get_many(claves)
+    faltantes = {c: _semilla() for c in claves if c not in actuales}
+    if faltantes:
+        # add(): si otro proceso la creó a la vez, gana la suya
+        for c, semilla in faltantes.items():
+            cache.add(c, semilla, None)
+        actuales.update({**faltantes, **cache.get_many(list(faltantes))})
+    return [actuales[c] for c in claves]
+
+
+def invalidar(*ambitos: Optional[str]) -> None:
+    """Incrementa la generación de ``ambitos``."""
+    cache = _cache_generaciones()
+    for ambito in {a for a in ambitos if a}:
+        clave = f"{PREFIJO}:gen:{ambito}"
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # No existía: una semilla nueva no coincide con ninguna anterior
+            cache.set(clave, _semilla(), None)
+
+
+# ───────────────────────── Claves y lectura ─────────────────────────
+def clave(vista: str, user, consultorio_id=None, fecha: Optional[date] = None,
+          ambitos: Optional[Iterable[str]] = None, **params) -> str:
+    """
+    Clave de caché para ``vista`` construida a partir del rol, el consultorio,
+    la fecha y la generación de los ámbitos de los que depende.
+
+    Los médicos ven datos propios (sus citas asignadas), por eso su clave
+    incluye además su id.
+    """
+    ambitos = list(ambitos) if ambitos is not None else ambitos_usuario(user)
+    if consultorio_id:
+        ambitos.append(ambito_consultorio(consultorio_id))
+    partes = [
+        vista,
+        user.rol,
+        str(user.pk) if user.rol == "medico" else "-",
+        str(consultorio_id or "-"),
+        fecha.isoformat() if fecha else "-",
+        ".".join(str(g) for g in _generaciones(ambitos)),
+    ]
+    if params:
+        crudo = "&".join(f"{k}={params[k]}" for k in sorted(params))
+        partes.append(hashlib.md5(crudo.encode("utf-8")).hexdigest())
+    return f"{PREFIJO}:" + ":".join(partes)
+
+
+def obtener_o_calcular(clave_cache: str, calcular: Callable[[], Any],
+                       timeout: Optional[int] = None) -> Any:
+    cache = obtener_cache()
+    valor = cache.get(clave_cache)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave_cache, valor, _timeout() if timeout is None else timeout)
+    return valor
+
+
+# ───────────────────────── Invalidación por modelo ─────────────────────────
+def _invalidar_al_confirmar(ambitos: Iterable[Optional[str]]) -> None:
+    # Tras el COMMIT: si se invalidara antes, otra petición podría volver a
+    # cachear los datos viejos mientras la transacción sigue abierta.
+    ambitos = [a for a in ambitos if a]
+    transaction.on_commit(lambda: invalidar(*ambitos))
+
+
+def invalidar_cita(cita) -> None:
+    """Invalida los ámbitos de la cita, incluidos los que tenía al cargarse."""
+    pares = {(cita.consultorio_id, cita.medico_asignado_id)}
+    inicial = cita.instantanea_inicial(("consultorio_id", "medico_asignado_id"))
+    if inicial:
+        pares.add(inicial)
+    ambitos = [GLOBAL]
+    for consultorio_id, medico_id in pares:
+        if consultorio_id:
+            ambitos.append(ambito_consultorio(consultorio_id))
+        if medico_id:
+            ambitos.append(ambito_medico(medico_id))
+    _invalidar_al_confirmar(ambitos)
+
+
+def invalidar_consulta(consulta) -> None:
+    ambitos = [GLOBAL, CONSULTAS_ESPERA]
+    if consulta.medico_id:
+        ambitos.append(ambito_medico(consulta.medico_id))
+        if consulta.medico.consultorio_id:
+            ambitos.append(ambito_consultorio(consulta.medico.consultorio_id))
+    if consulta.cita_id:
+        ambitos.append(ambito_consultorio(consulta.cita.consultorio_id))
+    inicial = consulta.instantanea_inicial(("medico_id",))
+    if inicial and inicial[0]:
+        ambitos.append(ambito_medico(inicial[0]))
+    _invalidar_al_confirmar(ambitos)
+
+
+__all__ = [
+    "CONSULTAS_ESPERA",
+    "GLOBAL",
+    "ambito_consultorio",
+    "ambito_medico",
+    "ambitos_usuario",
+    "clave",
+    "incr_atomico",
+    "invalidar",
+    "invalidar_cita",
+    "invalidar_consulta",
+    "obtener_cache",
+    "obtener_o_calcular",
+]
@@ -0,0 +1,131 @@
+# consultorio_API/catalogo_busqueda.py
+# -*- coding: utf-8 -*-
+"""
+Índice de búsqueda del catálogo de artículos.
+
+``buscar_articulos`` normalizaba (NFKD + minúsculas) cuatro campos de cada
+artículo en cada búsqueda y los recorría todos. :class:`IndiceCatalogo` se
+arma una vez por catálogo cargado:
+
+* los campos normalizados de cada artículo (nombre, clave, departamento,
+  categoría);
+* un índice invertido de trigramas → ids de artículo (``array`` compacto);
+  una búsqueda de 3+ caracteres sólo verifica los artículos que contienen
+  todos sus trigramas;
+* diccionarios de clave exacta (código de barras) y de precio.
+
+Qué coincide no cambia: el texto buscado debe aparecer en alguno de los
+campos, o ser igual al precio. Los resultados se ordenan por relevancia:
+clave exacta, nombre que empieza por el texto, palabra del nombre que
+empieza por el texto, cualquier otra coincidencia; dentro de cada grupo se
+respeta el orden del catálogo.
+"""
+
+from __future__ import annotations
+
+import threading
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .catalogo_excel import _norm_text, _tof
+
+CAMPOS_BUSCABLES = ("nombre", "clave", "departamento", "categoria")
+
+CLAVE_EXACTA, NOMBRE_PREFIJO, PALABRA_PREFIJO, SUBCADENA = range(4)
+
+
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _precio(valor) -> float:
+    return round(float(valor or 0), 6)
+
+
+class IndiceCatalogo:
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self._campos: List[tuple] = []
+        self._por_clave: Dict[str, List[int]] = defaultdict(list)
+        self._por_precio: Dict[float, List[int]] = defaultdict(list)
+
+        listas: Dict[str, List[int]] = defaultdict(list)
+        for i, it in enumerate(items):
+            campos = tuple(_norm_text(it.get(c, "")) for c in CAMPOS_BUSCABLES)
+            self._campos.append(campos)
+            self._por_clave[campos[1]].append(i)
+            self._por_precio[_precio(it.get("precio"))].append(i)
+            for trigrama in set().union(*(_trigramas(c) for c in campos)):
+                listas[trigrama].append(i)
+        self._trigramas = {t: array("I", ids) for t, ids in listas.items()}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _candidatos(self, s: str) -> Iterable[int]:
+        if len(s) < 3:
+            return range(len(self.items))
+        listas = []
+        for trigrama in _trigramas(s):
+            ids = self._trigramas.get(trigrama)
+            if ids is None:
+                return ()
+            listas.append(ids)
+        listas.sort(key=len)
+        comunes = set(listas[0])
+        for ids in listas[1:]:
+            comunes.intersection_update(ids)
+            if not comunes:
+                break
+        return comunes
+
+    def _rango(self, i: int, s: str) -> Optional[int]:
+        nombre, clave, departamento, categoria = self._campos[i]
+        if clave == s:
+            return CLAVE_EXACTA
+        if nombre.startswith(s):
+            return NOMBRE_PREFIJO
+        if f" {s}" in nombre:
+            return PALABRA_PREFIJO
+        if s in nombre or s in clave or s in departamento or s in categoria:
+            return SUBCADENA
+        return None
+
+    def buscar(self, q: str) -> List[Dict[str, Any]]:
+        """Artículos que coinciden con ``q``, los más relevantes primero."""
+        s = _norm_text(q)
+        if not s:
+            return list(self.items)
+
+        rangos: Dict[int, int] = {i: CLAVE_EXACTA for i in self._por_clave.get(s, ())}
+        for i in self._candidatos(s):
+            if i not in rangos:
+                rango = self._rango(i, s)
+                if rango is not None:
+                    rangos[i] = rango
+        if s.replace(".", "").isdigit():
+            for i in self._por_precio.get(_precio(_tof(q)), ()):
+                rangos.setdefault(i, SUBCADENA)
+
+        return [self.items[i] for i in sorted(rangos, key=lambda i: (rangos[i], i))]
+
+
+# ───────────────────────── Índice vigente ─────────────────────────
+_lock = threading.Lock()
+_vigente: Optional[IndiceCatalogo] = None
+
+
+def indice(items: List[Dict[str, Any]]) -> IndiceCatalogo:
+    """Índice de ``items``; se reconstruye sólo cuando cambia la lista cargada."""
+    global _vigente
+    actual = _vigente
+    if actual is not None and actual.items is items:
+        return actual
+    with _lock:
+        if _vigente is None or _vigente.items is not items:
+            _vigente = IndiceCatalogo(items)
+        return _vigente
+
+
+__all__ = ["IndiceCatalogo", "indice"]
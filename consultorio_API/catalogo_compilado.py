@@ -0,0 +1,172 @@
+# consultorio_API/catalogo_compilado.py
+# -*- coding: utf-8 -*-
+"""
+Catálogo compilado: el Excel ya parseado, en un archivo SQLite junto a él.
+
+Parsear el libro (todas las hojas, búsqueda de etiquetas e imágenes) cuesta
+segundos; hacerlo en cada worker tras un reinicio, o cada vez que se limpia
+la caché, no escala. :func:`cargar` usa el archivo compilado
+(``<excel>.catalogo.sqlite3`` o ``CATALOGO_COMPILADO_PATH``) si su firma
+coincide con la del Excel y sólo vuelve a parsear cuando el Excel cambia:
+
+* la firma rápida es tamaño + ``mtime``; si el ``mtime`` cambió pero el
+  SHA-256 es el mismo (p. ej. se copió el archivo), no se recompila y se
+  guarda el ``mtime`` nuevo;
+* el archivo se escribe en uno temporal y se reemplaza de forma atómica, así
+  que los demás workers nunca leen uno a medias;
+* cada proceso guarda los artículos en memoria y sólo hace ``stat`` del
+  Excel en cada llamada.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+VERSION = 1
+SUFIJO = ".catalogo.sqlite3"
+CAMPOS = ("nombre", "clave", "existencia", "departamento", "precio", "categoria", "imagen_url")
+
+Firma = Tuple[int, int]
+
+_lock = threading.Lock()
+_memo: Dict[Path, Tuple[Firma, List[Dict[str, Any]]]] = {}
+
+
+def ruta_compilado(excel: Path) -> Path:
+    cfg = getattr(settings, "CATALOGO_COMPILADO_PATH", None)
+    return Path(cfg) if cfg else excel.with_name(excel.name + SUFIJO)
+
+
+def _firma(excel: Path) -> Firma:
+    st = excel.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _sha256(excel: Path) -> str:
+    h = hashlib.sha256()
+    with open(excel, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+# ───────────────────────── Archivo compilado ─────────────────────────
+def _conectar(ruta: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    conn.execute("PRAGMA mmap_size = 268435456")
+    return conn
+
+
+def _meta(ruta: Path) -> Optional[Dict[str, str]]:
+    if not ruta.exists():
+        return None
+    try:
+        with closing(_conectar(ruta)) as conn:
+            return dict(conn.execute("SELECT clave, valor FROM meta"))
+    except sqlite3.Error:
+        return None
+
+
+def escribir(ruta: Path, items: Iterable[Dict[str, Any]], firma: Firma, sha256: str) -> None:
+    """Escribe el compilado en un temporal y lo pone en ``ruta`` de un golpe."""
+    fd, tmp = tempfile.mkstemp(prefix=".catalogo-", suffix=".tmp", dir=ruta.parent)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.execute("CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            conn.execute(
+                "CREATE TABLE articulos (orden INTEGER PRIMARY KEY, "
+                "nombre TEXT, clave TEXT, existencia INTEGER, departamento TEXT, "
+                "precio REAL, categoria TEXT, imagen_url TEXT)"
+            )
+            conn.executemany(
+                "INSERT INTO articulos VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((i, *(it[c] for c in CAMPOS)) for i, it in enumerate(items)),
+            )
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(VERSION)),
+                ("tamano", str(firma[0])),
+                ("mtime_ns", str(firma[1])),
+                ("sha256", sha256),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _actualizar_mtime(ruta: Path, firma: Firma) -> None:
+    """Guarda el ``mtime`` nuevo para que otros procesos no vuelvan a hashear."""
+    try:
+        with closing(sqlite3.connect(ruta)) as conn, conn:
+            conn.execute("UPDATE meta SET valor = ? WHERE clave = 'mtime_ns'", (str(firma[1]),))
+    except sqlite3.Error:
+        pass  # sólo es un atajo; sin él se vuelve a comparar el SHA-256
+
+
+def leer(ruta: Path) -> List[Dict[str, Any]]:
+    with closing(_conectar(ruta)) as conn:
+        filas = conn.execute(f"SELECT {', '.join(CAMPOS)} FROM articulos ORDER BY orden")
+        return [dict(zip(CAMPOS, fila)) for fila in filas]
+
+
+def vigente(excel: Path, ruta: Path, firma: Optional[Firma] = None) -> bool:
+    """¿El compilado en ``ruta`` corresponde al contenido actual de ``excel``?"""
+    meta = _meta(ruta)
+    if not meta or meta.get("version") != str(VERSION):
+        return False
+    firma = firma or _firma(excel)
+    if (meta.get("tamano"), meta.get("mtime_ns")) == tuple(map(str, firma)):
+        return True
+    if str(firma[0]) != meta.get("tamano") or _sha256(excel) != meta.get("sha256"):
+        return False
+    _actualizar_mtime(ruta, firma)
+    return True
+
+
+# ───────────────────────── API ─────────────────────────
+def compilar(excel: Path, parsear: Callable[[Path], Iterable[Dict[str, Any]]],
+             forzar: bool = False) -> Path:
+    """Recompila si hace falta (o si ``forzar``) y devuelve la ruta del compilado."""
+    ruta = ruta_compilado(excel)
+    firma = _firma(excel)
+    if forzar or not vigente(excel, ruta, firma):
+        escribir(ruta, parsear(excel), firma, _sha256(excel))
+    return ruta
+
+
+def cargar(excel: Path, parsear: Callable[[Path], Iterable[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Artículos del catálogo; parsea el Excel sólo si el compilado no está al día."""
+    firma = _firma(excel)
+    memo = _memo.get(excel)
+    if memo and memo[0] == firma:
+        return memo[1]
+    with _lock:
+        memo = _memo.get(excel)
+        if memo and memo[0] == firma:
+            return memo[1]
+        items = leer(compilar(excel, parsear))
+        _memo[excel] = (firma, items)
+        return items
+
+
+def olvidar() -> None:
+    """Descarta los artículos en memoria de este proceso (se releen del compilado)."""
+    _memo.clear()
+
+
+__all__ = ["cargar", "compilar", "olvidar", "ruta_compilado", "vigente"]
@@ -17,6 +17,11 @@ Funciones clave:
 - Nombre: sube hasta 5 filas y toma la última línea sin “:”, ignorando encabezados.
 - Resto de etiquetas: busca valor en ventana (misma fila y hasta 3 filas abajo; +30 columnas).
 - Extrae imágenes embebidas desde xl/media y las mapea por fila usando drawings.
+- Por defecto lee en modo streaming (openpyxl ``read_only``) con una ventana
+  de 12 filas en vez de cargar cada hoja completa como grid.
+
+El resultado se guarda compilado junto al Excel (ver catalogo_compilado.py) y
+sólo se vuelve a parsear cuando el archivo cambia.
 """
 
 from __future__ import annotations
@@ -26,13 +31,15 @@ import io
 import json
 import hashlib
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, Optional
+from collections import deque
+from typing import Dict, Any, Iterator, List, Tuple, Optional
 from unicodedata import normalize
 from zipfile import ZipFile
 from xml.etree import ElementTree as ET
 
 from django.conf import settings
-from django.core.cache import cache
+
+from . import catalogo_compilado
 
 try:
     from openpyxl import load_workbook  # type: ignore
@@ -329,6 +336,36 @@ def _closest_image_for_row(sheet_images: List[Tuple[int, str]], r: int, max_delt
 
 
 # ─────────────────────────── Parseo por hoja ────────────────────────────────
+# Filas que miran las búsquedas alrededor de la fila de "Clave:": el nombre
+# hasta 5 arriba; etiquetas hasta 3 abajo y sus valores 3 más abajo.
+FILAS_ARRIBA = 5
+FILAS_ABAJO = 6
+
+
+def _items_en_fila(grid, r: int, sheet_img_index: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    row = grid[r]
+    for c, val in enumerate(row):
+        if not val:
+            continue
+        tag = _norm_text(val)
+        if tag.startswith("clave"):
+            # NUEVO artículo
+            nombre = _find_name_above(grid, r)
+            clave = _first_nonempty_to_right(grid, r, c)
+
+            existencia = _find_label_value(grid, r, "existencia", numeric=True)
+            dep        = _find_label_value(grid, r, "departamento", numeric=False)
+            precio     = _find_label_value(grid, r, "precio", numeric=True)
+            categoria  = _find_label_value(grid, r, "categoria", numeric=False)
+
+            # Imagen más cercana por fila (±5 filas)
+            imagen     = _closest_image_for_row(sheet_img_index, r, max_delta=5)
+
+            _append(items, nombre, clave, existencia, dep, precio, categoria, imagen)
+    return items
+
+
 def _parse_sheet(ws, sheet_img_index: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
     # hoja → grid de strings
     grid: List[List[str]] = []
@@ -336,48 +373,86 @@ def _parse_sheet(ws, sheet_img_index: List[Tuple[int, str]]) -> List[Dict[str, A
         grid.append([_strip_nbsp("" if v is None else v) for v in row])
 
     items: List[Dict[str, Any]] = []
+    for r in range(len(grid)):
+        items.extend(_items_en_fila(grid, r, sheet_img_index))
+    return items
 
-    rows = len(grid)
-    for r in range(rows):
-        row = grid[r]
-        for c, val in enumerate(row):
-            if not val:
-                continue
-            tag = _norm_text(val)
-            if tag.startswith("clave"):
-                # NUEVO artículo
-                nombre = _find_name_above(grid, r)
-                clave = _first_nonempty_to_right(grid, r, c)
 
-                existencia = _find_label_value(grid, r, "existencia", numeric=True)
-                dep        = _find_label_value(grid, r, "departamento", numeric=False)
-                precio     = _find_label_value(grid, r, "precio", numeric=True)
-                categoria  = _find_label_value(grid, r, "categoria", numeric=False)
+class _VentanaFilas:
+    """
+    Buffer circular de filas con índices absolutos, como el ``grid``:
+    ``len()`` es el número de filas leídas hasta ahora y sólo las últimas
+    ``tamano`` siguen disponibles.
+    """
 
-                # Imagen más cercana por fila (±5 filas)
-                imagen     = _closest_image_for_row(sheet_img_index, r, max_delta=5)
+    def __init__(self, tamano: int):
+        self._filas: deque = deque(maxlen=tamano)
+        self._leidas = 0
 
-                _append(items, nombre, clave, existencia, dep, precio, categoria, imagen)
+    def agregar(self, fila: List[str]) -> None:
+        self._filas.append(fila)
+        self._leidas += 1
 
-    return items
+    def __len__(self) -> int:
+        return self._leidas
 
+    def __getitem__(self, r: int) -> List[str]:
+        i = r - (self._leidas - len(self._filas))
+        if i < 0:
+            raise IndexError(f"fila {r} fuera de la ventana")
+        return self._filas[i]
 
-# ─────────────────────────── API pública ────────────────────────────────────
-CATALOGO_CACHE_KEY = "catalogo_excel_items"
 
+def _parse_sheet_streaming(filas, sheet_img_index: List[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+    """Como :func:`_parse_sheet` pero leyendo las filas una vez y sin el grid."""
+    ventana = _VentanaFilas(FILAS_ARRIBA + 1 + FILAS_ABAJO)
+    pendiente = 0
+    for row in filas:
+        ventana.agregar([_strip_nbsp("" if v is None else v) for v in row])
+        # Una fila se procesa cuando ya se leyeron todas las que puede mirar
+        if len(ventana) > pendiente + FILAS_ABAJO:
+            yield from _items_en_fila(ventana, pendiente, sheet_img_index)
+            pendiente += 1
+    while pendiente < len(ventana):
+        yield from _items_en_fila(ventana, pendiente, sheet_img_index)
+        pendiente += 1
 
+
+# ─────────────────────────── API pública ────────────────────────────────────
 def catalogo_disponible() -> bool:
     return EXCEL_PATH.exists() and load_workbook is not None
 
 
-def _load_all_items() -> List[Dict[str, Any]]:
-    """Lee el Excel una vez y lo guarda en caché."""
-    items = cache.get(CATALOGO_CACHE_KEY)
-    if items is not None:
-        return items
+def iter_articulos(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Artículos del Excel hoja por hoja, con openpyxl en modo ``read_only``:
+    la memoria depende de la hoja más grande en artículos, no del tamaño del
+    libro.
+    """
+    img_index_by_sheet = _extract_images_index(path)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            sheet_imgs = img_index_by_sheet.get(ws.title, [])
+            # La dimensión guardada en el archivo puede no estar al día
+            ws.reset_dimensions()
+            try:
+                # Una hoja con errores se descarta completa, como en el modo grid
+                parsed = list(_parse_sheet_streaming(ws.iter_rows(values_only=True), sheet_imgs))
+            except Exception:
+                continue
+            yield from parsed
+    finally:
+        wb.close()
+
 
-    img_index_by_sheet = _extract_images_index(EXCEL_PATH)
-    wb = load_workbook(EXCEL_PATH, data_only=True)
+def parsear_excel(path: Path, streaming: bool = True) -> List[Dict[str, Any]]:
+    """Lee todas las hojas del Excel y devuelve sus artículos."""
+    if streaming:
+        return list(iter_articulos(path))
+
+    img_index_by_sheet = _extract_images_index(path)
+    wb = load_workbook(path, data_only=True)
 
     items = []
     for ws in wb.worksheets:
@@ -388,34 +463,21 @@ def _load_all_items() -> List[Dict[str, Any]]:
                 items.extend(parsed)
         except Exception:
             continue
-
-    cache.set(CATALOGO_CACHE_KEY, items, None)
     return items
 
 
+def _load_all_items() -> List[Dict[str, Any]]:
+    """Artículos del catálogo compilado; se recompila si el Excel cambió."""
+    return catalogo_compilado.cargar(EXCEL_PATH, iter_articulos)
+
+
 def buscar_articulos(q: str = "", page: int = 1, per_page: int = 15) -> Dict[str, Any]:
     if not catalogo_disponible():
         return {"items": [], "total": 0, "page": 1, "per_page": per_page}
 
-    all_items = _load_all_items()
-
-    # Filtro
-    if q:
-        s = _norm_text(q)
-
-        def ok(it: Dict[str, Any]) -> bool:
-            return (
-                s in _norm_text(it.get("nombre", ""))
-                or s in _norm_text(it.get("clave", ""))
-                or s in _norm_text(it.get("departamento", ""))
-                or s in _norm_text(it.get("categoria", ""))
-                or (
-                    s.replace(".", "").isdigit()
-                    and abs(it.get("precio", 0.0) - _tof(q)) < 1e-9
-                )
-            )
+    from .catalogo_busqueda import indice  # usa las utilidades de texto de este módulo
 
-        all_items = [it for it in all_items if ok(it)]
+    all_items = indice(_load_all_items()).buscar(q) if q else _load_all_items()
 
     total = len(all_items)
     page = max(1, int(page or 1))
@@ -432,13 +494,15 @@ def buscar_articulos(q: str = "", page: int = 1, per_page: int = 15) -> Dict[str
 
 
 def limpiar_cache_catalogo() -> None:
-    """Elimina la caché del catálogo para forzar su recarga."""
-    cache.delete(CATALOGO_CACHE_KEY)
+    """Descarta el catálogo en memoria; se relee del compilado (o del Excel si cambió)."""
+    catalogo_compilado.olvidar()
 
 
 __all__ = [
     "EXCEL_PATH",
     "catalogo_disponible",
     "buscar_articulos",
+    "iter_articulos",
     "limpiar_cache_catalogo",
+    "parsear_excel",
 ]
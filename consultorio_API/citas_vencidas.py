@@ -0,0 +1,173 @@
+# consultorio_API/citas_vencidas.py
+# -*- coding: utf-8 -*-
+"""
+Barrido de citas vencidas.
+
+Una cita se considera vencida diez minutos después de la hora programada
+(también las reprogramadas): pasa a "no asistió" y su consulta, si la tiene,
+se cancela. El barrido trabaja por lotes con ``UPDATE`` masivos y registra la
+auditoría con ``bulk_create``; como no pasa por ``save()``, actualiza a mano
+lo que mantienen las señales (resumen diario, caché y cola en vivo).
+
+Se ejecuta con ``manage.py marcar_citas_vencidas`` (cron) o, si se define
+``CITAS_VENCIDAS_INTERVALO`` en settings, con un hilo periódico en proceso.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import cache_consultorio, cola_eventos, resumen_diario
+from .models import Auditoria, Cita, Consulta
+
+logger = logging.getLogger(__name__)
+
+MINUTOS_TOLERANCIA = 10
+ESTADOS_VENCIBLES = ("programada", "confirmada", "reprogramada")
+MOTIVO = "No asistió a la cita"
+
+
+def _vencidas(limite: datetime):
+    return Cita.objects.filter(fecha_hora__lt=limite, estado__in=ESTADOS_VENCIBLES)
+
+
+def _auditoria_citas(citas, ct_cita) -> list:
+    etiquetas = dict(Cita.ESTADO_CHOICES)
+    entradas = []
+    for cita in citas:
+        usuario_id = cita["actualizado_por_id"] or cita["medico_asignado_id"]
+        if not usuario_id:
+            continue
+        entradas.append(Auditoria(
+            usuario_id=usuario_id,
+            accion="cambiar_estado_cita",
+            descripcion=(
+                f"Estado de cita {cita['numero_cita']} cambió de "
+                f"{etiquetas[cita['estado']]} a {etiquetas['no_asistio']}"
+            ),
+            content_type=ct_cita,
+            object_id=str(cita["pk"]),
+        ))
+    return entradas
+
+
+def _auditoria_consultas(consultas, ct_consulta) -> list:
+    return [
+        Auditoria(
+            usuario_id=consulta["medico_id"] or consulta["asistente_id"],
+            accion="cancelar_consulta",
+            descripcion=f"Consulta de {consulta['paciente__nombre_completo']} cancelada",
+            content_type=ct_consulta,
+            object_id=str(consulta["pk"]),
+        )
+        for consulta in consultas
+        if consulta["medico_id"] or consulta["asistente_id"]
+    ]
+
+
+def _barrer_lote(ids, ahora: datetime, limite: datetime, ct_cita, ct_consulta) -> int:
+    with transaction.atomic():
+        # Se vuelve a leer con bloqueo: otra petición pudo atenderla mientras tanto
+        citas = list(
+            _vencidas(limite).filter(pk__in=ids).select_for_update().values(
+                "pk", "numero_cita", "estado", "consultorio_id",
+                "medico_asignado_id", "actualizado_por_id",
+            )
+        )
+        if not citas:
+            return 0
+        ids = [c["pk"] for c in citas]
+        Cita.objects.filter(pk__in=ids).update(
+            estado="no_asistio", fecha_cancelacion=ahora, motivo_cancelacion=MOTIVO,
+        )
+
+        pendientes = Consulta.objects.filter(cita_id__in=ids).exclude(estado="cancelada")
+        consultas = list(pendientes.values(
+            "pk", "medico_id", "asistente_id", "medico__consultorio_id",
+            "paciente__nombre_completo",
+        ))
+        pendientes.update(estado="cancelada")
+
+        Auditoria.objects.bulk_create(
+            _auditoria_citas(citas, ct_cita) + _auditoria_consultas(consultas, ct_consulta)
+        )
+        resumen_diario.refrescar_citas(ids)
+
+        consultorios = {c["consultorio_id"] for c in citas}
+        consultorios |= {c["medico__consultorio_id"] for c in consultas}
+        consultorios.discard(None)
+        medicos = {c["medico_asignado_id"] for c in citas} | {c["medico_id"] for c in consultas}
+        medicos.discard(None)
+        ambitos = [cache_consultorio.GLOBAL]
+        if consultas:
+            ambitos.append(cache_consultorio.CONSULTAS_ESPERA)
+        ambitos += [cache_consultorio.ambito_consultorio(c) for c in consultorios]
+        ambitos += [cache_consultorio.ambito_medico(m) for m in medicos]
+
+        def _avisar():
+            cache_consultorio.invalidar(*ambitos)
+            for consultorio_id in consultorios:
+                cola_eventos.publicar(consultorio_id, {"tipo": "resincronizar", "fecha": None})
+
+        transaction.on_commit(_avisar)
+    return len(ids)
+
+
+def marcar_citas_vencidas(ahora: Optional[datetime] = None, batch_size: int = 500) -> int:
+    """Marca como 'no asistió' las citas vencidas y cancela su consulta.
+
+    Devuelve el número de citas marcadas.
+    """
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(minutes=MINUTOS_TOLERANCIA)
+    ct_cita = ContentType.objects.get_for_model(Cita)
+    ct_consulta = ContentType.objects.get_for_model(Consulta)
+
+    total = 0
+    while True:
+        ids = list(
+            _vencidas(limite).order_by("fecha_hora").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        marcadas = _barrer_lote(ids, ahora, limite, ct_cita, ct_consulta)
+        if not marcadas:
+            return total
+        total += marcadas
+
+
+# ───────────────────────── Ejecución periódica ─────────────────────────
+_hilo: Optional[threading.Thread] = None
+
+
+def iniciar_barrido_periodico(intervalo: int) -> threading.Thread:
+    """Lanza (una sola vez por proceso) un hilo que barre cada ``intervalo`` s."""
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return _hilo
+
+    def _ciclo():
+        detener = threading.Event()
+        while not detener.wait(intervalo):
+            try:
+                marcadas = marcar_citas_vencidas()
+                if marcadas:
+                    logger.info("Barrido de citas vencidas: %s marcadas", marcadas)
+            except Exception:
+                logger.exception("Error en el barrido de citas vencidas")
+            finally:
+                close_old_connections()
+
+    _hilo = threading.Thread(target=_ciclo, name="barrido-citas-vencidas", daemon=True)
+    _hilo.start()
+    return _hilo
+
+
+__all__ = ["iniciar_barrido_periodico", "marcar_citas_vencidas"]
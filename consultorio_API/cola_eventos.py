@@ -0,0 +1,232 @@
+# consultorio_API/cola_eventos.py
+# -*- coding: utf-8 -*-
+"""
+Pub/sub en proceso para las actualizaciones en vivo de la cola virtual.
+
+Las señales de ``signals.py`` traducen cada cambio de ``Cita`` o ``Consulta``
+en un *delta* de la cola (cita nueva, cambio de estado, cita que pasa de un
+grupo a otro, cita eliminada) y lo publican al confirmar la transacción. El
+endpoint SSE ``cola_virtual_eventos`` se suscribe por consultorio y fecha y
+reenvía sólo esos deltas al navegador.
+
+Las suscripciones viven en memoria del proceso: con varios workers cada uno
+sólo ve los cambios hechos en él, y los procesos sin suscriptores (el cron
+de citas vencidas, otros workers) publican en vacío. Por eso las páginas
+siguen sondeando, más despacio, con el stream abierto
+(``static/js/cola_eventos.js``); los deltas sólo adelantan la recarga. Bajo ASGI cada
+cliente espera en una ``asyncio.Queue``; bajo WSGI (runserver) el hilo de la
+petición espera en una ``queue.Queue`` (:class:`SuscripcionSincrona`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional, Set
+
+from django.db import transaction
+
+from .cola_turnos import grupo_turno
+
+# Eventos pendientes por suscriptor antes de pedirle que se resincronice
+MAX_PENDIENTES = 100
+
+_lock = threading.Lock()
+_suscripciones: Dict[int, Set["Suscripcion"]] = defaultdict(set)
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente SSE servido por ASGI, atada a su event loop."""
+
+    def __init__(self, consultorio_id: int, fecha: Optional[date]):
+        self.consultorio_id = consultorio_id
+        self.fecha = fecha
+        self._crear_cola()
+
+    def _crear_cola(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDIENTES)
+
+    def _entregar(self, evento: dict) -> None:
+        try:
+            self.cola.put_nowait(evento)
+        except (asyncio.QueueFull, queue.Full):
+            # Cliente lento: se descartan los deltas y se le pide recargar
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({"tipo": "resincronizar"})
+
+    def recibir(self, evento: dict) -> None:
+        """Encola ``evento``; se llama desde cualquier hilo."""
+        self.loop.call_soon_threadsafe(self._entregar, evento)
+
+    def acepta(self, evento: dict) -> bool:
+        fecha = evento.get("fecha")
+        return self.fecha is None or fecha is None or fecha == self.fecha.isoformat()
+
+    async def siguiente(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SuscripcionSincrona(Suscripcion):
+    """Para el stream servido por WSGI: el hilo de la petición espera en una ``queue.Queue``."""
+
+    def _crear_cola(self) -> None:
+        self.cola = queue.Queue(maxsize=MAX_PENDIENTES)
+
+    def recibir(self, evento: dict) -> None:
+        self._entregar(evento)
+
+    def esperar(self, timeout: float) -> Optional[dict]:
+        try:
+            return self.cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def suscribir(consultorio_id: int, fecha: Optional[date], sincrona: bool = False) -> Suscripcion:
+    """
+    Registra un suscriptor (``fecha`` None: todos los días). La asíncrona
+    debe crearse desde el event loop del cliente.
+    """
+    suscripcion = (SuscripcionSincrona if sincrona else Suscripcion)(consultorio_id, fecha)
+    with _lock:
+        _suscripciones[consultorio_id].add(suscripcion)
+    return suscripcion
+
+
+def cancelar(suscripcion: Suscripcion) -> None:
+    with _lock:
+        suscriptores = _suscripciones.get(suscripcion.consultorio_id)
+        if suscriptores is not None:
+            suscriptores.discard(suscripcion)
+            if not suscriptores:
+                del _suscripciones[suscripcion.consultorio_id]
+
+
+def publicar(consultorio_id: Optional[int], evento: dict) -> None:
+    """
+    Entrega ``evento`` a los suscriptores de ``consultorio_id`` (a todos si
+    es None). Se puede llamar desde cualquier hilo.
+    """
+    with _lock:
+        if consultorio_id is None:
+            destinos = [s for subs in _suscripciones.values() for s in subs]
+        else:
+            destinos = list(_suscripciones.get(consultorio_id, ()))
+    for suscripcion in destinos:
+        if not suscripcion.acepta(evento):
+            continue
+        try:
+            suscripcion.recibir(evento)
+        except RuntimeError:
+            cancelar(suscripcion)  # el loop del cliente ya se cerró
+
+
+# ───────────────────────── Deltas por modelo ─────────────────────────
+def _fecha(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    return (valor.date() if isinstance(valor, datetime) else valor).isoformat()
+
+
+def _datos_cita(consultorio_id, medico_id, fecha_hora, estado, cita) -> dict:
+    return {
+        "cita": str(cita.pk),
+        "numero_cita": cita.numero_cita,
+        "hora": fecha_hora.strftime("%H:%M") if fecha_hora else None,
+        "fecha": _fecha(fecha_hora),
+        "estado": estado,
+        "medico_asignado": medico_id,
+        "grupo": grupo_turno(estado, medico_id),
+    }
+
+
+def _publicar_al_confirmar(eventos) -> None:
+    if eventos:
+        transaction.on_commit(lambda: [publicar(c, e) for c, e in eventos])
+
+
+def cita_guardada(cita, created: bool) -> None:
+    actual = (cita.consultorio_id, cita.medico_asignado_id, cita.fecha_hora, cita.estado)
+    nuevo = _datos_cita(*actual, cita)
+    inicial = cita.instantanea_inicial(
+        ("consultorio_id", "medico_asignado_id", "fecha_hora", "estado")
+    )
+
+    if created or inicial is None:
+        tipo = "nueva" if created else "actualizada"
+        _publicar_al_confirmar([(cita.consultorio_id, {"tipo": tipo, **nuevo})])
+        return
+    if inicial == actual:
+        return
+
+    anterior = _datos_cita(*inicial, cita)
+    if (inicial[0], anterior["fecha"]) != (actual[0], nuevo["fecha"]):
+        # Cambió de consultorio o de día: sale de una cola y entra en otra
+        _publicar_al_confirmar([
+            (inicial[0], {"tipo": "eliminada", **anterior}),
+            (cita.consultorio_id, {"tipo": "nueva", **nuevo}),
+        ])
+        return
+
+    tipo = "estado" if inicial[3] != cita.estado else "movida"
+    if tipo == "movida" and anterior["grupo"] == nuevo["grupo"] and anterior["hora"] == nuevo["hora"]:
+        return
+    _publicar_al_confirmar([
+        (cita.consultorio_id, {"tipo": tipo, "desde": anterior["grupo"], **nuevo}),
+    ])
+
+
+def cita_eliminada(cita) -> None:
+    datos = _datos_cita(cita.consultorio_id, cita.medico_asignado_id, cita.fecha_hora, cita.estado, cita)
+    _publicar_al_confirmar([(cita.consultorio_id, {"tipo": "eliminada", **datos})])
+
+
+def _evento_consulta(consulta, tipo: str) -> dict:
+    return {
+        "tipo": tipo,
+        "consulta": consulta.pk,
+        "estado": consulta.estado,
+        "fecha": None,  # la lista de consultas en espera no depende del día
+    }
+
+
+def consulta_guardada(consulta, created: bool) -> None:
+    inicial = consulta.instantanea_inicial(("estado",))
+    en_espera = consulta.estado == "espera"
+    if created:
+        cambio = en_espera
+    elif inicial is None:
+        cambio = True  # sin instantánea no se conoce el estado previo
+    else:
+        cambio = (inicial[0] == "espera") != en_espera
+    if not cambio:
+        return
+    tipo = "consulta_en_espera" if en_espera else "consulta_fuera_de_espera"
+    # La cola lista las consultas en espera de todos los consultorios
+    _publicar_al_confirmar([(None, _evento_consulta(consulta, tipo))])
+
+
+def consulta_eliminada(consulta) -> None:
+    if consulta.estado == "espera":
+        _publicar_al_confirmar([(None, _evento_consulta(consulta, "consulta_fuera_de_espera"))])
+
+
+__all__ = [
+    "Suscripcion",
+    "SuscripcionSincrona",
+    "cancelar",
+    "cita_eliminada",
+    "cita_guardada",
+    "consulta_eliminada",
+    "consulta_guardada",
+    "publicar",
+    "suscribir",
+]
@@ -0,0 +1,110 @@
+# consultorio_API/cola_turnos.py
+# -*- coding: utf-8 -*-
+"""
+Instantánea de la cola virtual de un consultorio para un día.
+
+Las citas del día se cargan en una sola consulta (con sus relaciones) y se
+reparten en Python en los grupos de turno; las estadísticas se derivan de
+esos grupos. La usan tanto la vista HTML ``cola_virtual`` como la vista
+AJAX ``cola_virtual_data``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from django.utils import timezone
+
+from .models import Cita, Consulta
+
+# Estados que siguen en la cola (pendientes de atender o en curso)
+ESTADOS_ACTIVOS = ('programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada')
+
+# Máximo de citas próximas que se muestran
+LIMITE_PROXIMAS = 20
+
+
+def grupo_turno(estado: str, medico_asignado_id) -> Optional[str]:
+    """Grupo principal de la cola al que pertenece una cita (o None)."""
+    if estado == 'completada':
+        return 'completadas'
+    if estado in ('en_espera', 'en_atencion'):
+        return estado
+    if estado in ESTADOS_ACTIVOS:
+        return 'asignadas' if medico_asignado_id else 'sin_asignar'
+    return None
+
+
+@dataclass(frozen=True)
+class ColaVirtual:
+    proximas: List[Cita]
+    sin_asignar: List[Cita]
+    asignadas: List[Cita]
+    en_espera: List[Cita]
+    en_atencion: List[Cita]
+    completadas: List[Cita]
+    consultas: List[Consulta] = field(default_factory=list)
+
+    @property
+    def citas_proximas(self) -> List[Cita]:
+        """Citas próximas a mostrar, ya ordenadas y recortadas."""
+        return self.proximas[:LIMITE_PROXIMAS]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'total': len(self.proximas),
+            'sin_asignar': len(self.sin_asignar),
+            'asignadas': len(self.asignadas),
+            'en_espera': len(self.en_espera),
+            'en_atencion': len(self.en_atencion),
+            'completadas': len(self.completadas),
+        }
+
+
+def construir_cola(citas, consultorio, fecha: date, estado: Optional[str] = None,
+                   ahora: Optional[datetime] = None) -> ColaVirtual:
+    """
+    Arma la cola de ``consultorio`` para ``fecha``.
+
+    ``citas`` es el queryset visible para el usuario (ver
+    ``views.get_citas_queryset``). Las citas próximas son las de estado
+    activo que aún no han pasado; ``estado`` restringe todos los grupos.
+    """
+    ahora = ahora or timezone.now()
+    del_dia = (
+        citas.filter(consultorio=consultorio, fecha_hora__date=fecha)
+        .select_related('paciente', 'consultorio', 'medico_asignado')
+        .order_by('fecha_hora')
+    )
+    if estado:
+        del_dia = del_dia.filter(estado=estado)
+
+    grupos: Dict[str, List[Cita]] = {
+        'proximas': [], 'sin_asignar': [], 'asignadas': [],
+        'en_espera': [], 'en_atencion': [], 'completadas': [],
+    }
+    for cita in del_dia:
+        if cita.estado == 'completada':
+            grupos['completadas'].append(cita)
+            continue
+        if cita.estado not in ESTADOS_ACTIVOS or cita.fecha_hora < ahora:
+            continue
+        grupos['proximas'].append(cita)
+        grupos['asignadas' if cita.medico_asignado_id else 'sin_asignar'].append(cita)
+        if cita.estado in ('en_espera', 'en_atencion'):
+            grupos[cita.estado].append(cita)
+
+    # Consultas en espera (con y sin cita)
+    consultas = list(
+        Consulta.objects
+        .filter(estado='espera')
+        .select_related('paciente', 'medico')
+        .order_by('fecha_creacion')
+    )
+    return ColaVirtual(consultas=consultas, **grupos)
+
+
+__all__ = ["ColaVirtual", "ESTADOS_ACTIVOS", "LIMITE_PROXIMAS", "construir_cola", "grupo_turno"]
@@ -0,0 +1,155 @@
+# consultorio_API/contador_notificaciones.py
+# -*- coding: utf-8 -*-
+"""
+Contador en caché de notificaciones no leídas por usuario.
+
+El badge de notificaciones se pinta en cada página (context processor) y se
+consulta por AJAX periódicamente; ambos leen :func:`no_leidas`, que sólo va a
+la BD si el contador no está en la caché (o expiró) y lo recalcula con un
+``COUNT``.
+
+El contador se ajusta al confirmar la transacción:
+
+* ``+n`` al crear notificaciones sin leer (señal ``post_save`` o
+  ``NotificationManager.enviar_notificaciones`` para ``bulk_create``);
+* ``±1`` cuando ``leido`` o el destinatario cambian, o al borrar una sin leer
+  (la instantánea de ``RastreoCamposMixin`` dice el valor anterior);
+* :func:`reiniciar` / :func:`invalidar_todos` tras los ``update()`` masivos.
+
+Si un ajuste encuentra el contador ausente no hace nada: la próxima lectura
+recuenta. Con un backend cuyo ``incr`` no es atómico (archivos, BD) los
+ajustes no suman: borran el contador, para que dos workers a la vez no
+pierdan uno y el badge quede desviado hasta que expire. Por eso, tras guardar un recuento, :func:`no_leidas` vuelve a
+contar: si entretanto se creó o leyó alguna (su ajuste no encontró el
+contador), lo descarta en lugar de dejarlo desviado hasta que expire.
+"""
+
+from __future__ import annotations
+
+import secrets
+from collections import Counter
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+
+from . import cache_consultorio
+from .models import Notificacion
+
+PREFIJO = f"{cache_consultorio.PREFIJO}:notif_no_leidas"
+GENERACION = f"{PREFIJO}:gen"
+
+
+def _ttl() -> int:
+    return getattr(settings, "NOTIFICACIONES_CONTADOR_TTL", 3600)
+
+
+def _clave(usuario_id) -> str:
+    cache = cache_consultorio.obtener_cache()
+    generacion = cache.get(GENERACION)
+    if generacion is None:
+        # Semilla aleatoria: si la generación se descarta, no revive contadores viejos
+        semilla = secrets.randbits(48)
+        cache.add(GENERACION, semilla, None)
+        generacion = cache.get(GENERACION, semilla)
+    return f"{PREFIJO}:{generacion}:{usuario_id}"
+
+
+def no_leidas(usuario_id) -> int:
+    cache = cache_consultorio.obtener_cache()
+    clave = _clave(usuario_id)
+    total = cache.get(clave)
+    if total is None:
+        pendientes = Notificacion.objects.filter(destinatario_id=usuario_id, leido=False)
+        total = pendientes.count()
+        # add: no pisa un contador que otro proceso ya haya ajustado
+        if cache.add(clave, total, _ttl()):
+            actual = pendientes.count()
+            if actual != total:
+                # Un ajuste entre el COUNT y el add se perdió: que recuente la próxima
+                cache.delete(clave)
+                total = actual
+    return total
+
+
+def _ajustar(usuario_id, delta: int) -> None:
+    if not usuario_id or not delta:
+        return
+    cache = cache_consultorio.obtener_cache()
+    clave = _clave(usuario_id)
+    if not cache_consultorio.incr_atomico(cache):
+        cache.delete(clave)
+        return
+    try:
+        total = cache.incr(clave, delta)
+    except ValueError:
+        return  # no está en caché: se recontará al leerlo
+    if total < 0:
+        cache.delete(clave)
+
+
+def ajustar(usuario_id, delta: int) -> None:
+    """Suma ``delta`` al contador de ``usuario_id`` al confirmar."""
+    transaction.on_commit(lambda: _ajustar(usuario_id, delta))
+
+
+def sumar_creadas(notificaciones: Iterable[Notificacion]) -> None:
+    """Cuenta notificaciones guardadas sin señales (``bulk_create``)."""
+    por_usuario = Counter(n.destinatario_id for n in notificaciones if not n.leido)
+    for usuario_id, total in por_usuario.items():
+        _ajustar(usuario_id, total)
+
+
+def reiniciar(usuario_id, total: int = 0) -> None:
+    """Fija el contador (p. ej. a 0 tras marcar todas como leídas)."""
+    def _fijar():
+        cache_consultorio.obtener_cache().set(_clave(usuario_id), total, _ttl())
+    transaction.on_commit(_fijar)
+
+
+def invalidar_todos() -> None:
+    """Descarta los contadores de todos los usuarios."""
+    def _incrementar():
+        cache = cache_consultorio.obtener_cache()
+        try:
+            cache.incr(GENERACION)
+        except ValueError:
+            cache.set(GENERACION, secrets.randbits(48), None)
+    transaction.on_commit(_incrementar)
+
+
+# ───────────────────────── Señales ─────────────────────────
+def notificacion_guardada(instance: Notificacion, created: bool) -> None:
+    if created:
+        if not instance.leido:
+            ajustar(instance.destinatario_id, 1)
+        return
+    anterior = instance.instantanea_inicial(("leido", "destinatario_id"))
+    if anterior is None:
+        clave = _clave(instance.destinatario_id)
+        transaction.on_commit(lambda: cache_consultorio.obtener_cache().delete(clave))
+        return
+    leido_antes, destinatario_antes = anterior
+    if (leido_antes, destinatario_antes) == (instance.leido, instance.destinatario_id):
+        return
+    if not leido_antes:
+        ajustar(destinatario_antes, -1)
+    if not instance.leido:
+        ajustar(instance.destinatario_id, 1)
+
+
+def notificacion_eliminada(instance: Notificacion) -> None:
+    # Una leída no cuenta: no se toca la caché (la purga borra miles así)
+    anterior = instance.instantanea_inicial(("leido", "destinatario_id"))
+    leido, destinatario_id = anterior or (instance.leido, instance.destinatario_id)
+    if not leido:
+        ajustar(destinatario_id, -1)
+
+
+__all__ = [
+    "ajustar",
+    "invalidar_todos",
+    "no_leidas",
+    "reiniciar",
+    "sumar_creadas",
+]
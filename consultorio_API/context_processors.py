@@ -1,7 +1,6 @@
-from .models import Notificacion
+from .contador_notificaciones import no_leidas
 
 def notificaciones_no_leidas(request):
     if request.user.is_authenticated and request.user.rol in ("medico", "admin"):
-        total = Notificacion.objects.filter(destinatario=request.user, leido=False).count()
-        return {"num_notif_sin_leer": total}
+        return {"num_notif_sin_leer": no_leidas(request.user.id)}
     return {}
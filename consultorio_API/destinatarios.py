@@ -0,0 +1,64 @@
+# consultorio_API/destinatarios.py
+# -*- coding: utf-8 -*-
+"""
+Directorio en caché de destinatarios de notificaciones.
+
+Las notificaciones masivas van a "todos los administradores activos" o a
+"los asistentes activos del consultorio X". En vez de consultar ``Usuario``
+en cada cita o consulta creada, el directorio completo (ids por rol y por
+consultorio) se arma con una sola consulta y se guarda en la caché. Las
+señales de ``Usuario`` lo invalidan al confirmar cualquier alta, cambio o
+baja.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from django.db import transaction
+
+from . import cache_consultorio
+from .models import Usuario
+
+CLAVE = f"{cache_consultorio.PREFIJO}:directorio:destinatarios"
+ROLES = ("admin", "asistente")
+
+
+def _construir() -> dict:
+    directorio: Dict[str, list] = {"admin": [], "asistente": {}}
+    filas = Usuario.objects.filter(is_active=True, rol__in=ROLES).values_list(
+        "id", "rol", "consultorio_id"
+    )
+    for usuario_id, rol, consultorio_id in filas.order_by("id"):
+        if rol == "admin":
+            directorio["admin"].append(usuario_id)
+        else:
+            directorio["asistente"].setdefault(consultorio_id, []).append(usuario_id)
+    return directorio
+
+
+def _directorio() -> dict:
+    return cache_consultorio.obtener_o_calcular(CLAVE, _construir)
+
+
+def admins() -> List[int]:
+    """Ids de los administradores activos."""
+    return list(_directorio()["admin"])
+
+
+def asistentes(consultorio_id: Optional[int]) -> List[int]:
+    """Ids de los asistentes activos del consultorio."""
+    if not consultorio_id:
+        return []
+    return list(_directorio()["asistente"].get(consultorio_id, []))
+
+
+def invalidar() -> None:
+    # Ya y otra vez tras el COMMIT: entre ambos otra petición podría haber
+    # vuelto a cachear el directorio viejo
+    cache = cache_consultorio.obtener_cache()
+    cache.delete(CLAVE)
+    transaction.on_commit(lambda: cache.delete(CLAVE))
+
+
+__all__ = ["admins", "asistentes", "invalidar"]
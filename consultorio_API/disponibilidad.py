@@ -0,0 +1,291 @@
+# consultorio_API/disponibilidad.py
+# -*- coding: utf-8 -*-
+"""
+Motor de disponibilidad de horarios.
+
+Una :class:`Agenda` guarda, para cada día de un rango, la jornada laboral
+(horario del consultorio combinado con los turnos de ``HorarioMedico``) y las
+citas que ocupan tiempo, todo como intervalos ordenados en minutos desde la
+medianoche. Encontrar los huecos de ``N`` minutos con paso ``S`` es un
+barrido con dos punteros: O(citas + huecos) por día, sin tablas por minuto.
+
+:func:`cargar_agenda` arma la agenda de un rango de días con una consulta de
+citas y otra de turnos, independientemente del número de días.
+
+Al editar una cita (``excluir_id``) su propio horario se suma a la jornada de
+su día: una cita agendada fuera de los turnos actuales (p. ej. antes de que
+se registraran) puede conservar su hora.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Cita, HorarioMedico
+
+# Estados de cita que ocupan el consultorio
+ESTADOS_OCUPAN = ("programada", "confirmada", "en_espera", "en_atencion", "reprogramada")
+
+# Índice de ``date.weekday()`` → valor de ``HorarioMedico.dia``
+DIAS_SEMANA = tuple(clave for clave, _ in HorarioMedico.DIAS_SEMANA)
+
+APERTURA_DEFECTO = time(7, 0)
+CIERRE_DEFECTO = time(18, 0)
+
+Tramo = Tuple[int, int]                 # [inicio, fin) en minutos
+Ocupado = Tuple[int, int, str]          # [inicio, fin) y a quién pertenece
+
+
+def _minutos(h: time) -> int:
+    return h.hour * 60 + h.minute
+
+
+def _hora(valor, defecto: time) -> time:
+    # Un Consultorio recién creado conserva el default "09:00" como texto
+    if not valor:
+        return defecto
+    return time.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def _to_local(dt: datetime) -> datetime:
+    return timezone.localtime(dt).replace(tzinfo=None) if timezone.is_aware(dt) else dt
+
+
+def _unir(tramos) -> List[Tramo]:
+    """Une tramos solapados o contiguos; el resultado queda ordenado."""
+    unidos: List[List[int]] = []
+    for ini, fin in sorted(tramos):
+        if unidos and ini <= unidos[-1][1]:
+            unidos[-1][1] = max(unidos[-1][1], fin)
+        else:
+            unidos.append([ini, fin])
+    return [(ini, fin) for ini, fin in unidos]
+
+
+def _intersecar(a: List[Tramo], b: List[Tramo]) -> List[Tramo]:
+    resultado, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        ini, fin = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if ini < fin:
+            resultado.append((ini, fin))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return resultado
+
+
+@dataclass(frozen=True)
+class Hueco:
+    inicio: datetime
+    duracion: int
+
+    @property
+    def fin(self) -> datetime:
+        return self.inicio + timedelta(minutes=self.duracion)
+
+
+@dataclass(frozen=True)
+class Opcion:
+    """Una hora candidata del día: libre, u ocupada por ``ocupado_por``."""
+    minuto: int
+    libre: bool
+    ocupado_por: Optional[str] = None
+
+    @property
+    def hora(self) -> time:
+        return time(*divmod(self.minuto, 60))
+
+
+class Agenda:
+    """Jornadas y ocupación de un rango de días, como intervalos ordenados."""
+
+    def __init__(self, desde: date, hasta: date,
+                 jornadas: Dict[date, List[Tramo]],
+                 ocupados: Dict[date, List[Ocupado]]):
+        self.desde = desde
+        self.hasta = hasta
+        self._jornadas = jornadas
+        self._ocupados = {dia: sorted(citas) for dia, citas in ocupados.items()}
+
+    def dias(self) -> Iterator[date]:
+        dia = self.desde
+        while dia <= self.hasta:
+            yield dia
+            dia += timedelta(days=1)
+
+    def jornada(self, dia: date) -> List[Tramo]:
+        return self._jornadas.get(dia, [])
+
+    def ocupados(self, dia: date) -> List[Ocupado]:
+        return self._ocupados.get(dia, [])
+
+    def _bloques(self, dia: date) -> List[Ocupado]:
+        """Ocupación unida (sin solapes) conservando el primer ocupante."""
+        bloques: List[List] = []
+        for ini, fin, quien in self.ocupados(dia):
+            if bloques and ini < bloques[-1][1]:
+                bloques[-1][1] = max(bloques[-1][1], fin)
+            else:
+                bloques.append([ini, fin, quien])
+        return [tuple(b) for b in bloques]
+
+    def opciones(self, dia: date, duracion: int, paso: int,
+                 desde_minuto: int = 0) -> Iterator[Opcion]:
+        """
+        Horas de inicio del día cada ``paso`` minutos dentro de la jornada.
+
+        Son libres si caben ``duracion`` minutos sin tocar otra cita; se
+        reportan como ocupadas las que caen dentro de una cita. Las que sólo
+        chocan con la siguiente cita no se ofrecen.
+        """
+        bloques = self._bloques(dia)
+        j = 0
+        for tramo_ini, tramo_fin in self.jornada(dia):
+            inicio = max(tramo_ini, desde_minuto)
+            # Alinear al paso contando desde el inicio del tramo
+            inicio = tramo_ini + -(-(inicio - tramo_ini) // paso) * paso
+            for minuto in range(inicio, tramo_fin - duracion + 1, paso):
+                while j < len(bloques) and bloques[j][1] <= minuto:
+                    j += 1
+                if j < len(bloques) and bloques[j][0] <= minuto:
+                    yield Opcion(minuto, False, bloques[j][2])
+                elif j == len(bloques) or bloques[j][0] >= minuto + duracion:
+                    yield Opcion(minuto, True)
+
+    def huecos(self, duracion: int, paso: int,
+               desde: Optional[datetime] = None) -> Iterator[Hueco]:
+        """Huecos libres de ``duracion`` minutos en orden cronológico."""
+        desde = desde or datetime.combine(self.desde, time.min)
+        for dia in self.dias():
+            if dia < desde.date():
+                continue
+            minimo = _minutos(desde.time()) if dia == desde.date() else 0
+            for opcion in self.opciones(dia, duracion, paso, minimo):
+                if opcion.libre:
+                    yield Hueco(datetime.combine(dia, opcion.hora), duracion)
+
+    def esta_libre(self, inicio: datetime, duracion: int) -> bool:
+        """¿Cabe una cita de ``duracion`` minutos en ``inicio``?"""
+        inicio = _to_local(inicio)
+        dia, ini = inicio.date(), _minutos(inicio.time())
+        fin = ini + duracion
+        if not any(t_ini <= ini and fin <= t_fin for t_ini, t_fin in self.jornada(dia)):
+            return False
+        return all(fin <= o_ini or o_fin <= ini for o_ini, o_fin, _ in self.ocupados(dia))
+
+
+# ───────────────────────── Carga desde la BD ─────────────────────────
+def _jornadas(consultorio, desde: date, hasta: date, medico=None) -> Dict[date, List[Tramo]]:
+    base = [(
+        _minutos(_hora(consultorio.horario_apertura, APERTURA_DEFECTO)),
+        _minutos(_hora(consultorio.horario_cierre, CIERRE_DEFECTO)),
+    )]
+    if base[0][1] <= base[0][0]:
+        return {}
+
+    turnos = HorarioMedico.objects.filter(consultorio=consultorio)
+    if medico is not None:
+        turnos = turnos.filter(medico=medico)
+    por_dia: Dict[str, List[Tramo]] = defaultdict(list)
+    for dia, h_ini, h_fin in turnos.values_list("dia", "hora_inicio", "hora_fin"):
+        por_dia[dia].append((_minutos(h_ini), _minutos(h_fin)))
+
+    jornadas = {}
+    dia = desde
+    while dia <= hasta:
+        turnos_dia = por_dia.get(DIAS_SEMANA[dia.weekday()])
+        if turnos_dia:
+            jornadas[dia] = _intersecar(base, _unir(turnos_dia))
+        elif medico is None or not por_dia:
+            # Sin turnos registrados ese día rige el horario del consultorio;
+            # un médico con turnos configurados sólo atiende en ellos.
+            jornadas[dia] = base
+        dia += timedelta(days=1)
+    return jornadas
+
+
+def _ocupados(consultorio, desde: date, hasta: date, medico=None,
+              excluir_id=None) -> Tuple[Dict[date, List[Ocupado]], Dict[date, Tramo]]:
+    """Citas que ocupan cada día y, aparte, el horario de la cita ``excluir_id``."""
+    filtro = Q(consultorio=consultorio)
+    if medico is not None:
+        filtro |= Q(medico_asignado=medico)
+    filtro &= Q(estado__in=ESTADOS_OCUPAN)
+    if excluir_id:
+        filtro |= Q(pk=excluir_id, consultorio=consultorio)
+    qs = Cita.objects.filter(
+        filtro,
+        fecha_hora__gte=datetime.combine(desde, time.min),
+        fecha_hora__lt=datetime.combine(hasta + timedelta(days=1), time.min),
+    )
+
+    ocupados: Dict[date, List[Ocupado]] = defaultdict(list)
+    propio: Dict[date, Tramo] = {}
+    for pk, fecha_hora, duracion, paciente in qs.values_list(
+        "pk", "fecha_hora", "duracion", "paciente__nombre_completo"
+    ).order_by():
+        inicio = _to_local(fecha_hora)
+        ini = _minutos(inicio.time())
+        tramo = (ini, ini + (duracion or 0))
+        if excluir_id and str(pk) == str(excluir_id):
+            propio[inicio.date()] = tramo
+        else:
+            ocupados[inicio.date()].append((*tramo, paciente))
+    return ocupados, propio
+
+
+def cargar_agenda(consultorio, desde: date, hasta: Optional[date] = None,
+                  medico=None, excluir_id=None) -> Agenda:
+    """
+    Agenda de ``consultorio`` (y opcionalmente de ``medico``) entre ``desde``
+    y ``hasta`` inclusive. ``excluir_id`` es la cita que se edita: no ocupa
+    y su horario actual cuenta como parte de la jornada.
+    """
+    hasta = hasta or desde
+    jornadas = _jornadas(consultorio, desde, hasta, medico)
+    ocupados, propio = _ocupados(consultorio, desde, hasta, medico, excluir_id)
+    for dia, tramo in propio.items():
+        jornadas[dia] = _unir(jornadas.get(dia, []) + [tramo])
+    return Agenda(desde, hasta, jornadas, ocupados)
+
+
+def esta_libre(consultorio, inicio: datetime, duracion: int,
+               medico=None, excluir_id=None) -> bool:
+    dia = _to_local(inicio).date()
+    return cargar_agenda(consultorio, dia, medico=medico, excluir_id=excluir_id).esta_libre(
+        inicio, duracion
+    )
+
+
+def proximos_huecos(consultorio, duracion: int, desde: date, cantidad: int = 10,
+                    medico=None, paso: int = 15, dias: int = 28) -> List[Hueco]:
+    """
+    Los siguientes ``cantidad`` huecos libres a partir de ``desde`` dentro de
+    los próximos ``dias`` días, con una sola carga de agenda para todo el
+    rango. Nunca devuelve horas ya pasadas.
+    """
+    ahora = _to_local(timezone.now())
+    inicio = max(datetime.combine(desde, time.min), ahora.replace(second=0, microsecond=0))
+    agenda = cargar_agenda(
+        consultorio, inicio.date(), inicio.date() + timedelta(days=dias - 1), medico=medico
+    )
+    return list(islice(agenda.huecos(duracion, paso, desde=inicio), cantidad))
+
+
+__all__ = [
+    "Agenda",
+    "ESTADOS_OCUPAN",
+    "Hueco",
+    "Opcion",
+    "cargar_agenda",
+    "esta_libre",
+    "proximos_huecos",
+]
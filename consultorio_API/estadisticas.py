@@ -0,0 +1,271 @@
+# consultorio_API/estadisticas.py
+# -*- coding: utf-8 -*-
+"""
+Servicio de estadísticas para los dashboards.
+
+Todas las cifras (KPIs y gráficas) se obtienen con agregados condicionales
+(``Count(filter=Q(...))``) sobre el alcance del rol, de modo que el dashboard
+resuelve sus números en un puñado de consultas en lugar de un COUNT por cifra.
+Los conteos históricos por estado y las series por día se leen del rollup
+``ResumenDiario`` en lugar de recorrer las tablas de citas y consultas.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Cita, Consulta, Paciente, ResumenDiario
+
+
+# Orden y etiquetas de la gráfica de estados del dashboard
+ESTADOS_GRAFICA = (
+    ("programada", "Programadas"),
+    ("confirmada", "Confirmadas"),
+    ("en_espera", "En Espera"),
+    ("completada", "Completadas"),
+    ("cancelada", "Canceladas"),
+    ("no_asistio", "No Asistió"),
+)
+
+DIAS_GRAFICA = 30
+
+
+# ───────────────────────── Alcance por rol ─────────────────────────
+def citas_por_rol(user):
+    """Citas visibles para el dashboard del usuario."""
+    qs = Cita.objects.all()
+    if user.rol == "medico":
+        qs = qs.filter(Q(consultorio=user.consultorio) | Q(medico_asignado=user))
+    elif user.rol == "asistente" and user.consultorio:
+        qs = qs.filter(consultorio=user.consultorio)
+    return qs
+
+
+def consultas_por_rol(user):
+    """Consultas visibles para el dashboard del usuario."""
+    qs = Consulta.objects.all()
+    if user.rol == "medico":
+        qs = qs.filter(medico=user)
+    elif user.rol == "asistente" and user.consultorio:
+        qs = qs.filter(medico__consultorio=user.consultorio)
+    return qs
+
+
+def pacientes_por_rol(user):
+    """Pacientes visibles para el dashboard del usuario."""
+    qs = Paciente.objects.all()
+    if user.rol in ("medico", "asistente") and user.consultorio:
+        qs = qs.filter(consultorio=user.consultorio)
+    return qs
+
+
+def resumen_citas_por_rol(user):
+    """Filas del rollup equivalentes a :func:`citas_por_rol`."""
+    qs = ResumenDiario.objects.all()
+    if user.rol == "medico":
+        qs = qs.filter(Q(consultorio=user.consultorio) | Q(medico=user))
+    elif user.rol == "asistente" and user.consultorio:
+        qs = qs.filter(consultorio=user.consultorio)
+    return qs
+
+
+def resumen_consultas_por_rol(user):
+    """Filas del rollup equivalentes a :func:`consultas_por_rol`."""
+    qs = ResumenDiario.objects.all()
+    if user.rol == "medico":
+        qs = qs.filter(medico=user)
+    elif user.rol == "asistente" and user.consultorio:
+        qs = qs.filter(consultorio=user.consultorio)
+    return qs
+
+
+# ───────────────────────── Resultado tipado ─────────────────────────
+@dataclass(frozen=True)
+class EstadisticasDashboard:
+    citas_hoy: int = 0
+    citas_ayer: int = 0
+    consultas_finalizadas: int = 0
+    consultas_pendientes: int = 0
+    pacientes_totales: int = 0
+    pacientes_nuevos: int = 0
+
+    @property
+    def citas_hoy_diff(self) -> str:
+        diff = self.citas_hoy - self.citas_ayer
+        return f"+{diff}" if diff >= 0 else f"{diff}"
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "citas_hoy": self.citas_hoy,
+            "citas_hoy_diff": self.citas_hoy_diff,
+            "consultas_finalizadas": self.consultas_finalizadas,
+            "consultas_pendientes": self.consultas_pendientes,
+            "pacientes_totales": self.pacientes_totales,
+            "pacientes_nuevos": self.pacientes_nuevos,
+        }
+
+
+@dataclass(frozen=True)
+class GraficasDashboard:
+    labels_estados: List[str]
+    data_estados: List[int]
+    labels_dias: List[str]
+    data_dias: List[int]
+
+
+# ───────────────────────── Cálculo ─────────────────────────
+def _suma(campo: str, **filtro) -> Sum:
+    return Sum(campo, filter=Q(**filtro) if filtro else None, default=0)
+
+
+def conteos_por_estado(resumen, campo: str, estados) -> Dict[str, int]:
+    """``{estado: total}`` de ``campo`` ("citas" o "consultas") en una consulta."""
+    return resumen.aggregate(**{estado: _suma(campo, estado=estado) for estado in estados})
+
+
+def calcular_estadisticas(user, hoy: Optional[date] = None) -> EstadisticasDashboard:
+    """KPIs del dashboard en tres consultas agregadas (citas, consultas, pacientes)."""
+    hoy = hoy or timezone.now().date()
+    ayer = hoy - timedelta(days=1)
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    inicio_mes = hoy.replace(day=1)
+
+    citas = citas_por_rol(user).filter(fecha_hora__date__range=(ayer, hoy)).aggregate(
+        hoy=Count("id", filter=Q(fecha_hora__date=hoy)),
+        ayer=Count("id", filter=Q(fecha_hora__date=ayer)),
+    )
+
+    consultas = consultas_por_rol(user).aggregate(
+        finalizadas=Count(
+            "id", filter=Q(estado="finalizada", fecha_atencion__date__gte=inicio_semana)
+        ),
+        pendientes=Count("id", filter=Q(estado__in=["espera", "en_progreso"])),
+    )
+
+    # Paciente no registra fecha de alta: los "nuevos" sólo se cuentan si el
+    # modelo llega a tener ese campo.
+    campos_paciente = {f.name for f in Paciente._meta.get_fields()}
+    conteos_pacientes = {"total": Count("id")}
+    if "fecha_creacion" in campos_paciente:
+        conteos_pacientes["nuevos"] = Count(
+            "id", filter=Q(fecha_creacion__date__gte=inicio_mes)
+        )
+    pacientes = pacientes_por_rol(user).aggregate(**conteos_pacientes)
+
+    return EstadisticasDashboard(
+        citas_hoy=citas["hoy"],
+        citas_ayer=citas["ayer"],
+        consultas_finalizadas=consultas["finalizadas"],
+        consultas_pendientes=consultas["pendientes"],
+        pacientes_totales=pacientes["total"],
+        pacientes_nuevos=pacientes.get("nuevos", 0),
+    )
+
+
+def calcular_graficas(user, hoy: Optional[date] = None) -> GraficasDashboard:
+    """Datos de las gráficas del dashboard, leídos del rollup en dos consultas."""
+    hoy = hoy or timezone.now().date()
+    por_estado = conteos_por_estado(
+        resumen_citas_por_rol(user), "citas", [e for e, _ in ESTADOS_GRAFICA]
+    )
+
+    desde = hoy - timedelta(days=DIAS_GRAFICA)
+    por_dia = dict(
+        resumen_consultas_por_rol(user)
+        .filter(estado="finalizada", fecha__gte=desde)
+        .values("fecha")
+        .annotate(total=Sum("consultas"))
+        .values_list("fecha", "total")
+        .order_by()
+    )
+
+    dias = [desde + timedelta(days=i) for i in range(DIAS_GRAFICA)]
+    return GraficasDashboard(
+        labels_estados=[label for _, label in ESTADOS_GRAFICA],
+        data_estados=[por_estado[estado] for estado, _ in ESTADOS_GRAFICA],
+        labels_dias=[d.strftime("%d/%m") for d in dias],
+        data_dias=[por_dia.get(d, 0) for d in dias],
+    )
+
+
+def estadisticas_citas(resumen, citas, hoy: Optional[date] = None) -> Dict[str, object]:
+    """
+    Estadísticas de citas de los endpoints AJAX.
+
+    Los conteos por estado salen del rollup ``resumen``; tipo y prioridad no
+    son dimensiones del rollup y se cuentan sobre ``citas`` en un solo agregado.
+    """
+    hoy = hoy or timezone.now().date()
+    estados = [e for e, _ in Cita.ESTADO_CHOICES]
+    totales = resumen.aggregate(
+        hoy=_suma("citas", fecha=hoy),
+        **{estado: _suma("citas", estado=estado) for estado in estados},
+    )
+    por_estado = {e: totales[e] for e in estados if totales[e]}
+
+    tipos = [t for t, _ in Cita.TIPO_CITA_CHOICES]
+    prioridades = [p for p, _ in Cita.PRIORIDAD_CHOICES]
+    otros = citas.aggregate(
+        **{f"tipo_{t}": Count("id", filter=Q(tipo_cita=t)) for t in tipos},
+        **{f"prioridad_{p}": Count("id", filter=Q(prioridad=p)) for p in prioridades},
+    )
+
+    return {
+        'total_citas': sum(por_estado.values()),
+        'citas_hoy': totales['hoy'],
+        'citas_pendientes': totales['programada'] + totales['confirmada'],
+        'citas_completadas': totales['completada'],
+        'citas_canceladas': totales['cancelada'],
+        'citas_en_espera': totales['en_espera'],
+        'por_estado': por_estado,
+        'por_tipo': {t: otros[f"tipo_{t}"] for t in tipos if otros[f"tipo_{t}"]},
+        'por_prioridad': {
+            p: otros[f"prioridad_{p}"] for p in prioridades if otros[f"prioridad_{p}"]
+        },
+    }
+
+
+def estadisticas_consultas(resumen, consultas, ahora: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Conteos de consultas por estado (rollup ``resumen``) y creadas hoy y en
+    los últimos 7 días.
+
+    "Hoy" y "semana" cuentan por ``fecha_creacion``, que no es dimensión del
+    rollup (éste agrupa por día de atención); se cuentan sobre ``consultas``
+    acotadas a la última semana.
+    """
+    ahora = ahora or timezone.now()
+    hace_semana = ahora - timedelta(days=7)
+    estados = [e for e, _ in Consulta.ESTADO_OPCIONES]
+    totales = resumen.aggregate(
+        total=_suma("consultas"),
+        **{estado: _suma("consultas", estado=estado) for estado in estados},
+    )
+    totales.update(
+        consultas.filter(fecha_creacion__gte=hace_semana).aggregate(
+            hoy=Count("id", filter=Q(fecha_creacion__date=ahora.date())),
+            semana=Count("id", filter=Q(fecha_creacion__gte=hace_semana)),
+        )
+    )
+    return totales
+
+
+__all__ = [
+    "EstadisticasDashboard",
+    "GraficasDashboard",
+    "calcular_estadisticas",
+    "calcular_graficas",
+    "citas_por_rol",
+    "consultas_por_rol",
+    "conteos_por_estado",
+    "estadisticas_citas",
+    "estadisticas_consultas",
+    "pacientes_por_rol",
+    "resumen_citas_por_rol",
+    "resumen_consultas_por_rol",
+]
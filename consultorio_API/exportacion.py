@@ -0,0 +1,235 @@
+# consultorio_API/exportacion.py
+# -*- coding: utf-8 -*-
+"""
+Exportación en streaming (CSV o JSONL) de listados grandes.
+
+:func:`respuesta_exportacion` devuelve un ``StreamingHttpResponse`` que
+recorre el queryset por tramos de ``chunk_size`` filas y envía bloques de
+líneas a medida que se generan: la memoria del worker no crece con el número
+de filas y el navegador empieza a recibir el archivo de inmediato.
+
+Los tramos son por cursor (keyset, ver :mod:`.paginacion`): cada uno pide
+las filas "después de la última leída" con ``LIMIT``. ``.iterator()`` no
+sirve para esto en MySQL, donde mysqlclient trae el resultado completo al
+cliente antes de entregar la primera fila.
+
+Parámetros GET que entiende (además de los filtros de cada listado):
+
+* ``formato=csv`` (por defecto) o ``formato=jsonl`` (un objeto JSON por línea).
+* ``gzip=1`` comprime la transferencia (``Content-Encoding: gzip``) si el
+  cliente la acepta.
+
+Las columnas se describen con :class:`Columna`; el CSV usa ``titulo`` como
+encabezado y el JSONL usa ``clave``.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from .forms import CitaFiltroForm
+from .models import Cita
+from .paginacion import _despues_de, _valores
+
+CHUNK_SIZE = 2000      # filas por tramo
+LINEAS_POR_BLOQUE = 500
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+}
+
+
+@dataclass(frozen=True)
+class Columna:
+    clave: str
+    titulo: str
+    valor: Callable[[Any], Any]
+
+
+class _Eco:
+    """Pseudo-archivo para ``csv.writer``: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+# ───────────────────────── Streaming ─────────────────────────
+def _por_tramos(queryset, orden: Sequence[str], chunk_size: int) -> Iterator[Any]:
+    """Filas de ``queryset`` en ``orden``, leídas de ``chunk_size`` en ``chunk_size``."""
+    ordenado = queryset.order_by(*orden)
+    ultimo: Optional[list] = None
+    while True:
+        tramo = ordenado if ultimo is None else ordenado.filter(_despues_de(orden, ultimo))
+        filas = list(tramo[:chunk_size])
+        yield from filas
+        if len(filas) < chunk_size:
+            return
+        ultimo = _valores(filas[-1], orden)
+
+
+def _lineas_csv(filas: Iterable, columnas: Sequence[Columna]) -> Iterator[str]:
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([c.titulo for c in columnas])
+    for fila in filas:
+        yield escritor.writerow([c.valor(fila) for c in columnas])
+
+
+def _lineas_jsonl(filas: Iterable, columnas: Sequence[Columna]) -> Iterator[str]:
+    for fila in filas:
+        datos = {c.clave: c.valor(fila) for c in columnas}
+        yield json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _bloques(lineas: Iterable[str]) -> Iterator[bytes]:
+    # Agrupar líneas evita un write() (y un flush de gzip) por fila
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= LINEAS_POR_BLOQUE:
+            yield "".join(bloque).encode("utf-8")
+            bloque = []
+    if bloque:
+        yield "".join(bloque).encode("utf-8")
+
+
+def _acepta_gzip(request) -> bool:
+    return "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "").lower()
+
+
+def respuesta_exportacion(request, queryset, columnas: Sequence[Columna], nombre: str,
+                          orden: Sequence[str] = ("id",),
+                          chunk_size: int = CHUNK_SIZE) -> StreamingHttpResponse:
+    """
+    Exporta ``queryset`` en el formato pedido sin cargarlo completo.
+
+    ``orden`` es el orden total del archivo: campos sin NULL, el último único.
+    """
+    formato = request.GET.get("formato", "csv")
+    if formato not in FORMATOS:
+        formato = "csv"
+    tipo, extension = FORMATOS[formato]
+
+    filas = _por_tramos(queryset, orden, chunk_size)
+    lineas = _lineas_csv(filas, columnas) if formato == "csv" else _lineas_jsonl(filas, columnas)
+    contenido = _bloques(lineas)
+
+    comprimir = request.GET.get("gzip") == "1" and _acepta_gzip(request)
+    if comprimir:
+        contenido = compress_sequence(contenido)
+
+    response = StreamingHttpResponse(contenido, content_type=tipo)
+    response["Content-Disposition"] = f'attachment; filename="{nombre}.{extension}"'
+    if comprimir:
+        response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+# ───────────────────────── Citas ─────────────────────────
+def _nombre(usuario, vacio: str = "") -> str:
+    return usuario.get_full_name() if usuario else vacio
+
+
+COLUMNAS_CITAS = (
+    Columna("numero_cita", "Número Cita", lambda c: c.numero_cita),
+    Columna("paciente", "Paciente", lambda c: c.paciente.nombre_completo),
+    Columna("consultorio", "Consultorio", lambda c: c.consultorio.nombre if c.consultorio else ""),
+    Columna("medico_asignado", "Médico Asignado", lambda c: _nombre(c.medico_asignado, "Sin asignar")),
+    Columna("medico_preferido", "Médico Preferido", lambda c: _nombre(c.medico_preferido)),
+    Columna("fecha_hora", "Fecha y Hora", lambda c: c.fecha_hora.strftime("%d/%m/%Y %H:%M")),
+    Columna("duracion", "Duración", lambda c: f"{c.duracion} min"),
+    Columna("estado", "Estado", lambda c: c.get_estado_display()),
+    Columna("tipo_cita", "Tipo", lambda c: c.get_tipo_cita_display()),
+    Columna("prioridad", "Prioridad", lambda c: c.get_prioridad_display()),
+    Columna("motivo", "Motivo", lambda c: c.motivo or ""),
+)
+
+
+ORDEN_CITAS = ("fecha_hora", "id")
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def citas_exportables(request):
+    """Citas visibles para el usuario con los filtros de la lista de citas."""
+    user = request.user
+    if user.rol == "admin":
+        citas = Cita.objects.all()
+    elif user.rol == "medico":
+        citas = Cita.objects.filter(Q(consultorio=user.consultorio) | Q(medico_asignado=user))
+    elif user.rol == "asistente":
+        citas = Cita.objects.filter(consultorio=user.consultorio)
+    else:
+        citas = Cita.objects.none()
+
+    citas = CitaFiltroForm(request.GET, user=user).filtrar(citas)
+
+    # Rango de fechas propio de la exportación
+    desde = _fecha(request.GET.get("fecha_desde"))
+    hasta = _fecha(request.GET.get("fecha_hasta"))
+    if desde:
+        citas = citas.filter(fecha_hora__gte=desde)
+    if hasta:
+        citas = citas.filter(fecha_hora__lt=hasta + timedelta(days=1))
+
+    return citas.select_related(
+        "paciente", "consultorio", "medico_asignado", "medico_preferido"
+    ).order_by(*ORDEN_CITAS)
+
+
+def exportar_citas(request) -> StreamingHttpResponse:
+    nombre = f"citas_{timezone.now():%Y%m%d}"
+    return respuesta_exportacion(
+        request, citas_exportables(request), COLUMNAS_CITAS, nombre, orden=ORDEN_CITAS
+    )
+
+
+# ───────────────────────── Auditoría ─────────────────────────
+COLUMNAS_AUDITORIA = (
+    Columna("fecha", "Fecha", lambda r: r.fecha.strftime("%d/%m/%Y %H:%M:%S")),
+    Columna("usuario", "Usuario", lambda r: r.usuario.get_full_name()),
+    Columna("rol", "Rol", lambda r: r.usuario.get_rol_display()),
+    Columna("accion", "Acción", lambda r: r.accion),
+    Columna("objeto", "Objeto", lambda r: f"{r.content_type.model} #{r.object_id}"),
+    Columna("descripcion", "Descripción", lambda r: r.descripcion),
+    Columna("ip", "IP", lambda r: r.ip_address or ""),
+    Columna("navegador", "Navegador", lambda r: r.user_agent[:100] if r.user_agent else ""),
+)
+
+
+ORDEN_AUDITORIA = ("-fecha", "-id")
+
+
+def exportar_auditoria(request, registros) -> StreamingHttpResponse:
+    """``registros`` llega ya filtrado por el listado de auditoría."""
+    return respuesta_exportacion(
+        request, registros, COLUMNAS_AUDITORIA, "auditoria", orden=ORDEN_AUDITORIA
+    )
+
+
+__all__ = [
+    "COLUMNAS_AUDITORIA",
+    "COLUMNAS_CITAS",
+    "Columna",
+    "citas_exportables",
+    "exportar_auditoria",
+    "exportar_citas",
+    "respuesta_exportacion",
+]
@@ -22,6 +22,7 @@ from django.db.models import Min, Q
 # ───── Modelos / utilidades internas ───────────────────────────────────
 from .models import Cita, Consultorio, Paciente, Usuario
 from .utils_horarios import obtener_horarios_disponibles_para_select
+from .reservas import reservar_cita, verificar_horario
 
 
 # ───────────────────────────────────────────────
@@ -125,6 +126,25 @@ class CitaFiltroForm(forms.Form):
             qs = qs.filter(consultorio=user.consultorio)
         self.fields["medico"].queryset = qs.order_by("first_name", "last_name")
 
+    def filtrar(self, queryset):
+        """Aplica los filtros válidos a ``queryset`` (lista y exportación)."""
+        if not self.is_valid():
+            return queryset
+        cd = self.cleaned_data
+        if cd.get("buscar"):
+            queryset = queryset.filter(
+                Q(paciente__nombre_completo__icontains=cd["buscar"]) |
+                Q(numero_cita__icontains=cd["buscar"]) |
+                Q(motivo__icontains=cd["buscar"])
+            )
+        if cd.get("fecha"):
+            queryset = queryset.filter(fecha_hora__date=cd["fecha"])
+        if cd.get("estado"):
+            queryset = queryset.filter(estado=cd["estado"])
+        if cd.get("medico"):
+            queryset = queryset.filter(medico_asignado=cd["medico"])
+        return queryset
+
     
 class ConsultaFiltroForm(forms.Form):
     """Formulario para filtrar consultas"""
@@ -406,7 +426,6 @@ class MedicamentoActualForm(forms.ModelForm):
 
 
 # ───────────────────────────── helpers / constantes ────────────────
-ESTADOS_ACTIVOS = ("programada", "confirmada", "en_espera", "en_atencion")
 PASO_MIN = 15
 DUR_CHOICES = [(str(m), f"{m} min") for m in range(PASO_MIN, 121, PASO_MIN)]
 
@@ -619,20 +638,8 @@ class CitaForm(forms.ModelForm):
 
         dur_int = int(dur)
         inicio = _fecha_hora_from_fields(dia, hora)
-        fin = inicio + timedelta(minutes=dur_int)
 
-        solapa = (
-            Cita.objects.filter(
-                consultorio=con,
-                estado__in=ESTADOS_ACTIVOS,
-                fecha_hora__lt=fin,
-            )
-            .exclude(pk=self.instance.pk)
-            .filter(fecha_hora__gte=inicio - timedelta(minutes=dur_int))
-            .exists()
-        )
-        if solapa:
-            raise ValidationError(_("La hora seleccionada se solapa con otra cita."))
+        verificar_horario(con, inicio, dur_int, excluir_id=self.instance.pk)
 
         cleaned["fecha_hora"] = inicio
         cleaned["duracion"] = dur_int  # guarda como int
@@ -644,7 +651,7 @@ class CitaForm(forms.ModelForm):
         instance.fecha_hora = self.cleaned_data.get("fecha_hora")
         instance.duracion = self.cleaned_data.get("duracion")  # int
         if commit:
-            instance.save()
+            reservar_cita(instance)
             self.save_m2m()
         return instance
 
@@ -683,7 +690,7 @@ class ReprogramarCitaForm(forms.Form):
     def save(self):
         self.cita.fecha_hora = self.cleaned_data['fecha_hora']
         self.cita.estado = 'reprogramada'
-        self.cita.save()
+        reservar_cita(self.cita)
         return self.cita
 
 
@@ -875,16 +882,7 @@ class ConsultaSinCitaForm(forms.ModelForm):
                 inicio = timezone.now()
                 fin = inicio + timedelta(minutes=30)
 
-                # Revisar citas existentes
-                citas = Cita.objects.filter(
-                    consultorio=consultorio,
-                    fecha_hora__lt=fin,
-                    estado__in=[e[0] for e in Cita.ESTADO_CHOICES if e[0] != 'cancelada']
-                )
-                for c in citas:
-                    c_fin = c.fecha_hora + timedelta(minutes=c.duracion)
-                    if inicio < c_fin and fin > c.fecha_hora:
-                        raise ValidationError('El horario se solapa con otra cita.')
+                verificar_horario(consultorio, inicio, 30)
 
                 # Revisar consultas en espera o en progreso
                 consultas = Consulta.objects.filter(
@@ -892,7 +890,7 @@ class ConsultaSinCitaForm(forms.ModelForm):
                     Q(cita__consultorio=consultorio) |
                     Q(asistente__consultorio=consultorio),
                     estado__in=['espera', 'en_progreso']
-                )
+                ).select_related('cita')
                 for con in consultas:
                     ini = con.fecha_atencion or (con.cita.fecha_hora if con.cita else con.fecha_creacion)
                     fin_con = ini + timedelta(minutes=30)
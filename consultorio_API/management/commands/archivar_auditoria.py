@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from consultorio_API.auditoria_archivo import archivar, directorio_por_defecto, limite_meses
+
+
+class Command(BaseCommand):
+    help = 'Mueve la auditoría antigua a archivos mensuales comprimidos y la borra de la tabla'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=12,
+            help='Meses completos que se conservan en la tabla (default: 12)',
+        )
+        parser.add_argument(
+            '--directorio',
+            help='Carpeta de los archivos. Por defecto, AUDITORIA_ARCHIVO_DIR',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Registros por lote archivado y borrado (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0:
+            raise CommandError('--meses no puede ser negativo')
+        directorio = options['directorio'] or directorio_por_defecto()
+        antes_de = limite_meses(options['meses'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Archivando auditoría anterior a {antes_de:%Y-%m-%d} - {timezone.now()}')
+        )
+        total = archivar(antes_de, directorio, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {total} registros archivados en {directorio}')
+        )
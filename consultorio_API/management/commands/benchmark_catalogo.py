@@ -0,0 +1,85 @@
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from consultorio_API.catalogo_excel import EXCEL_PATH, load_workbook, parsear_excel
+
+
+def libro_sintetico(ruta: Path, articulos: int, hojas: int = 2) -> Path:
+    """Libro con el formato del catálogo (bloques de 5 filas por artículo)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    por_hoja = -(-articulos // hojas)
+    n = 0
+    for h in range(hojas):
+        ws = wb.create_sheet(f"Hoja{h + 1}")
+        ws.append(["Catalogo de Articulos"])
+        for _ in range(min(por_hoja, articulos - n)):
+            relleno = [None] * 6
+            ws.append([])
+            ws.append([f"Artículo {n} tabletas {n % 50} mg caja con {n % 30} piezas"])
+            ws.append(["Clave:", str(7500000000000 + n), *relleno, "Existencia:", n % 97])
+            ws.append(["Departamento:", "Farmacia", *relleno, "Precio:", f"$ {n % 500}.50"])
+            ws.append(["Categoría:", f"Grupo {n % 13}"])
+            n += 1
+    wb.save(ruta)
+    return ruta
+
+
+class Command(BaseCommand):
+    help = 'Compara memoria pico y tiempo del parser del catálogo en modo grid y streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivo',
+            help='Excel a medir. Por defecto se genera uno sintético',
+        )
+        parser.add_argument(
+            '--articulos',
+            type=int,
+            default=2000,
+            help='Artículos del libro sintético; 0 mide CATALOGO_EXCEL_PATH (default: 2000)',
+        )
+
+    def _medir(self, ruta, streaming):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            items = parsear_excel(ruta, streaming=streaming)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return items, pico, time.perf_counter() - inicio
+
+    def handle(self, *args, **options):
+        if load_workbook is None:
+            raise CommandError('openpyxl no está instalado')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if options['archivo']:
+                ruta = Path(options['archivo'])
+            elif options['articulos'] > 0:
+                ruta = libro_sintetico(Path(tmp) / 'catalogo.xlsx', options['articulos'])
+            else:
+                ruta = EXCEL_PATH
+            if not ruta.exists():
+                raise CommandError(f'No existe {ruta}')
+
+            tamano = ruta.stat().st_size
+            self.stdout.write(f'📄 {ruta.name}: {tamano / 2**20:.1f} MiB')
+            resultados = {}
+            for nombre, streaming in (('grid', False), ('streaming', True)):
+                items, pico, segundos = self._medir(ruta, streaming)
+                resultados[nombre] = items
+                self.stdout.write(
+                    f'  {nombre:<10} {len(items):>7} artículos  '
+                    f'pico {pico / 2**20:8.1f} MiB ({pico / tamano:5.1f}× archivo)  {segundos:6.2f} s'
+                )
+
+        if resultados['grid'] != resultados['streaming']:
+            raise CommandError('❌ Los dos modos no devuelven los mismos artículos')
+        self.stdout.write(self.style.SUCCESS('✅ Mismo resultado en ambos modos'))
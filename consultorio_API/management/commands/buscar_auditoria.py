@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from consultorio_API.auditoria_archivo import buscar
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor} (use AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = 'Busca en los archivos de auditoría y escribe los registros como JSON (uno por línea)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--usuario', help='Username exacto')
+        parser.add_argument('--accion', help='Parte del nombre de la acción')
+        parser.add_argument('--modelo', help='Modelo afectado (p. ej. cita, consulta)')
+        parser.add_argument('--objeto', help='ID del objeto afectado')
+        parser.add_argument('--texto', help='Texto contenido en la descripción')
+        parser.add_argument(
+            '--directorio',
+            help='Carpeta de los archivos. Por defecto, AUDITORIA_ARCHIVO_DIR',
+        )
+
+    def handle(self, *args, **options):
+        encontrados = buscar(
+            directorio=options['directorio'],
+            desde=_fecha(options['desde']) if options['desde'] else None,
+            hasta=_fecha(options['hasta']) if options['hasta'] else None,
+            usuario=options['usuario'],
+            accion=options['accion'],
+            modelo=options['modelo'].lower() if options['modelo'] else None,
+            object_id=options['objeto'],
+            texto=options['texto'],
+        )
+        total = 0
+        for fila in encontrados:
+            self.stdout.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False))
+            total += 1
+        self.stderr.write(f'{total} registros encontrados')
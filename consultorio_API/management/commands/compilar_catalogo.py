@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from consultorio_API import catalogo_compilado
+from consultorio_API.catalogo_excel import EXCEL_PATH, catalogo_disponible, iter_articulos
+
+
+class Command(BaseCommand):
+    help = 'Compila el catálogo Excel al archivo que leen los workers (sólo si el Excel cambió)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Volver a parsear el Excel aunque el compilado esté al día',
+        )
+
+    def handle(self, *args, **options):
+        if not catalogo_disponible():
+            raise CommandError(f'Catálogo Excel no disponible: {EXCEL_PATH}')
+
+        ruta = catalogo_compilado.ruta_compilado(EXCEL_PATH)
+        if not options['forzar'] and catalogo_compilado.vigente(EXCEL_PATH, ruta):
+            self.stdout.write(self.style.SUCCESS(f'✅ {ruta.name} ya está al día'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Compilando {EXCEL_PATH.name} - {timezone.now()}')
+        )
+        catalogo_compilado.compilar(EXCEL_PATH, iter_articulos, forzar=True)
+        total = len(catalogo_compilado.leer(ruta))
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} artículos compilados en {ruta}'))
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from consultorio_API.notifications import NotificationManager
+from consultorio_API.recordatorios import ejecutar_en_bucle
 
 class Command(BaseCommand):
     help = 'Envía recordatorios de citas próximas y limpia notificaciones antiguas'
@@ -17,23 +19,56 @@ class Command(BaseCommand):
             default=30,
             help='Días de antigüedad para limpiar notificaciones (default: 30)',
         )
+        parser.add_argument(
+            '--anticipacion',
+            type=float,
+            action='append',
+            metavar='HORAS',
+            help='Horas de anticipación del recordatorio; repetible '
+                 '(default: RECORDATORIOS_ANTICIPACION_HORAS)',
+        )
+        parser.add_argument(
+            '--bucle',
+            action='store_true',
+            help='No terminar: enviar recordatorios cada --intervalo segundos',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=getattr(settings, 'RECORDATORIOS_INTERVALO', 300),
+            help='Segundos entre pasadas con --bucle (default: RECORDATORIOS_INTERVALO)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
             self.style.SUCCESS(f'Iniciando proceso de recordatorios - {timezone.now()}')
         )
-        
+
+        if options['bucle']:
+            self.stdout.write(f"🔁 Enviando recordatorios cada {options['intervalo']} s (Ctrl+C para salir)")
+            try:
+                ejecutar_en_bucle(
+                    options['intervalo'],
+                    horas=options['anticipacion'],
+                    al_enviar=lambda n: self.stdout.write(
+                        f'✅ {n} citas recordadas - {timezone.now()}'
+                    ),
+                )
+            except KeyboardInterrupt:
+                self.stdout.write('⏹️  Recordatorios detenidos')
+            return
+
         # Enviar recordatorios de citas próximas
         try:
-            NotificationManager.notificar_citas_proximas()
+            enviadas = NotificationManager.notificar_citas_proximas(horas=options['anticipacion'])
             self.stdout.write(
-                self.style.SUCCESS('✅ Recordatorios de citas próximas enviados')
+                self.style.SUCCESS(f'✅ Recordatorios enviados para {enviadas} citas próximas')
             )
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'❌ Error enviando recordatorios: {str(e)}')
             )
-        
+
         # Limpiar notificaciones antiguas si se solicita
         if options['limpiar']:
             try:
@@ -45,7 +80,7 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.ERROR(f'❌ Error limpiando notificaciones: {str(e)}')
                 )
-        
+
         self.stdout.write(
             self.style.SUCCESS('✅ Proceso completado exitosamente')
         )
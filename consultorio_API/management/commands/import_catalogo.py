@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
-from consultorio_API.catalogo_excel import buscar_articulos, catalogo_disponible
+from consultorio_API.catalogo_excel import EXCEL_PATH, catalogo_disponible, iter_articulos
 from consultorio_API.models import MedicamentoCatalogo
 
 
@@ -13,11 +13,10 @@ class Command(BaseCommand):
             self.stderr.write("Catálogo Excel no disponible")
             return
 
-        data = buscar_articulos(q="", page=1, per_page=1000000)
-        items = data.get("items", [])
         count = 0
         media_url = getattr(settings, "MEDIA_URL", "/media/")
-        for it in items:
+        # Se recorre el Excel en streaming: no se arma la lista completa
+        for it in iter_articulos(EXCEL_PATH):
             codigo = str(it.get("clave") or "").strip()
             if not codigo:
                 continue
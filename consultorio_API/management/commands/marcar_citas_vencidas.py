@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from consultorio_API.citas_vencidas import marcar_citas_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Marca como "no asistió" las citas vencidas y cancela sus consultas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Citas por lote de UPDATE (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS(f'Buscando citas vencidas - {timezone.now()}')
+        )
+        total = marcar_citas_vencidas(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {total} citas marcadas como no asistió')
+        )
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from consultorio_API.notificaciones_retencion import dias_por_defecto, purgar_leidas
+
+
+class Command(BaseCommand):
+    help = 'Borra por lotes las notificaciones leídas más antiguas que el periodo de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            help='Días de antigüedad de las notificaciones leídas a borrar '
+                 '(default: NOTIFICACIONES_RETENCION_DIAS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Notificaciones por lote de DELETE (default: 1000)',
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0.5,
+            help='Segundos de espera entre lotes (default: 0.5)',
+        )
+        parser.add_argument(
+            '--hasta',
+            help='Hora HH:MM a partir de la cual no se empiezan lotes nuevos',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sólo contar lo que se borraría',
+        )
+
+    def _hasta(self, valor):
+        if not valor:
+            return None
+        try:
+            hora = datetime.strptime(valor, '%H:%M').time()
+        except ValueError:
+            raise CommandError(f'Hora inválida: {valor} (use HH:MM)')
+        ahora = timezone.now()
+        limite = ahora.replace(hour=hora.hour, minute=hora.minute, second=0, microsecond=0)
+        return limite if limite > ahora else limite + timedelta(days=1)
+
+    def handle(self, *args, **options):
+        dias = options['dias'] if options['dias'] is not None else dias_por_defecto()
+        if dias < 0:
+            raise CommandError('--dias no puede ser negativo')
+        simular = options['dry_run']
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Simulando purga' if simular else 'Purgando'} de notificaciones leídas "
+            f'de más de {dias} días - {timezone.now()}'
+        ))
+        resultado = purgar_leidas(
+            dias,
+            batch_size=options['batch_size'],
+            pausa=options['pausa'],
+            simular=simular,
+            hasta=self._hasta(options['hasta']),
+            progreso=lambda r: self.stdout.write(
+                f'  lote {r.lotes}: {r.borradas} acumuladas (hasta id {r.ultimo_id})'
+            ),
+        )
+
+        verbo = 'se borrarían' if simular else 'borradas'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {resultado.borradas} notificaciones {verbo} en {resultado.lotes} lotes'
+        ))
+        if resultado.interrumpida:
+            self.stdout.write(self.style.WARNING(
+                f'⏸️  Detenida a la hora límite tras el id {resultado.ultimo_id}; '
+                f'la próxima ejecución continúa'
+            ))
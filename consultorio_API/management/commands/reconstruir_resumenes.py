@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from consultorio_API.resumen_diario import reconstruir
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor} (use AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de citas y consultas desde las tablas origen'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Fecha inicial (AAAA-MM-DD). Por defecto, todo el historial',
+        )
+        parser.add_argument(
+            '--hasta',
+            help='Fecha final (AAAA-MM-DD). Por defecto, sin límite',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Filas por INSERT (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        desde = _fecha(options['desde']) if options['desde'] else None
+        hasta = _fecha(options['hasta']) if options['hasta'] else None
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconstruyendo resumen diario - {timezone.now()}')
+        )
+        total = reconstruir(desde, hasta, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {total} filas de resumen generadas')
+        )
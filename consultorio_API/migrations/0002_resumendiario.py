@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 00:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicamentorecetado',
+            name='existencia',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(max_length=20)),
+                ('citas', models.PositiveIntegerField(default=0)),
+                ('consultas', models.PositiveIntegerField(default=0)),
+                ('consultorio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='consultorio_API.consultorio')),
+                ('medico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='resumendiario',
+            index=models.Index(fields=['fecha', 'estado'], name='consultorio_fecha_2094d5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resumendiario',
+            index=models.Index(fields=['consultorio', 'fecha'], name='consultorio_consult_debd68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resumendiario',
+            index=models.Index(fields=['medico', 'fecha'], name='consultorio_medico__349a36_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resumendiario',
+            unique_together={('consultorio', 'medico', 'fecha', 'estado')},
+        ),
+    ]
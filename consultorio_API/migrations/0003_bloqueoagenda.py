@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 00:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0002_resumendiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueoAgenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('consultorio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloqueos_agenda', to='consultorio_API.consultorio')),
+            ],
+            options={
+                'unique_together': {('consultorio', 'fecha')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 00:31
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0003_bloqueoagenda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditoria',
+            name='cambios',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0004_auditoria_cambios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditoria',
+            index=models.Index(fields=['fecha'], name='consultorio_fecha_d2450b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoria',
+            index=models.Index(fields=['usuario', 'fecha'], name='consultorio_usuario_8f8228_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoria',
+            index=models.Index(fields=['content_type', 'object_id'], name='consultorio_content_09708e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoria',
+            index=models.Index(fields=['accion', 'fecha'], name='consultorio_accion_9ab785_idx'),
+        ),
+    ]
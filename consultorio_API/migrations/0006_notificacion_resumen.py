@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0005_auditoria_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='agrupador',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='total',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'agrupador', 'leido'], name='consultorio_destina_f5e719_idx'),
+        ),
+    ]
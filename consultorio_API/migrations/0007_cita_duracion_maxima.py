@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-17 01:03
+
+import django.core.validators
+from django.db import migrations, models
+
+DURACION_MAXIMA = 240
+
+
+def acotar_duraciones(apps, schema_editor):
+    # Las citas más largas (anteriores al límite) se acotan antes del CHECK;
+    # la duración original queda en las notas
+    Cita = apps.get_model('consultorio_API', 'Cita')
+    for cita in Cita.objects.filter(duracion__gt=DURACION_MAXIMA).only('pk', 'duracion', 'notas'):
+        nota = f"Duración original: {cita.duracion} min (acotada a {DURACION_MAXIMA})."
+        cita.notas = f"{cita.notas}\n{nota}".strip()
+        cita.duracion = DURACION_MAXIMA
+        cita.save(update_fields=['duracion', 'notas'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0006_notificacion_resumen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cita',
+            name='duracion',
+            field=models.PositiveIntegerField(default=30, help_text='Duración en minutos', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(240)]),
+        ),
+        migrations.RunPython(acotar_duraciones, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.CheckConstraint(check=models.Q(('duracion__lte', 240)), name='cita_duracion_maxima'),
+        ),
+    ]
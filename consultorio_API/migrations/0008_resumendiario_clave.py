@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-17 01:40
+
+from django.db import migrations, models
+
+
+def rellenar_claves(apps, schema_editor):
+    # Las filas con consultorio o médico NULL pudieron duplicarse (el índice
+    # único no compara NULL); se suman en una sola antes de exigir la clave
+    ResumenDiario = apps.get_model('consultorio_API', 'ResumenDiario')
+    vistas = {}
+    for fila in ResumenDiario.objects.order_by('pk'):
+        clave = f"{fila.consultorio_id or 0}:{fila.medico_id or 0}:{fila.fecha.isoformat()}:{fila.estado}"
+        previa = vistas.get(clave)
+        if previa is None:
+            fila.clave = clave
+            fila.save(update_fields=['clave'])
+            vistas[clave] = fila
+        else:
+            previa.citas += fila.citas
+            previa.consultas += fila.consultas
+            previa.save(update_fields=['citas', 'consultas'])
+            fila.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultorio_API', '0007_cita_duracion_maxima'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumendiario',
+            name='clave',
+            field=models.CharField(editable=False, max_length=80, null=True),
+        ),
+        migrations.RunPython(rellenar_claves, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='resumendiario',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='resumendiario',
+            name='clave',
+            field=models.CharField(editable=False, max_length=80, unique=True),
+        ),
+    ]
@@ -2,13 +2,84 @@ from datetime import date
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
-from django.core.validators import RegexValidator
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import FileExtensionValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
 import uuid
 
+# ───────────────────────────────────────────────
+# 🔎 RASTREO DE CAMPOS
+# ───────────────────────────────────────────────
+class RastreoCamposMixin:
+    """
+    Recuerda los valores de ``CAMPOS_RASTREADOS`` tal como están en la BD
+    (al cargarse con ``from_db`` y después de cada ``save()``), para saber qué
+    cambió sin volver a consultar la fila. Una instancia que no viene de la
+    BD no tiene instantánea hasta que se guarda.
+
+    Las señales ``post_save`` todavía ven la instantánea previa al guardado.
+    """
+    CAMPOS_RASTREADOS: tuple = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores_iniciales = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tomar_instantanea()
+        return instance
+
+    def _tomar_instantanea(self, campos=None):
+        valores = self.__dict__
+        iniciales = dict(self._valores_iniciales or {})
+        for campo in campos or self.CAMPOS_RASTREADOS:
+            if campo in valores:  # los campos diferidos no se rastrean
+                iniciales[campo] = valores[campo]
+        self._valores_iniciales = iniciales
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is not None:
+            fields = [self._meta.get_field(c).attname for c in fields]
+        self._tomar_instantanea(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        campos = kwargs.get("update_fields")
+        if campos is not None:
+            campos = [self._meta.get_field(c).attname for c in campos]
+            campos = [c for c in campos if c in self.CAMPOS_RASTREADOS]
+        self._tomar_instantanea(campos)
+
+    def instantanea_inicial(self, campos):
+        """Tupla con el valor inicial de ``campos``, o None si no se conoce."""
+        iniciales = self._valores_iniciales
+        if iniciales is None or any(c not in iniciales for c in campos):
+            return None
+        return tuple(iniciales[c] for c in campos)
+
+    def campos_cambiados(self) -> dict:
+        """``{campo: (antes, después)}`` de los campos rastreados que cambiaron."""
+        cambios = {}
+        for campo, antes in (self._valores_iniciales or {}).items():
+            despues = self.__dict__.get(campo, antes)
+            if despues != antes:
+                cambios[campo] = (antes, despues)
+        return cambios
+
+    def cambio(self, *campos) -> bool:
+        """¿Cambió alguno de ``campos``? True si no hay instantánea."""
+        if self.instantanea_inicial(campos) is None:
+            return True
+        cambios = self.campos_cambiados()
+        return any(c in cambios for c in campos)
+
+
 # ───────────────────────────────────────────────
 # 1️⃣  USUARIOS
 # ───────────────────────────────────────────────
@@ -81,7 +152,7 @@ class Paciente(models.Model):
 # ───────────────────────────────────────────────
 # 3️⃣  CONSULTAS 
 # ───────────────────────────────────────────────
-class Consulta(models.Model):
+class Consulta(RastreoCamposMixin, models.Model):
     ESTADO_OPCIONES = [
         ('espera',      'En Espera'),
         ('en_progreso', 'En Progreso'),
@@ -106,23 +177,31 @@ class Consulta(models.Model):
     tratamiento     = models.TextField(blank=True, null=True)
     observaciones   = models.TextField(blank=True, null=True)
 
+    CAMPOS_RASTREADOS = (
+        "estado", "medico_id", "asistente_id", "cita_id",
+        "fecha_atencion", "fecha_creacion", "tipo",
+    )
+
     def save(self, *args, **kwargs):
         # Solo asignar tipo automáticamente si no se ha especificado
         if not self.tipo:
-            if self.cita:
+            if self.cita_id:
                 self.tipo = 'con_cita'
             else:
                 self.tipo = 'sin_cita'
         
         # Si viene de una cita y no tiene médico asignado, usar el de la cita
-        if self.cita and not self.medico and self.cita.medico_asignado:
+        if self.cita_id and not self.medico_id and self.cita.medico_asignado_id:
             self.medico = self.cita.medico_asignado
 
+        # La cita sólo se revisa si cambió el estado o la cita vinculada
+        sincronizar = self.cambio("estado", "cita_id")
+
         # Guardamos la consulta
         super().save(*args, **kwargs)
 
         # Sincronizar estado con la cita solo si existe cita
-        if self.cita:
+        if sincronizar and self.cita_id:
             new_estado = None
             if self.estado == 'en_progreso':
                 new_estado = 'en_atencion'
@@ -365,7 +444,11 @@ class MedicamentoRecetado(models.Model):
 # 7️⃣  CITAS MÉDICAS 
 # ────────────────────────────────────────────────
 
-class Cita(models.Model):
+# Duración máxima de una cita en minutos (acota la búsqueda de solapamientos)
+DURACION_MAXIMA_CITA = 240
+
+
+class Cita(RastreoCamposMixin, models.Model):
     ESTADO_CHOICES = [
         ('programada', 'Programada'),
         ('confirmada', 'Confirmada'),
@@ -421,7 +504,11 @@ class Cita(models.Model):
     
     # Información de la cita
     fecha_hora = models.DateTimeField()
-    duracion = models.PositiveIntegerField(default=30, help_text="Duración en minutos")
+    duracion = models.PositiveIntegerField(
+        default=30,
+        validators=[MinValueValidator(1), MaxValueValidator(DURACION_MAXIMA_CITA)],
+        help_text="Duración en minutos",
+    )
     tipo_cita = models.CharField(max_length=20, choices=TIPO_CITA_CHOICES, default='cita_normal')
     prioridad = models.CharField(max_length=10, choices=PRIORIDAD_CHOICES, default='normal')
     estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='programada')
@@ -454,6 +541,11 @@ class Cita(models.Model):
     cita_anterior = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
     motivo_cancelacion = models.TextField(blank=True)
 
+    CAMPOS_RASTREADOS = (
+        "estado", "fecha_hora", "duracion", "consultorio_id", "medico_asignado_id",
+        "paciente_id", "tipo_cita", "prioridad", "motivo_cancelacion",
+    )
+
     class Meta:
         ordering = ['fecha_hora']
         indexes = [
@@ -463,6 +555,13 @@ class Cita(models.Model):
             models.Index(fields=['paciente', 'fecha_hora']),
             models.Index(fields=['medico_asignado', 'fecha_hora']),
         ]
+        constraints = [
+            # reservas.cita_que_solapa sólo mira DURACION_MAXIMA_CITA hacia atrás
+            models.CheckConstraint(
+                check=models.Q(duracion__lte=DURACION_MAXIMA_CITA),
+                name="cita_duracion_maxima",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.numero_cita:
@@ -551,16 +650,96 @@ class Auditoria(models.Model):
     object_id     = models.CharField(max_length=255)
     objeto        = GenericForeignKey("content_type", "object_id")
 
+    # {"acciones": [...], "campos": {campo: [antes, después]}}
+    cambios       = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
     fecha         = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-fecha"]
+        indexes = [
+            models.Index(fields=["fecha"]),
+            models.Index(fields=["usuario", "fecha"]),
+            models.Index(fields=["content_type", "object_id"]),
+            models.Index(fields=["accion", "fecha"]),
+        ]
 
     def __str__(self):
         return f"{self.usuario} - {self.accion} ({self.fecha:%d/%m/%Y %H:%M})"
 
 
 
+# ───────────────────────────────────────────────
+# 📊 RESUMEN DIARIO (ROLLUP DE CITAS Y CONSULTAS)
+# ───────────────────────────────────────────────
+class ResumenDiario(models.Model):
+    """
+    Conteo materializado de citas y consultas por
+    (consultorio, médico, fecha, estado).
+
+    Se mantiene al día desde las señales de Cita/Consulta y se puede
+    reconstruir con ``manage.py reconstruir_resumenes``.
+
+    ``clave`` repite la combinación con 0 en lugar de NULL: un índice único
+    nunca considera iguales dos NULL, así que la unicidad va sobre ella.
+    """
+    clave = models.CharField(max_length=80, unique=True, editable=False)
+    consultorio = models.ForeignKey(
+        "Consultorio", on_delete=models.CASCADE, null=True, blank=True,
+        related_name="resumenes"
+    )
+    medico = models.ForeignKey(
+        "Usuario", on_delete=models.CASCADE, null=True, blank=True,
+        related_name="resumenes"
+    )
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20)
+
+    citas = models.PositiveIntegerField(default=0)
+    consultas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["fecha", "estado"]),
+            models.Index(fields=["consultorio", "fecha"]),
+            models.Index(fields=["medico", "fecha"]),
+        ]
+
+    @staticmethod
+    def clave_de(consultorio_id, medico_id, fecha, estado) -> str:
+        return f"{consultorio_id or 0}:{medico_id or 0}:{fecha.isoformat()}:{estado}"
+
+    def save(self, *args, **kwargs):
+        self.clave = self.clave_de(self.consultorio_id, self.medico_id, self.fecha, self.estado)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.fecha} {self.estado}: {self.citas} citas / {self.consultas} consultas"
+
+
+# ───────────────────────────────────────────────
+# 🔒 BLOQUEO DE AGENDA (RESERVAS CONCURRENTES)
+# ───────────────────────────────────────────────
+class BloqueoAgenda(models.Model):
+    """
+    Fila de bloqueo por (consultorio, día).
+
+    ``reservas.reservar_cita`` la toma con ``SELECT ... FOR UPDATE`` antes de
+    comprobar solapamientos, así dos reservas del mismo día en el mismo
+    consultorio se serializan en lugar de duplicar el horario.
+    """
+    consultorio = models.ForeignKey(
+        "Consultorio", on_delete=models.CASCADE, related_name="bloqueos_agenda"
+    )
+    fecha = models.DateField()
+
+    class Meta:
+        unique_together = ("consultorio", "fecha")
+
+    def __str__(self):
+        return f"{self.consultorio_id} {self.fecha}"
+
+
 class HorarioMedico(models.Model):
     DIAS_SEMANA = [
         ('lunes', 'Lunes'),
@@ -589,7 +768,9 @@ class HorarioMedico(models.Model):
 # ───────────────────────────────────────────────
 # 🔔 NOTIFICACIONES MEJORADAS
 # ───────────────────────────────────────────────
-class Notificacion(models.Model):
+class Notificacion(RastreoCamposMixin, models.Model):
+    CAMPOS_RASTREADOS = ("leido", "destinatario_id")
+
     TIPO_CHOICES = [
         ('info', 'Información'),
         ('warning', 'Advertencia'),
@@ -636,12 +817,17 @@ class Notificacion(models.Model):
     # Metadatos
     datos_extra = models.JSONField(default=dict, blank=True, help_text="Datos adicionales en formato JSON")
 
+    # Resumen (digest): eventos del mismo grupo acumulados en esta fila
+    agrupador = models.CharField(max_length=100, blank=True, default="")
+    total = models.PositiveIntegerField(default=1)
+
     class Meta:
         ordering = ["-fecha"]
         indexes = [
             models.Index(fields=['destinatario', 'leido']),
             models.Index(fields=['categoria', 'fecha']),
             models.Index(fields=['tipo', 'fecha']),
+            models.Index(fields=['destinatario', 'agrupador', 'leido']),
         ]
 
     def marcar_como_leido(self):
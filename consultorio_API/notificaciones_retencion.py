@@ -0,0 +1,95 @@
+# consultorio_API/notificaciones_retencion.py
+# -*- coding: utf-8 -*-
+"""
+Retención de notificaciones.
+
+Las notificaciones leídas con más de ``NOTIFICACIONES_RETENCION_DIAS`` días
+se borran por rangos de PK: cada lote toma los siguientes ``batch_size`` ids
+candidatos (recorriendo la PK, sin ``OFFSET``) y los borra con un ``DELETE``
+acotado a ese rango, con una pausa entre lotes. Así ninguna sentencia
+bloquea la tabla mucho tiempo y la purga puede cortarse a una hora dada
+(antes de abrir el consultorio) y retomarse después.
+
+El borrado es un ``delete()`` normal (con señales); como sólo se borran
+notificaciones leídas, el receptor del contador de no leídas las descarta
+sin tocar la caché.
+
+Se ejecuta con ``manage.py purgar_notificaciones`` (cron, fuera de horario).
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notificacion
+
+
+def dias_por_defecto() -> int:
+    return getattr(settings, "NOTIFICACIONES_RETENCION_DIAS", 30)
+
+
+@dataclass
+class ResultadoPurga:
+    borradas: int = 0
+    lotes: int = 0
+    ultimo_id: Optional[int] = None
+    interrumpida: bool = False
+
+
+def vencidas(limite: datetime):
+    return Notificacion.objects.filter(leido=True, fecha__lt=limite)
+
+
+def purgar_leidas(dias: Optional[int] = None, batch_size: int = 1000, pausa: float = 0.5,
+                  simular: bool = False, hasta: Optional[datetime] = None,
+                  progreso: Optional[Callable[[ResultadoPurga], None]] = None,
+                  ahora: Optional[datetime] = None) -> ResultadoPurga:
+    """
+    Borra (o, con ``simular``, sólo cuenta) las notificaciones leídas de más
+    de ``dias`` días. Si se da ``hasta``, no empieza lotes nuevos a partir de
+    esa hora. ``progreso`` recibe el resultado acumulado tras cada lote.
+    """
+    dias = dias_por_defecto() if dias is None else dias
+    limite = (ahora or timezone.now()) - timedelta(days=dias)
+    candidatas = vencidas(limite).order_by("id")
+    resultado = ResultadoPurga()
+
+    while True:
+        if hasta is not None and timezone.now() >= hasta:
+            resultado.interrumpida = True
+            return resultado
+
+        desde = candidatas
+        if resultado.ultimo_id is not None:
+            desde = desde.filter(id__gt=resultado.ultimo_id)
+        ids = list(desde.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return resultado
+
+        rango = vencidas(limite).filter(id__gte=ids[0], id__lte=ids[-1]).order_by()
+        if simular:
+            borradas = len(ids)
+        else:
+            with transaction.atomic():
+                _, por_modelo = rango.delete()
+            borradas = por_modelo.get(Notificacion._meta.label, 0)
+
+        resultado.borradas += borradas
+        resultado.lotes += 1
+        resultado.ultimo_id = ids[-1]
+        if progreso:
+            progreso(resultado)
+        if len(ids) < batch_size:
+            return resultado
+        if pausa and not simular:
+            time.sleep(pausa)
+
+
+__all__ = ["ResultadoPurga", "dias_por_defecto", "purgar_leidas", "vencidas"]
@@ -1,11 +1,21 @@
+from collections import defaultdict
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Q
 from .models import Notificacion, Usuario, Cita, Consulta, Auditoria
 from .models import Notificacion    
 from django.contrib.contenttypes.models import ContentType  
+from . import contador_notificaciones, destinatarios
 
 class NotificationManager:
+    # Acciones de auditoría que se notifican a los administradores
+    ACCIONES_CRITICAS = (
+        'login_fallido', 'eliminar_paciente', 'eliminar_usuario',
+        'cancelar_cita', 'eliminar_consulta', 'crear_usuario'
+    )
+
     @staticmethod
     def crear_notificacion(
         usuario, tipo, titulo, mensaje,
@@ -18,7 +28,7 @@ class NotificationManager:
             "titulo": titulo,
             "mensaje": mensaje,
             "categoria": categoria,
-            "url_accion": url_accion,
+            "url_accion": url_accion or "",
         }
         if objeto_relacionado:
             datos["content_type"] = ContentType.objects.get_for_model(objeto_relacionado)
@@ -27,96 +37,214 @@ class NotificationManager:
         return Notificacion.objects.create(**datos)
     
     
+    @staticmethod
+    def construir_notificacion(
+        destinatario_id, tipo, titulo, mensaje,
+        categoria="general",
+        objeto_relacionado=None, url_accion=None
+    ):
+        """Notificación sin guardar, para :meth:`enviar_notificaciones`."""
+        notificacion = Notificacion(
+            destinatario_id=destinatario_id,
+            tipo=tipo,
+            titulo=titulo,
+            mensaje=mensaje,
+            categoria=categoria,
+            url_accion=url_accion or "",
+        )
+        if objeto_relacionado is not None:
+            notificacion.content_type = ContentType.objects.get_for_model(objeto_relacionado)
+            notificacion.object_id = str(objeto_relacionado.pk)
+        return notificacion
+
+    @staticmethod
+    def enviar_notificaciones(notificaciones):
+        """
+        Guarda las notificaciones al confirmar la transacción: las de grupos
+        en modo resumen actualizan la fila abierta del destinatario y el
+        resto se inserta con un solo ``bulk_create``.
+        """
+        notificaciones = list(notificaciones)
+        if notificaciones:
+            transaction.on_commit(lambda: NotificationManager.guardar_notificaciones(notificaciones))
+
+    @staticmethod
+    def guardar_notificaciones(notificaciones):
+        """
+        Como :meth:`enviar_notificaciones` pero dentro de la transacción en
+        curso (el contador de no leídas se ajusta al confirmar).
+        """
+        with transaction.atomic():
+            nuevas = NotificationManager._acumular_resumenes(list(notificaciones))
+            Notificacion.objects.bulk_create(nuevas)
+            transaction.on_commit(lambda: contador_notificaciones.sumar_creadas(nuevas))
+        return nuevas
+
+    # ── Modo resumen (digest) ──────────────────────────────────────
+    @staticmethod
+    def ventana_resumen(rol):
+        """Segundos de la ventana de resumen para ``rol`` (0: una fila por evento)."""
+        return int(getattr(settings, "NOTIFICACIONES_RESUMEN", {}).get(rol, 0) or 0)
+
+    @staticmethod
+    def _acumular_resumenes(notificaciones):
+        """
+        Suma a la fila de resumen abierta (sin leer y con actividad dentro de
+        la ventana) de cada destinatario; devuelve las que hay que insertar.
+
+        Debe llamarse dentro de una transacción: se bloquean las filas de
+        ``Usuario`` de los destinatarios (en orden de id) hasta confirmar, así
+        dos envíos simultáneos al mismo destinatario no pierden eventos ni
+        abren dos filas de resumen.
+        """
+        nuevas, grupos = [], defaultdict(list)
+        for notificacion in notificaciones:
+            if notificacion.agrupador:
+                grupos[(notificacion.agrupador, notificacion._ventana)].append(notificacion)
+            else:
+                nuevas.append(notificacion)
+
+        if not grupos:
+            return nuevas
+        ids = {n.destinatario_id for del_grupo in grupos.values() for n in del_grupo}
+        list(Usuario.objects.select_for_update().filter(pk__in=ids).order_by("pk").values_list("pk"))
+
+        ahora = timezone.now()
+        for (agrupador, ventana), del_grupo in grupos.items():
+            abiertas = {}
+            # Lectura con bloqueo: ve lo confirmado por quien tuvo el bloqueo antes
+            for fila in Notificacion.objects.select_for_update().filter(
+                destinatario_id__in=[n.destinatario_id for n in del_grupo],
+                agrupador=agrupador,
+                leido=False,
+                fecha__gte=ahora - timedelta(seconds=ventana),
+            ).order_by("id").values("id", "destinatario_id", "total"):
+                abiertas[fila["destinatario_id"]] = fila  # la más reciente gana
+
+            # Varios eventos para el mismo destinatario cuentan juntos
+            por_destinatario = defaultdict(list)
+            for notificacion in del_grupo:
+                por_destinatario[notificacion.destinatario_id].append(notificacion)
+
+            por_total = defaultdict(list)
+            for destinatario_id, eventos in por_destinatario.items():
+                ultima = eventos[-1]
+                fila = abiertas.get(destinatario_id)
+                if fila is not None:
+                    por_total[(fila["total"], len(eventos))].append((fila["id"], ultima))
+                elif len(eventos) == 1:
+                    nuevas.append(ultima)
+                else:
+                    ultima.total = len(eventos)
+                    ultima.titulo, ultima.mensaje = ultima._resumen(ultima.total)
+                    nuevas.append(ultima)
+
+            # Todos los destinatarios suelen ir al mismo paso: un UPDATE por total
+            for (total, suma), filas in por_total.items():
+                ultima = filas[-1][1]
+                titulo, mensaje = ultima._resumen(total + suma)
+                Notificacion.objects.filter(id__in=[i for i, _ in filas]).update(
+                    total=total + suma,
+                    titulo=titulo,
+                    mensaje=mensaje,
+                    fecha=ahora,
+                    content_type=ultima.content_type,
+                    object_id=ultima.object_id,
+                    url_accion=ultima.url_accion,
+                )
+        return nuevas
+
+    @staticmethod
+    def _para(destinatarios, rol=None, agrupador="", resumen=None, **datos):
+        """
+        Notificaciones para ``destinatarios``. Si ``rol`` tiene ventana de
+        resumen y se da ``agrupador``, ``resumen(total)`` devuelve el
+        ``(titulo, mensaje)`` de la fila acumulada.
+        """
+        ventana = NotificationManager.ventana_resumen(rol) if agrupador and resumen else 0
+        notificaciones = []
+        for destinatario_id in destinatarios:
+            notificacion = NotificationManager.construir_notificacion(destinatario_id, **datos)
+            if ventana:
+                notificacion.agrupador = agrupador
+                notificacion._ventana = ventana
+                notificacion._resumen = resumen
+            notificaciones.append(notificacion)
+        return notificaciones
+
     @staticmethod
     def notificar_cita_creada(cita):
         """Notificar sobre nueva cita creada"""
-        # Notificar a administradores
-        admins = Usuario.objects.filter(rol='admin', is_active=True)
-        for admin in admins:
-            NotificationManager.crear_notificacion(
-                usuario=admin,
-                tipo='info',
-                titulo='Nueva Cita Creada',
-                mensaje=f'Cita #{cita.numero_cita} creada para {cita.paciente.nombre_completo}',
-                categoria='citas',
-                objeto_relacionado=cita,
-                url_accion=f'/citas/{cita.pk}/'
-            )
-        
-        # Notificar al médico asignado (si existe)
-        if cita.medico_asignado:
-            NotificationManager.crear_notificacion(
-                usuario=cita.medico_asignado,
-                tipo='info',
+        comun = dict(tipo='info', categoria='citas', objeto_relacionado=cita,
+                     url_accion=f'/citas/{cita.pk}/')
+        paciente = cita.paciente.nombre_completo
+        consultorio = cita.consultorio.nombre if cita.consultorio else 'sin consultorio'
+
+        def en_consultorio(total):
+            return 'Nuevas Citas', f'{total} nuevas citas en {consultorio}'
+
+        # Administradores, médico asignado (si existe) y asistentes del consultorio
+        notificaciones = NotificationManager._para(
+            destinatarios.admins(), rol='admin',
+            agrupador=f'citas:{cita.consultorio_id}', resumen=en_consultorio,
+            titulo='Nueva Cita Creada',
+            mensaje=f'Cita #{cita.numero_cita} creada para {paciente}', **comun
+        )
+        if cita.medico_asignado_id:
+            notificaciones += NotificationManager._para(
+                [cita.medico_asignado_id], rol='medico',
+                agrupador='citas_asignadas',
+                resumen=lambda total: ('Citas Asignadas', f'Se te asignaron {total} citas'),
                 titulo='Cita Asignada',
-                mensaje=f'Se te ha asignado la cita #{cita.numero_cita} con {cita.paciente.nombre_completo}',
-                categoria='citas',
-                objeto_relacionado=cita,
-                url_accion=f'/citas/{cita.pk}/'
+                mensaje=f'Se te ha asignado la cita #{cita.numero_cita} con {paciente}', **comun
             )
-        
-        # Notificar a asistentes del consultorio
-        asistentes = Usuario.objects.filter(
-            rol='asistente', 
-            is_active=True,
-            consultorio=cita.consultorio
+        notificaciones += NotificationManager._para(
+            destinatarios.asistentes(cita.consultorio_id), rol='asistente',
+            agrupador=f'citas:{cita.consultorio_id}', resumen=en_consultorio,
+            titulo='Nueva Cita en Consultorio',
+            mensaje=f'Nueva cita #{cita.numero_cita} para {paciente}', **comun
         )
-        for asistente in asistentes:
-            NotificationManager.crear_notificacion(
-                usuario=asistente,
-                tipo='info',
-                titulo='Nueva Cita en Consultorio',
-                mensaje=f'Nueva cita #{cita.numero_cita} para {cita.paciente.nombre_completo}',
-                categoria='citas',
-                objeto_relacionado=cita,
-                url_accion=f'/citas/{cita.pk}/'
-            )
+        NotificationManager.enviar_notificaciones(notificaciones)
     
     @staticmethod
     def notificar_consulta_creada(consulta):
         """Notificar sobre nueva consulta creada"""
-        # Notificar a administradores
-        admins = Usuario.objects.filter(rol='admin', is_active=True)
-        for admin in admins:
-            NotificationManager.crear_notificacion(
-                usuario=admin,
-                tipo='info',
-                titulo='Nueva Consulta Creada',
-                mensaje=f'Consulta {consulta.get_tipo_display()} creada para {consulta.paciente.nombre_completo}',
-                categoria='consultas',
-                objeto_relacionado=consulta,
-                url_accion=f'/consultas/{consulta.pk}/'
-            )
-        
-        # Notificar al médico asignado
-        if consulta.medico:
-            NotificationManager.crear_notificacion(
-                usuario=consulta.medico,
-                tipo='info',
+        comun = dict(tipo='info', categoria='consultas', objeto_relacionado=consulta,
+                     url_accion=f'/consultas/{consulta.pk}/')
+        descripcion = f'{consulta.get_tipo_display()} para {consulta.paciente.nombre_completo}'
+        medico = consulta.medico if consulta.medico_id else None
+        consultorio_id = medico.consultorio_id if medico else None
+
+        def en_consultorio(total):
+            # Se evalúa sólo al acumular: el nombre no cuesta consulta si no se usa
+            nombre = medico.consultorio.nombre if consultorio_id else 'sin consultorio'
+            return 'Nuevas Consultas', f'{total} nuevas consultas en {nombre}'
+
+        notificaciones = NotificationManager._para(
+            destinatarios.admins(), rol='admin',
+            agrupador=f'consultas:{consultorio_id}', resumen=en_consultorio,
+            titulo='Nueva Consulta Creada',
+            mensaje=f'Consulta {consulta.get_tipo_display()} creada para {consulta.paciente.nombre_completo}',
+            **comun
+        )
+        if medico:
+            notificaciones += NotificationManager._para(
+                [medico.pk], rol='medico',
+                agrupador='consultas_asignadas',
+                resumen=lambda total: ('Consultas Asignadas', f'Tienes {total} consultas nuevas'),
                 titulo='Nueva Consulta Asignada',
                 mensaje=f'Consulta {consulta.get_tipo_display()} con {consulta.paciente.nombre_completo}',
-                categoria='consultas',
-                objeto_relacionado=consulta,
-                url_accion=f'/consultas/{consulta.pk}/'
-            )
-        
-        # Notificar a asistentes si fue creada por médico
-        if consulta.medico and consulta.asistente != consulta.medico:
-            asistentes = Usuario.objects.filter(
-                rol='asistente',
-                is_active=True,
-                consultorio=consulta.medico.consultorio
+                **comun
             )
-            for asistente in asistentes:
-                NotificationManager.crear_notificacion(
-                    usuario=asistente,
-                    tipo='info',
+            # Asistentes del consultorio si no la creó un asistente
+            if consulta.asistente_id != consulta.medico_id:
+                notificaciones += NotificationManager._para(
+                    destinatarios.asistentes(consultorio_id), rol='asistente',
+                    agrupador=f'consultas:{consultorio_id}', resumen=en_consultorio,
                     titulo='Nueva Consulta en Consultorio',
-                    mensaje=f'Consulta {consulta.get_tipo_display()} para {consulta.paciente.nombre_completo}',
-                    categoria='consultas',
-                    objeto_relacionado=consulta,
-                    url_accion=f'/consultas/{consulta.pk}/'
+                    mensaje=f'Consulta {descripcion}', **comun
                 )
+        NotificationManager.enviar_notificaciones(notificaciones)
     
     @staticmethod
     def notificar_signos_registrados(signos_vitales, asistente):
@@ -138,115 +266,68 @@ class NotificationManager:
     def notificar_auditoria_admin(auditoria):
         """Notificar a administradores sobre acciones importantes de auditoría"""
         # Solo notificar sobre acciones críticas
-        acciones_criticas = [
-            'login_fallido', 'eliminar_paciente', 'eliminar_usuario',
-            'cancelar_cita', 'eliminar_consulta', 'crear_usuario'
-        ]
-        
-        if auditoria.accion in acciones_criticas:
-            admins = Usuario.objects.filter(rol='admin', is_active=True)
-            
-            # Determinar tipo de notificación según la acción
-            tipo_notif = 'warning' if 'eliminar' in auditoria.accion or 'login_fallido' in auditoria.accion else 'info'
-            
-            for admin in admins:
-                NotificationManager.crear_notificacion(
-                    usuario=admin,
-                    tipo=tipo_notif,
-                    titulo='Acción de Auditoría',
-                    mensaje=f'{auditoria.usuario.get_full_name()}: {auditoria.descripcion}',
-                    categoria='auditoria',
-                    objeto_relacionado=auditoria,
-                    url_accion='/auditoria/'
-                )
+        if auditoria.accion not in NotificationManager.ACCIONES_CRITICAS:
+            return
+
+        # Determinar tipo de notificación según la acción
+        tipo_notif = 'warning' if 'eliminar' in auditoria.accion or 'login_fallido' in auditoria.accion else 'info'
+
+        accion = auditoria.accion
+        NotificationManager.enviar_notificaciones(NotificationManager._para(
+            destinatarios.admins(), rol='admin',
+            agrupador=f'auditoria:{accion}',
+            resumen=lambda total: ('Acciones de Auditoría', f'{total} eventos "{accion}"'),
+            tipo=tipo_notif,
+            titulo='Acción de Auditoría',
+            mensaje=f'{auditoria.usuario.get_full_name()}: {auditoria.descripcion}',
+            categoria='auditoria',
+            objeto_relacionado=auditoria,
+            url_accion='/auditoria/'
+        ))
     
     @staticmethod
-    def notificar_citas_proximas():
-        """Notificar sobre citas próximas (para ejecutar con cron)"""
-        # Buscar citas en las próximas 2 horas
-        ahora = timezone.now()
-        limite = ahora + timedelta(hours=2)
-        
-        citas_proximas = Cita.objects.filter(
-            fecha_hora__gte=ahora,
-            fecha_hora__lte=limite,
-            estado='confirmada'
-        ).select_related('paciente', 'medico_asignado', 'consultorio')
-        
-        for cita in citas_proximas:
-            # Verificar si ya se notificó (evitar spam)
-            ya_notificado = Notificacion.objects.filter(
-                categoria='recordatorio',
-                object_id=cita.pk,
-                fecha_creacion__gte=ahora - timedelta(hours=3)
-            ).exists()
-            
-            if not ya_notificado:
-                # Notificar a administradores
-                admins = Usuario.objects.filter(rol='admin', is_active=True)
-                for admin in admins:
-                    NotificationManager.crear_notificacion(
-                        usuario=admin,
-                        tipo='warning',
-                        titulo='Cita Próxima',
-                        mensaje=f'Cita #{cita.numero_cita} con {cita.paciente.nombre_completo} en {cita.fecha_hora.strftime("%H:%M")}',
-                        categoria='recordatorio',
-                        objeto_relacionado=cita,
-                        url_accion=f'/citas/{cita.pk}/'
-                    )
-                
-                # Notificar al médico asignado
-                if cita.medico_asignado:
-                    NotificationManager.crear_notificacion(
-                        usuario=cita.medico_asignado,
-                        tipo='warning',
-                        titulo='Cita Próxima',
-                        mensaje=f'Tienes cita con {cita.paciente.nombre_completo} en {cita.fecha_hora.strftime("%H:%M")}',
-                        categoria='recordatorio',
-                        objeto_relacionado=cita,
-                        url_accion=f'/citas/{cita.pk}/'
-                    )
+    def notificar_citas_proximas(ahora=None, horas=None):
+        """Recordatorios de citas próximas (ver ``recordatorios.py``)"""
+        from .recordatorios import enviar_recordatorios
+        return enviar_recordatorios(ahora=ahora, horas=horas)
     
     @staticmethod
-    def limpiar_notificaciones_antiguas(dias=30):
-        """Limpiar notificaciones antiguas"""
-        fecha_limite = timezone.now() - timedelta(days=dias)
-        
-        # Eliminar notificaciones leídas antiguas
-        eliminadas = Notificacion.objects.filter(
-            fecha_creacion__lt=fecha_limite,
-            leida=True
-        ).delete()
-        
-        return eliminadas[0] if eliminadas else 0
+    def limpiar_notificaciones_antiguas(dias=30, **opciones):
+        """Borrar notificaciones leídas antiguas por lotes (ver ``notificaciones_retencion.py``)"""
+        from .notificaciones_retencion import purgar_leidas
+        return purgar_leidas(dias, **opciones).borradas
     
     @staticmethod
     def marcar_como_leidas(usuario, ids_notificaciones=None):
         """Marcar notificaciones como leídas"""
-        queryset = Notificacion.objects.filter(usuario=usuario, leida=False)
+        queryset = Notificacion.objects.filter(destinatario=usuario, leido=False)
         
         if ids_notificaciones:
             queryset = queryset.filter(id__in=ids_notificaciones)
         
-        return queryset.update(leida=True, fecha_lectura=timezone.now())
+        marcadas = queryset.update(leido=True, fecha_leido=timezone.now())
+        if ids_notificaciones:
+            contador_notificaciones.ajustar(usuario.pk, -marcadas)
+        else:
+            contador_notificaciones.reiniciar(usuario.pk)
+        return marcadas
     
     @staticmethod
     def obtener_estadisticas_usuario(usuario):
         """Obtener estadísticas de notificaciones para un usuario"""
-        total = Notificacion.objects.filter(usuario=usuario).count()
-        no_leidas = Notificacion.objects.filter(usuario=usuario, leida=False).count()
-        
-        por_categoria = {}
-        categorias = Notificacion.objects.filter(usuario=usuario).values_list('categoria', flat=True).distinct()
-        
-        for categoria in categorias:
-            por_categoria[categoria] = {
-                'total': Notificacion.objects.filter(usuario=usuario, categoria=categoria).count(),
-                'no_leidas': Notificacion.objects.filter(usuario=usuario, categoria=categoria, leida=False).count()
-            }
-        
+        # Un solo GROUP BY categoria; los totales salen de sumar las filas
+        filas = (
+            Notificacion.objects.filter(destinatario=usuario)
+            .order_by()
+            .values('categoria')
+            .annotate(total=Count('id'), no_leidas=Count('id', filter=Q(leido=False)))
+        )
+        por_categoria = {
+            f['categoria']: {'total': f['total'], 'no_leidas': f['no_leidas']}
+            for f in filas
+        }
         return {
-            'total': total,
-            'no_leidas': no_leidas,
+            'total': sum(c['total'] for c in por_categoria.values()),
+            'no_leidas': sum(c['no_leidas'] for c in por_categoria.values()),
             'por_categoria': por_categoria
         }
@@ -0,0 +1,265 @@
+# consultorio_API/paginacion.py
+# -*- coding: utf-8 -*-
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+``Paginator`` hace ``COUNT(*)`` y luego ``OFFSET n``: cada página más
+profunda obliga a la base a recorrer y descartar todas las anteriores. Aquí
+la página siguiente se pide "después de la última fila vista" sobre un orden
+total, p. ej. ``(-fecha, -id)``::
+
+    WHERE fecha < :f OR (fecha = :f AND id < :id) ORDER BY fecha DESC, id DESC LIMIT 21
+
+que con un índice en esas columnas cuesta lo mismo en la página 1 que en la
+1000. El cursor (parámetro GET ``cursor``) es opaco: codifica los valores de
+la fila frontera y la dirección.
+
+Los campos del orden no deben admitir NULL y el último debe ser único
+(normalmente ``id``). El total es opcional: :func:`total_aproximado` cuenta
+como mucho ``limite`` filas o usa la estadística de la tabla en MySQL.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.db import connections
+from django.db.models import Q
+
+PARAMETRO = "cursor"
+LIMITE_CONTEO = 10000
+
+SIGUIENTE = "s"
+ANTERIOR = "a"
+
+# Tipos de total (ver total_aproximado)
+TOTAL_EXACTO = "exacto"
+TOTAL_ACOTADO = "acotado"    # hay al menos ese número de filas
+TOTAL_ESTIMADO = "estimado"  # estadística de la tabla: puede pasarse o quedarse corto
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+# ───────────────────────── Cursor ─────────────────────────
+def _campos(orden: Sequence[str]) -> List[Tuple[str, bool]]:
+    """``("-fecha", "-id")`` → ``[("fecha", True), ("id", True)]`` (desc)."""
+    return [(c.lstrip("-"), c.startswith("-")) for c in orden]
+
+
+def _a_json(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else (
+        valor if isinstance(valor, (int, float, str)) else str(valor)
+    )
+
+
+def codificar(valores: Sequence[Any], direccion: str) -> str:
+    crudo = json.dumps([direccion, [_a_json(v) for v in valores]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar(cursor: str, modelo, orden: Sequence[str]) -> Tuple[str, list]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        direccion, valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        campos = _campos(orden)
+        if direccion not in (SIGUIENTE, ANTERIOR) or len(valores) != len(campos):
+            raise ValueError
+        return direccion, [
+            modelo._meta.get_field(nombre).to_python(valor)
+            for (nombre, _), valor in zip(campos, valores)
+        ]
+    except Exception as exc:
+        raise CursorInvalido(cursor) from exc
+
+
+def _despues_de(orden: Sequence[str], valores: Sequence[Any], invertir: bool = False) -> Q:
+    """Filas que van después de ``valores`` en ``orden`` (o antes, si ``invertir``)."""
+    condicion = Q()
+    iguales = Q()
+    for (nombre, desc), valor in zip(_campos(orden), valores):
+        lookup = "lt" if desc != invertir else "gt"
+        condicion |= iguales & Q(**{f"{nombre}__{lookup}": valor})
+        iguales &= Q(**{nombre: valor})
+    return condicion
+
+
+def _valores(obj, orden: Sequence[str]) -> list:
+    meta = obj._meta
+    return [getattr(obj, meta.get_field(nombre).attname) for nombre, _ in _campos(orden)]
+
+
+# ───────────────────────── Página ─────────────────────────
+@dataclass
+class PaginaCursor:
+    object_list: list
+    orden: Sequence[str]
+    hay_siguiente: bool
+    hay_anterior: bool
+    queryset: Any = field(default=None, repr=False)
+    parametro: str = PARAMETRO
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.hay_siguiente
+
+    def has_previous(self) -> bool:
+        return self.hay_anterior
+
+    def has_other_pages(self) -> bool:
+        return self.hay_siguiente or self.hay_anterior
+
+    @property
+    def cursor_siguiente(self) -> Optional[str]:
+        if not self.hay_siguiente or not self.object_list:
+            return None
+        return codificar(_valores(self.object_list[-1], self.orden), SIGUIENTE)
+
+    @property
+    def cursor_anterior(self) -> Optional[str]:
+        if not self.hay_anterior or not self.object_list:
+            return None
+        return codificar(_valores(self.object_list[0], self.orden), ANTERIOR)
+
+
+def paginar_por_cursor(queryset, orden: Sequence[str], cursor: Optional[str],
+                       por_pagina: int) -> PaginaCursor:
+    """Una página de ``queryset`` ordenado por ``orden`` a partir de ``cursor``."""
+    ordenado = queryset.order_by(*orden)
+    if not cursor:
+        filas = list(ordenado[:por_pagina + 1])
+        return PaginaCursor(filas[:por_pagina], orden, len(filas) > por_pagina, False, queryset)
+
+    direccion, valores = decodificar(cursor, queryset.model, orden)
+    if direccion == SIGUIENTE:
+        filas = list(ordenado.filter(_despues_de(orden, valores))[:por_pagina + 1])
+        return PaginaCursor(filas[:por_pagina], orden, len(filas) > por_pagina, True, queryset)
+
+    # Hacia atrás: orden invertido y se da vuelta el resultado
+    invertido = [c[1:] if c.startswith("-") else f"-{c}" for c in orden]
+    filas = list(
+        queryset.order_by(*invertido)
+        .filter(_despues_de(orden, valores, invertir=True))[:por_pagina + 1]
+    )
+    pagina = filas[:por_pagina][::-1]
+    return PaginaCursor(pagina, orden, True, len(filas) > por_pagina, queryset)
+
+
+def paginar_grupos(grupos: Dict[str, Any], orden: Sequence[str], query,
+                   por_pagina: int) -> Dict[str, PaginaCursor]:
+    """
+    Una página por grupo (p. ej. las pestañas de un listado). Cada grupo lee
+    su cursor del parámetro ``cursor_<grupo>`` de ``query`` (``request.GET``),
+    así paginar una pestaña no mueve las demás.
+    """
+    paginas = {}
+    for nombre, queryset in grupos.items():
+        parametro = f"{PARAMETRO}_{nombre}"
+        try:
+            pagina = paginar_por_cursor(queryset, orden, query.get(parametro), por_pagina)
+        except CursorInvalido:
+            pagina = paginar_por_cursor(queryset, orden, None, por_pagina)
+        pagina.parametro = parametro
+        paginas[nombre] = pagina
+    return paginas
+
+
+# ───────────────────────── Total ─────────────────────────
+def _estimacion_mysql(queryset) -> Optional[int]:
+    conexion = connections[queryset.db]
+    if conexion.vendor != "mysql" or queryset.query.where:
+        return None
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [queryset.model._meta.db_table],
+        )
+        fila = cursor.fetchone()
+    return int(fila[0]) if fila and fila[0] is not None else None
+
+
+def total_aproximado(queryset, limite: int = LIMITE_CONTEO) -> Tuple[int, str]:
+    """
+    ``(total, tipo)``. Sin filtros en MySQL usa la estadística de la tabla
+    (``TOTAL_ESTIMADO``); si no, cuenta sólo hasta ``limite + 1`` filas
+    (``COUNT`` sobre un ``LIMIT``), así que el costo no crece con la tabla:
+    ``TOTAL_EXACTO`` o, si llegó al límite, ``TOTAL_ACOTADO``.
+    """
+    if queryset is None:
+        return 0, TOTAL_EXACTO
+    estimado = _estimacion_mysql(queryset)
+    if estimado is not None:
+        return estimado, TOTAL_ESTIMADO
+    total = queryset.order_by()[:limite + 1].count()
+    if total > limite:
+        return limite, TOTAL_ACOTADO
+    return total, TOTAL_EXACTO
+
+
+def etiqueta_total(total: int, tipo: str) -> str:
+    """``"120"``, ``"10000+"`` (acotado) o ``"≈120"`` (estimado)."""
+    if tipo == TOTAL_ACOTADO:
+        return f"{total}+"
+    if tipo == TOTAL_ESTIMADO:
+        return f"≈{total}"
+    return str(total)
+
+
+# ───────────────────────── Vistas ─────────────────────────
+class PaginacionCursorMixin:
+    """
+    Para ``ListView``: reemplaza ``Paginator`` por paginación por cursor.
+
+    Las subclases definen ``orden_cursor`` (p. ej. ``("-fecha", "-id")``) y
+    ``paginate_by``. En el contexto quedan ``page_obj`` (con
+    ``cursor_siguiente``/``cursor_anterior``) y, si ``mostrar_total`` es
+    verdadero, ``total``, ``total_tipo`` y ``total_etiqueta`` (ver
+    :func:`total_aproximado` y :func:`etiqueta_total`).
+    """
+
+    orden_cursor: Sequence[str] = ("-id",)
+    mostrar_total = False
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            pagina = paginar_por_cursor(
+                queryset, self.orden_cursor, self.request.GET.get(PARAMETRO), page_size
+            )
+        except CursorInvalido:
+            pagina = paginar_por_cursor(queryset, self.orden_cursor, None, page_size)
+        return pagina, pagina, pagina.object_list, pagina.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        if self.mostrar_total and ctx.get("page_obj") is not None:
+            total, tipo = total_aproximado(ctx["page_obj"].queryset)
+            ctx.update({
+                "total": total,
+                "total_tipo": tipo,
+                "total_etiqueta": etiqueta_total(total, tipo),
+            })
+        return ctx
+
+
+__all__ = [
+    "CursorInvalido",
+    "PaginaCursor",
+    "PaginacionCursorMixin",
+    "TOTAL_ACOTADO",
+    "TOTAL_ESTIMADO",
+    "TOTAL_EXACTO",
+    "etiqueta_total",
+    "paginar_grupos",
+    "paginar_por_cursor",
+    "total_aproximado",
+]
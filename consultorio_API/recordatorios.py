@@ -0,0 +1,154 @@
+# consultorio_API/recordatorios.py
+# -*- coding: utf-8 -*-
+"""
+Recordatorios de citas próximas.
+
+Cada cita confirmada recibe un recordatorio por cada anticipación de
+``RECORDATORIOS_ANTICIPACION_HORAS`` (p. ej. 24 h y 2 h antes). La marca de
+idempotencia es ``Cita.fecha_recordatorio``: la cita está pendiente para una
+anticipación ``A`` si ya entró en su ventana (``fecha_hora - A <= ahora``) y
+el último recordatorio se envió antes de que se abriera
+(``fecha_recordatorio < fecha_hora - A`` o nulo). Reprogramar la cita abre
+de nuevo las ventanas sin tocar la marca.
+
+Cada pasada trabaja por lotes: una consulta elige las citas pendientes, un
+``bulk_create`` guarda todos los avisos (admins y médico asignado, con el
+modo resumen de cada rol) y un único ``UPDATE`` marca las citas, todo en la
+misma transacción. El número de consultas depende de los lotes, no de
+citas × administradores.
+
+Se ejecuta con ``manage.py enviar_recordatorios`` (cron) o con
+``manage.py enviar_recordatorios --bucle`` como proceso de larga duración.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import destinatarios
+from .models import Cita
+from .notifications import NotificationManager
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_RECORDABLES = ("confirmada",)
+
+
+def anticipaciones(horas: Optional[Iterable[float]] = None) -> list:
+    """Anticipaciones configuradas como ``timedelta``, de mayor a menor."""
+    if horas is None:
+        horas = getattr(settings, "RECORDATORIOS_ANTICIPACION_HORAS", (24, 2))
+    return sorted((timedelta(hours=h) for h in horas if h > 0), reverse=True)
+
+
+def _pendientes(ahora: datetime, ventanas: Sequence[timedelta]):
+    condicion = Q()
+    for anticipacion in ventanas:
+        condicion |= Q(fecha_hora__lte=ahora + anticipacion) & (
+            Q(fecha_recordatorio__isnull=True)
+            | Q(fecha_recordatorio__lt=F("fecha_hora") - anticipacion)
+        )
+    return Cita.objects.filter(
+        condicion, fecha_hora__gte=ahora, estado__in=ESTADOS_RECORDABLES
+    )
+
+
+def _avisos(citas, ct_cita) -> list:
+    admins = destinatarios.admins()
+    avisos = []
+    for cita in citas:
+        cuando = cita["fecha_hora"].strftime("%d/%m %H:%M")
+        paciente = cita["paciente__nombre_completo"]
+        comun = dict(tipo="warning", titulo="Cita Próxima", categoria="recordatorio",
+                     url_accion=f"/citas/{cita['pk']}/")
+        por_rol = [
+            ("admin", admins, "recordatorios",
+             f"Cita #{cita['numero_cita']} con {paciente} el {cuando}"),
+        ]
+        if cita["medico_asignado_id"]:
+            por_rol.append(("medico", [cita["medico_asignado_id"]], "recordatorios_asignados",
+                            f"Tienes cita con {paciente} el {cuando}"))
+        for rol, ids, agrupador, mensaje in por_rol:
+            for aviso in NotificationManager._para(
+                ids, rol=rol, agrupador=agrupador, mensaje=mensaje,
+                resumen=lambda total: ("Citas Próximas", f"{total} citas próximas"),
+                **comun,
+            ):
+                aviso.content_type = ct_cita
+                aviso.object_id = str(cita["pk"])
+                avisos.append(aviso)
+    return avisos
+
+
+def _enviar_lote(ids, ahora: datetime, ventanas, ct_cita) -> int:
+    with transaction.atomic():
+        # Se vuelve a leer con bloqueo: otra pasada pudo enviarlos mientras tanto
+        citas = list(
+            _pendientes(ahora, ventanas).filter(pk__in=ids).select_for_update().values(
+                "pk", "numero_cita", "fecha_hora", "medico_asignado_id",
+                "paciente__nombre_completo",
+            )
+        )
+        if not citas:
+            return 0
+        NotificationManager.guardar_notificaciones(_avisos(citas, ct_cita))
+        Cita.objects.filter(pk__in=[c["pk"] for c in citas]).update(
+            recordatorio_enviado=True, fecha_recordatorio=ahora,
+        )
+    return len(citas)
+
+
+def enviar_recordatorios(ahora: Optional[datetime] = None,
+                         horas: Optional[Iterable[float]] = None,
+                         batch_size: int = 500) -> int:
+    """Envía los recordatorios pendientes; devuelve el número de citas avisadas."""
+    ahora = ahora or timezone.now()
+    ventanas = anticipaciones(horas)
+    if not ventanas:
+        return 0
+    ct_cita = ContentType.objects.get_for_model(Cita)
+
+    total = 0
+    while True:
+        ids = list(
+            _pendientes(ahora, ventanas).order_by("fecha_hora")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        enviadas = _enviar_lote(ids, ahora, ventanas, ct_cita)
+        if not enviadas:
+            return total
+        total += enviadas
+
+
+# ───────────────────────── Ejecución periódica ─────────────────────────
+def ejecutar_en_bucle(intervalo: float, horas: Optional[Iterable[float]] = None,
+                      detener: Optional[threading.Event] = None,
+                      al_enviar=None) -> None:
+    """Envía recordatorios cada ``intervalo`` s hasta que se active ``detener``."""
+    detener = detener or threading.Event()
+    while not detener.is_set():
+        try:
+            enviadas = enviar_recordatorios(horas=horas)
+            if enviadas:
+                logger.info("Recordatorios enviados para %s citas", enviadas)
+                if al_enviar:
+                    al_enviar(enviadas)
+        except Exception:
+            logger.exception("Error enviando recordatorios de citas")
+        finally:
+            close_old_connections()
+        detener.wait(intervalo)
+
+
+__all__ = ["anticipaciones", "ejecutar_en_bucle", "enviar_recordatorios"]
@@ -0,0 +1,166 @@
+# consultorio_API/reservas.py
+# -*- coding: utf-8 -*-
+"""
+Reserva de citas sin solapamientos, también bajo concurrencia.
+
+Validar en el formulario y guardar después deja una ventana en la que dos
+recepcionistas pueden reservar el mismo horario. :func:`reservar_cita`
+comprueba y guarda dentro de una transacción tras bloquear la fila
+:class:`~consultorio_API.models.BloqueoAgenda` del consultorio y día, de modo
+que las reservas que compiten por ese día se atienden de una en una.
+
+La comprobación de solapamiento es una sola consulta por rango sobre el índice
+``(consultorio, fecha_hora)``: una cita existente choca con ``[inicio, fin)``
+si empieza antes de ``fin`` y termina después de ``inicio``; como ninguna dura
+más de :data:`DURACION_MAXIMA` (validador y ``CHECK`` en ``Cita.duracion``),
+basta leer las que empiezan en ``(inicio - DURACION_MAXIMA, fin)``.
+
+La fila de bloqueo del día se crea (si falta) en su propia transacción antes
+de tomarla con ``FOR UPDATE``: en InnoDB dos ``SELECT ... FOR UPDATE`` sobre
+una fila inexistente toman gap locks y sus ``INSERT`` se interbloquean. Si
+aun así la base aborta por interbloqueo, la reserva se reintenta.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from .disponibilidad import ESTADOS_OCUPAN
+from .models import DURACION_MAXIMA_CITA, BloqueoAgenda, Cita
+
+# Duración máxima de una cita en minutos (acota la ventana de búsqueda)
+DURACION_MAXIMA = DURACION_MAXIMA_CITA
+
+# Reintentos de una reserva abortada por interbloqueo (MySQL 1213)
+REINTENTOS_INTERBLOQUEO = 3
+ER_LOCK_DEADLOCK = 1213
+
+
+class HorarioOcupado(ValidationError):
+    """El horario pedido se solapa con ``cita``."""
+
+    def __init__(self, cita: Cita):
+        self.cita = cita
+        inicio = _local(cita.fecha_hora)
+        fin = inicio + timedelta(minutes=cita.duracion)
+        super().__init__(
+            f"Se solapa con cita de {cita.paciente.nombre_completo} "
+            f"de {inicio:%H:%M} a {fin:%H:%M}"
+        )
+
+
+def _local(dt: datetime) -> datetime:
+    return timezone.localtime(dt) if timezone.is_aware(dt) else dt
+
+
+def _validar_duracion(duracion: int) -> None:
+    if not 0 < duracion <= DURACION_MAXIMA:
+        raise ValidationError(
+            f"La duración debe estar entre 1 y {DURACION_MAXIMA} minutos."
+        )
+
+
+def cita_que_solapa(consultorio, inicio: datetime, duracion: int,
+                    excluir_id=None) -> Optional[Cita]:
+    """Primera cita activa de ``consultorio`` que choca con el horario, o None."""
+    fin = inicio + timedelta(minutes=duracion)
+    candidatas = Cita.objects.filter(
+        consultorio=consultorio,
+        fecha_hora__gt=inicio - timedelta(minutes=DURACION_MAXIMA),
+        fecha_hora__lt=fin,
+        estado__in=ESTADOS_OCUPAN,
+    ).select_related("paciente").order_by("fecha_hora")
+    if excluir_id:
+        candidatas = candidatas.exclude(pk=excluir_id)
+    for cita in candidatas:
+        if cita.fecha_hora + timedelta(minutes=cita.duracion) > inicio:
+            return cita
+    return None
+
+
+def verificar_horario(consultorio, inicio: datetime, duracion: int,
+                      excluir_id=None) -> None:
+    """Lanza :class:`HorarioOcupado` si el horario choca con otra cita."""
+    _validar_duracion(duracion)
+    ocupada = cita_que_solapa(consultorio, inicio, duracion, excluir_id)
+    if ocupada is not None:
+        raise HorarioOcupado(ocupada)
+
+
+def _dias(inicio: datetime, duracion: int):
+    dia = _local(inicio).date()
+    ultimo = _local(inicio + timedelta(minutes=duracion)).date()
+    while dia <= ultimo:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def asegurar_filas_agenda(consultorio_id, inicio: datetime, duracion: int) -> None:
+    """Crea las filas de bloqueo que falten, fuera de la transacción que las bloquea."""
+    for dia in _dias(inicio, duracion):
+        # get_or_create ya tolera el IntegrityError de una creación simultánea
+        BloqueoAgenda.objects.get_or_create(consultorio_id=consultorio_id, fecha=dia)
+
+
+def bloquear_agenda(consultorio_id, inicio: datetime, duracion: int) -> None:
+    """
+    Bloquea (hasta el fin de la transacción) los días que toca el horario.
+
+    Dos horarios que se solapan comparten al menos un día, así que siempre
+    compiten por la misma fila. Se bloquean en orden para evitar interbloqueos.
+    Las filas deben existir (:func:`asegurar_filas_agenda`).
+    """
+    for dia in _dias(inicio, duracion):
+        BloqueoAgenda.objects.select_for_update().get(consultorio_id=consultorio_id, fecha=dia)
+
+
+def _es_interbloqueo(exc: OperationalError) -> bool:
+    return bool(exc.args) and exc.args[0] == ER_LOCK_DEADLOCK
+
+
+def _reservar(cita: Cita) -> Cita:
+    with transaction.atomic():
+        if cita.estado in ESTADOS_OCUPAN:
+            bloquear_agenda(cita.consultorio_id, cita.fecha_hora, cita.duracion)
+            verificar_horario(
+                cita.consultorio_id, cita.fecha_hora, cita.duracion, excluir_id=cita.pk
+            )
+        cita.save()
+    return cita
+
+
+def reservar_cita(cita: Cita) -> Cita:
+    """
+    Guarda ``cita`` (nueva o editada) sólo si su horario sigue libre.
+
+    Lanza :class:`HorarioOcupado` si otra cita ocupó el horario, incluso si
+    se reservó en paralelo después de validar el formulario. Las citas en un
+    estado que no ocupa agenda (canceladas, completadas…) se guardan sin más.
+    """
+    if cita.estado in ESTADOS_OCUPAN:
+        _validar_duracion(cita.duracion)
+        asegurar_filas_agenda(cita.consultorio_id, cita.fecha_hora, cita.duracion)
+    # Dentro de una transacción externa no se puede reintentar: la base ya la abortó
+    intentos = 1 if connection.in_atomic_block else REINTENTOS_INTERBLOQUEO
+    for intento in range(1, intentos + 1):
+        try:
+            return _reservar(cita)
+        except OperationalError as exc:
+            if intento == intentos or not _es_interbloqueo(exc):
+                raise
+
+
+__all__ = [
+    "DURACION_MAXIMA",
+    "HorarioOcupado",
+    "asegurar_filas_agenda",
+    "bloquear_agenda",
+    "cita_que_solapa",
+    "reservar_cita",
+    "verificar_horario",
+]
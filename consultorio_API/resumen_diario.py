@@ -0,0 +1,259 @@
+# consultorio_API/resumen_diario.py
+# -*- coding: utf-8 -*-
+"""
+Mantenimiento del rollup ``ResumenDiario``.
+
+Cada cita cuenta en la fila (consultorio, médico asignado, día de
+``fecha_hora``, estado). Cada consulta cuenta en la fila (consultorio del
+médico, médico, día de referencia, estado); el día de referencia es
+``fecha_atencion`` o, si aún no se atiende, la fecha de su cita o de creación.
+
+Las señales de ``signals.py`` llaman a :func:`cita_guardada`,
+:func:`consulta_guardada` y a sus equivalentes de borrado, que ajustan los
+contadores con ``F()`` sin recorrer las tablas. La clave anterior sale de la
+instantánea de ``RastreoCamposMixin``. :func:`reconstruir` rehace
+todo (o un rango de fechas) a partir de las tablas origen.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce, TruncDate
+
+from .models import Cita, Consulta, ResumenDiario, Usuario
+
+Clave = Tuple[Optional[int], Optional[int], date, str]
+
+CAMPOS_CITA = ("consultorio_id", "medico_asignado_id", "fecha_hora", "estado")
+CAMPOS_CONSULTA = ("medico_id", "cita_id", "fecha_atencion", "fecha_creacion", "estado")
+
+
+def _a_fecha(valor) -> Optional[date]:
+    if valor is None:
+        return None
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+# ───────────────────────── Instantáneas ─────────────────────────
+def _instantanea(instance, campos) -> Optional[tuple]:
+    """Valores actuales de los campos de la clave (sin consultas)."""
+    valores = instance.__dict__
+    if any(c not in valores for c in campos):
+        return None  # campo diferido: no forzamos un SELECT
+    return tuple(valores[c] for c in campos)
+
+
+# ───────────────────────── Claves ─────────────────────────
+def _consultorio_de_medico(medico_id) -> Optional[int]:
+    if not medico_id:
+        return None
+    return (
+        Usuario.objects.filter(pk=medico_id)
+        .values_list("consultorio_id", flat=True)
+        .first()
+    )
+
+
+def _clave_cita(valores) -> Optional[Clave]:
+    consultorio_id, medico_id, fecha_hora, estado = valores
+    fecha = _a_fecha(fecha_hora)
+    if fecha is None:
+        return None
+    return (consultorio_id, medico_id, fecha, estado)
+
+
+def _clave_consulta(valores, instance=None) -> Optional[Clave]:
+    medico_id, cita_id, fecha_atencion, fecha_creacion, estado = valores
+
+    if instance is not None and instance.medico_id == medico_id and instance.medico_id:
+        consultorio_id = instance.medico.consultorio_id
+    else:
+        consultorio_id = _consultorio_de_medico(medico_id)
+
+    fecha = _a_fecha(fecha_atencion)
+    if fecha is None and cita_id:
+        if instance is not None and instance.cita_id == cita_id:
+            fecha = _a_fecha(instance.cita.fecha_hora)
+        else:
+            fecha = _a_fecha(
+                Cita.objects.filter(pk=cita_id).values_list("fecha_hora", flat=True).first()
+            )
+    if fecha is None:
+        fecha = _a_fecha(fecha_creacion)
+    if fecha is None:
+        return None
+    return (consultorio_id, medico_id, fecha, estado)
+
+
+# ───────────────────────── Ajuste incremental ─────────────────────────
+def _ajustar(clave: Optional[Clave], campo: str, delta: int) -> None:
+    if clave is None or not delta:
+        return
+    consultorio_id, medico_id, fecha, estado = clave
+    qs = ResumenDiario.objects.filter(clave=ResumenDiario.clave_de(*clave))
+
+    if delta < 0:
+        qs.filter(**{f"{campo}__gte": -delta}).update(**{campo: F(campo) + delta})
+        return
+
+    if qs.update(**{campo: F(campo) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            ResumenDiario.objects.create(
+                consultorio_id=consultorio_id, medico_id=medico_id,
+                fecha=fecha, estado=estado, **{campo: delta},
+            )
+    except IntegrityError:
+        # Otra petición creó la fila entre el UPDATE y el INSERT (choca en ``clave``)
+        qs.update(**{campo: F(campo) + delta})
+
+
+def _mover(anterior: Optional[Clave], nueva: Optional[Clave], campo: str) -> None:
+    if anterior == nueva:
+        return
+    _ajustar(anterior, campo, -1)
+    _ajustar(nueva, campo, +1)
+
+
+def cita_guardada(instance, created: bool) -> None:
+    actual = _instantanea(instance, CAMPOS_CITA)
+    inicial = instance.instantanea_inicial(CAMPOS_CITA)
+    if not created and inicial == actual:
+        return
+    if not created and inicial is None:
+        # Sin instantánea no sabemos de qué fila salir: recalculamos el día.
+        refrescar(_clave_cita(actual))
+    else:
+        _mover(None if created else _clave_cita(inicial), _clave_cita(actual), "citas")
+
+
+def cita_eliminada(instance) -> None:
+    actual = _instantanea(instance, CAMPOS_CITA)
+    if actual is not None:
+        _ajustar(_clave_cita(actual), "citas", -1)
+
+
+def consulta_guardada(instance, created: bool) -> None:
+    actual = _instantanea(instance, CAMPOS_CONSULTA)
+    inicial = instance.instantanea_inicial(CAMPOS_CONSULTA)
+    if not created and inicial == actual:
+        return
+    nueva = _clave_consulta(actual, instance)
+    if not created and inicial is None:
+        refrescar(nueva)
+    else:
+        anterior = None if created else _clave_consulta(inicial, instance)
+        _mover(anterior, nueva, "consultas")
+
+
+def consulta_eliminada(instance) -> None:
+    actual = _instantanea(instance, CAMPOS_CONSULTA)
+    if actual is not None:
+        _ajustar(_clave_consulta(actual, instance), "consultas", -1)
+
+
+# ───────────────────────── Reconstrucción ─────────────────────────
+def _conteos(desde: Optional[date] = None, hasta: Optional[date] = None,
+             consultorio_id=None, medico_id=None, filtrar_clave=False) -> Dict[Clave, Dict[str, int]]:
+    conteos: Dict[Clave, Dict[str, int]] = defaultdict(lambda: {"citas": 0, "consultas": 0})
+
+    citas = Cita.objects.annotate(dia=TruncDate("fecha_hora"))
+    consultas = Consulta.objects.annotate(
+        dia=TruncDate(Coalesce("fecha_atencion", "cita__fecha_hora", "fecha_creacion"))
+    )
+    if desde:
+        citas = citas.filter(dia__gte=desde)
+        consultas = consultas.filter(dia__gte=desde)
+    if hasta:
+        citas = citas.filter(dia__lte=hasta)
+        consultas = consultas.filter(dia__lte=hasta)
+    if filtrar_clave:
+        citas = citas.filter(consultorio_id=consultorio_id, medico_asignado_id=medico_id)
+        consultas = consultas.filter(medico__consultorio_id=consultorio_id, medico_id=medico_id)
+
+    for fila in (
+        citas.values("consultorio_id", "medico_asignado_id", "dia", "estado")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        clave = (fila["consultorio_id"], fila["medico_asignado_id"], fila["dia"], fila["estado"])
+        conteos[clave]["citas"] = fila["total"]
+
+    for fila in (
+        consultas.values("medico__consultorio_id", "medico_id", "dia", "estado")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        clave = (fila["medico__consultorio_id"], fila["medico_id"], fila["dia"], fila["estado"])
+        conteos[clave]["consultas"] = fila["total"]
+
+    return conteos
+
+
+def _reemplazar(filas_qs, conteos, batch_size: int) -> int:
+    nuevas = [
+        ResumenDiario(
+            clave=ResumenDiario.clave_de(consultorio_id, medico_id, fecha, estado),
+            consultorio_id=consultorio_id,
+            medico_id=medico_id,
+            fecha=fecha,
+            estado=estado,
+            citas=valores["citas"],
+            consultas=valores["consultas"],
+        )
+        for (consultorio_id, medico_id, fecha, estado), valores in conteos.items()
+    ]
+    with transaction.atomic():
+        filas_qs.delete()
+        ResumenDiario.objects.bulk_create(nuevas, batch_size=batch_size)
+    return len(nuevas)
+
+
+def refrescar(clave: Optional[Clave]) -> None:
+    """Recalcula desde las tablas origen todas las filas del día de ``clave``."""
+    if clave is None:
+        return
+    consultorio_id, medico_id, fecha, _ = clave
+    conteos = _conteos(fecha, fecha, consultorio_id, medico_id, filtrar_clave=True)
+    filas = ResumenDiario.objects.filter(
+        consultorio_id=consultorio_id, medico_id=medico_id, fecha=fecha
+    )
+    _reemplazar(filas, conteos, batch_size=500)
+
+
+def refrescar_citas(cita_ids) -> None:
+    """
+    Recalcula los días tocados por un ``UPDATE`` masivo de citas (y de sus
+    consultas), que no dispara las señales de guardado.
+    """
+    claves = set(
+        Cita.objects.filter(pk__in=cita_ids)
+        .annotate(dia=TruncDate("fecha_hora"))
+        .values_list("consultorio_id", "medico_asignado_id", "dia")
+        .order_by()
+    )
+    claves |= set(
+        Consulta.objects.filter(cita_id__in=cita_ids)
+        .annotate(dia=TruncDate(Coalesce("fecha_atencion", "cita__fecha_hora", "fecha_creacion")))
+        .values_list("medico__consultorio_id", "medico_id", "dia")
+        .order_by()
+    )
+    for consultorio_id, medico_id, fecha in claves:
+        refrescar((consultorio_id, medico_id, fecha, None))
+
+
+def reconstruir(desde: Optional[date] = None, hasta: Optional[date] = None,
+                batch_size: int = 1000) -> int:
+    """Rehace el rollup (completo o en un rango de fechas). Devuelve filas creadas."""
+    filas = ResumenDiario.objects.all()
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+    return _reemplazar(filas, _conteos(desde, hasta), batch_size)
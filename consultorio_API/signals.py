@@ -1,60 +1,20 @@
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from django.utils import timezone
-from django.contrib.contenttypes.models import ContentType
 
 from .models import (
     Paciente, Expediente, Auditoria, Cita, Consulta,
-    SignosVitales, Usuario, Consultorio
+    SignosVitales, Usuario, Consultorio, Notificacion
 )
-from .auditoria_utils import registrar
-from .audit_generic import get_current_user
+from .auditoria_eventos import anotar
+from .audit_generic import get_current_user, get_current_request
 from .notifications import NotificationManager
+from . import resumen_diario, cache_consultorio, cola_eventos, destinatarios, contador_notificaciones
 
 # ═══════════════════════════════════════════════════════════════
 # 🔐 SEÑALES DE AUTENTICACIÓN
 # ═══════════════════════════════════════════════════════════════
-
-@receiver(user_logged_in)
-def audit_login(sender, user, request, **kwargs):
-    """Registrar login exitoso"""
-    registrar(user, "login", user, "Inicio de sesión exitoso")
-
-@receiver(user_logged_out)
-def audit_logout(sender, user, request, **kwargs):
-    """Registrar logout"""
-    if user and user.is_authenticated:
-        registrar(user, "logout", user, "Cierre de sesión")
-
-@receiver(user_login_failed)
-def audit_login_failed(sender, credentials, request, **kwargs):
-    """Registrar intento de login fallido"""
-    username = credentials.get('username', 'Desconocido')
-    
-    # Crear registro de auditoría para login fallido
-    try:
-        # Intentar encontrar el usuario
-        usuario = Usuario.objects.filter(username=username).first()
-        if not usuario:
-            # Si no existe el usuario, usar el primer admin para el registro
-            usuario = Usuario.objects.filter(rol='admin').first()
-        
-        if usuario:
-            auditoria = Auditoria.objects.create(
-                usuario=usuario,
-                accion="login_fallido",
-                descripcion=f"Intento de login fallido para usuario: {username}",
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
-                content_type=ContentType.objects.get_for_model(Usuario),
-                object_id=usuario.pk
-            )
-            
-            # Notificar a administradores sobre login fallido
-            NotificationManager.notificar_auditoria_admin(auditoria)
-    except Exception:
-        pass  # Evitar errores que impidan el funcionamiento normal
+# Login, logout y login fallido se auditan en audit_generic.py.
 
 # ═══════════════════════════════════════════════════════════════
 # 👥 SEÑALES DE PACIENTES
@@ -68,7 +28,7 @@ def crear_expediente_y_auditar(sender, instance, created, **kwargs):
         
         usuario = get_current_user()
         if usuario:
-            registrar(
+            anotar(
                 usuario,
                 "crear_paciente",
                 instance,
@@ -86,7 +46,7 @@ def procesar_cita_creada(sender, instance, created, **kwargs):
         # Registrar en auditoría
         usuario = instance.creado_por or instance.medico_asignado
         if usuario:
-            registrar(
+            anotar(
                 usuario,
                 "crear_cita",
                 instance,
@@ -96,49 +56,54 @@ def procesar_cita_creada(sender, instance, created, **kwargs):
         # Enviar notificaciones
         NotificationManager.notificar_cita_creada(instance)
 
-@receiver(pre_save, sender=Cita)
-def auditar_cambios_cita(sender, instance, **kwargs):
+@receiver(post_save, sender=Cita)
+def auditar_cambios_cita(sender, instance, created, **kwargs):
     """Auditar cambios importantes en citas"""
-    if not instance.pk:  # Nueva cita
+    campos = instance.campos_cambiados()
+    if created or not campos:
         return
-    
-    try:
-        old_cita = Cita.objects.get(pk=instance.pk)
-        
-        # Cambio de estado
-        if old_cita.estado != instance.estado:
-            usuario = instance.actualizado_por or instance.medico_asignado
-            if usuario:
-                registrar(
-                    usuario,
-                    "cambiar_estado_cita",
-                    instance,
-                    f"Estado de cita {instance.numero_cita} cambió de {old_cita.get_estado_display()} a {instance.get_estado_display()}"
-                )
-        
-        # Asignación de médico
-        if old_cita.medico_asignado != instance.medico_asignado:
-            usuario = instance.actualizado_por
-            if usuario and instance.medico_asignado:
-                registrar(
-                    usuario,
-                    "asignar_medico_cita",
-                    instance,
-                    f"Médico {instance.medico_asignado.get_full_name()} asignado a cita {instance.numero_cita}"
-                )
-        
-        # Cancelación
-        if old_cita.estado != 'cancelada' and instance.estado == 'cancelada':
-            usuario = instance.actualizado_por
-            if usuario:
-                registrar(
-                    usuario,
-                    "cancelar_cita",
-                    instance,
-                    f"Cita {instance.numero_cita} cancelada. Motivo: {instance.motivo_cancelacion}"
-                )
-    except Cita.DoesNotExist:
-        pass
+
+    # El diff acompaña al registro aunque no haya una acción más específica
+    anotar(
+        instance.actualizado_por or instance.medico_asignado or instance.creado_por,
+        "editar_cita",
+        instance,
+        campos=campos,
+    )
+
+    # Cambio de estado
+    if "estado" in campos:
+        usuario = instance.actualizado_por or instance.medico_asignado
+        if usuario:
+            etiquetas = dict(Cita.ESTADO_CHOICES)
+            anotar(
+                usuario,
+                "cambiar_estado_cita",
+                instance,
+                f"Estado de cita {instance.numero_cita} cambió de {etiquetas.get(campos['estado'][0])} a {instance.get_estado_display()}",
+            )
+
+    # Asignación de médico
+    if "medico_asignado_id" in campos:
+        usuario = instance.actualizado_por
+        if usuario and instance.medico_asignado:
+            anotar(
+                usuario,
+                "asignar_medico_cita",
+                instance,
+                f"Médico {instance.medico_asignado.get_full_name()} asignado a cita {instance.numero_cita}",
+            )
+
+    # Cancelación
+    if "estado" in campos and instance.estado == 'cancelada':
+        usuario = instance.actualizado_por
+        if usuario:
+            anotar(
+                usuario,
+                "cancelar_cita",
+                instance,
+                f"Cita {instance.numero_cita} cancelada. Motivo: {instance.motivo_cancelacion}",
+            )
 
 # ═══════════════════════════════════════════════════════════════
 # 🩺 SEÑALES DE CONSULTAS
@@ -151,7 +116,7 @@ def procesar_consulta_creada(sender, instance, created, **kwargs):
         # Registrar en auditoría
         usuario = instance.asistente or instance.medico
         if usuario:
-            registrar(
+            anotar(
                 usuario,
                 "crear_consulta",
                 instance,
@@ -161,48 +126,38 @@ def procesar_consulta_creada(sender, instance, created, **kwargs):
         # Enviar notificaciones
         NotificationManager.notificar_consulta_creada(instance)
 
-@receiver(pre_save, sender=Consulta)
-def auditar_cambios_consulta(sender, instance, **kwargs):
+@receiver(post_save, sender=Consulta)
+def auditar_cambios_consulta(sender, instance, created, **kwargs):
     """Auditar cambios de estado en consultas"""
-    if not instance.pk:  # Nueva consulta
+    campos = instance.campos_cambiados()
+    if created or not campos:
         return
 
-    try:
-        old_consulta = Consulta.objects.get(pk=instance.pk)
-        
-        # Cambio de estado
-        if old_consulta.estado != instance.estado:
-            usuario = instance.medico or instance.asistente
-            
-            if usuario:
-                # Inicio de consulta
-                if old_consulta.estado == "espera" and instance.estado == "en_progreso":
-                    registrar(
-                        usuario,
-                        "iniciar_consulta",
-                        instance,
-                        f"Consulta de {instance.paciente.nombre_completo} iniciada"
-                    )
-                
-                # Finalización de consulta
-                elif old_consulta.estado == "en_progreso" and instance.estado == "finalizada":
-                    registrar(
-                        usuario,
-                        "finalizar_consulta",
-                        instance,
-                        f"Consulta de {instance.paciente.nombre_completo} finalizada"
-                    )
-                
-                # Cancelación de consulta
-                elif instance.estado == "cancelada":
-                    registrar(
-                        usuario,
-                        "cancelar_consulta",
-                        instance,
-                        f"Consulta de {instance.paciente.nombre_completo} cancelada"
-                    )
-    except Consulta.DoesNotExist:
-        pass
+    usuario = instance.medico or instance.asistente
+    if not usuario:
+        return
+    anotar(usuario, "editar_consulta", instance, campos=campos)
+    if "estado" not in campos:
+        return
+
+    anterior = campos["estado"][0]
+    # Inicio de consulta
+    if anterior == "espera" and instance.estado == "en_progreso":
+        accion, texto = "iniciar_consulta", "iniciada"
+    # Finalización de consulta
+    elif anterior == "en_progreso" and instance.estado == "finalizada":
+        accion, texto = "finalizar_consulta", "finalizada"
+    # Cancelación de consulta
+    elif instance.estado == "cancelada":
+        accion, texto = "cancelar_consulta", "cancelada"
+    else:
+        return
+    anotar(
+        usuario,
+        accion,
+        instance,
+        f"Consulta de {instance.paciente.nombre_completo} {texto}",
+    )
 
 
 @receiver(post_delete, sender=Consulta)
@@ -211,7 +166,7 @@ def auditar_consulta_delete(sender, instance, **kwargs):
     usuario_actual = get_current_user()
     request = get_current_request()
     if usuario_actual:
-        registrar(
+        anotar(
             usuario_actual,
             "eliminar_consulta",
             instance,
@@ -220,10 +175,69 @@ def auditar_consulta_delete(sender, instance, **kwargs):
         )
 
 # ═══════════════════════════════════════════════════════════════
-# 📊 SEÑALES DE SIGNOS VITALES
+# 🗄️ INVALIDACIÓN DE CACHÉ POR CONSULTORIO
 # ═══════════════════════════════════════════════════════════════
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def cache_invalidar_cita(sender, instance, **kwargs):
+    cache_consultorio.invalidar_cita(instance)
 
-from .audit_generic import get_current_user, get_current_request
+@receiver(post_save, sender=Consulta)
+@receiver(post_delete, sender=Consulta)
+def cache_invalidar_consulta(sender, instance, **kwargs):
+    cache_consultorio.invalidar_consulta(instance)
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def cache_invalidar_destinatarios(sender, instance, **kwargs):
+    # El login guarda sólo last_login: no cambia quién recibe notificaciones
+    campos = kwargs.get('update_fields')
+    if campos and not set(campos) & {'rol', 'is_active', 'consultorio'}:
+        return
+    destinatarios.invalidar()
+
+# ═══════════════════════════════════════════════════════════════
+# 📡 COLA VIRTUAL EN VIVO (SSE)
+# ═══════════════════════════════════════════════════════════════
+@receiver(post_save, sender=Cita)
+def cola_cita_guardada(sender, instance, created, **kwargs):
+    cola_eventos.cita_guardada(instance, created)
+
+@receiver(post_delete, sender=Cita)
+def cola_cita_eliminada(sender, instance, **kwargs):
+    cola_eventos.cita_eliminada(instance)
+
+@receiver(post_save, sender=Consulta)
+def cola_consulta_guardada(sender, instance, created, **kwargs):
+    cola_eventos.consulta_guardada(instance, created)
+
+@receiver(post_delete, sender=Consulta)
+def cola_consulta_eliminada(sender, instance, **kwargs):
+    cola_eventos.consulta_eliminada(instance)
+
+# ═══════════════════════════════════════════════════════════════
+# 📈 RESUMEN DIARIO (ROLLUP)
+# ═══════════════════════════════════════════════════════════════
+
+@receiver(post_save, sender=Cita)
+def resumen_cita_guardada(sender, instance, created, **kwargs):
+    resumen_diario.cita_guardada(instance, created)
+
+@receiver(post_delete, sender=Cita)
+def resumen_cita_eliminada(sender, instance, **kwargs):
+    resumen_diario.cita_eliminada(instance)
+
+@receiver(post_save, sender=Consulta)
+def resumen_consulta_guardada(sender, instance, created, **kwargs):
+    resumen_diario.consulta_guardada(instance, created)
+
+@receiver(post_delete, sender=Consulta)
+def resumen_consulta_eliminada(sender, instance, **kwargs):
+    resumen_diario.consulta_eliminada(instance)
+
+# ═══════════════════════════════════════════════════════════════
+# 📊 SEÑALES DE SIGNOS VITALES
+# ═══════════════════════════════════════════════════════════════
 
 @receiver(post_save, sender=SignosVitales)
 def procesar_signos_vitales(sender, instance, created, **kwargs):
@@ -235,7 +249,7 @@ def procesar_signos_vitales(sender, instance, created, **kwargs):
     if created:
         # Registrar en auditoría
         if usuario_actual:
-            registrar(
+            anotar(
                 usuario_actual,
                 "registrar_signos_vitales",
                 instance,
@@ -248,7 +262,7 @@ def procesar_signos_vitales(sender, instance, created, **kwargs):
     else:
         # Actualización de signos vitales
         if usuario_actual:
-            registrar(
+            anotar(
                 usuario_actual,
                 "actualizar_signos_vitales",
                 instance,
@@ -266,7 +280,7 @@ def auditar_consultorio_save(sender, instance, created, **kwargs):
     if usuario_actual:
         accion = "CREAR" if created else "EDITAR"
         descripcion = f"{accion.capitalize()} consultorio {instance.nombre}"
-        registrar(usuario_actual, accion, instance, descripcion, request)
+        anotar(usuario_actual, accion, instance, descripcion, request)
 
 
 @receiver(post_delete, sender=Consultorio)
@@ -274,7 +288,7 @@ def auditar_consultorio_delete(sender, instance, **kwargs):
     usuario_actual = get_current_user()
     request = get_current_request()
     if usuario_actual:
-        registrar(usuario_actual, "ELIMINAR", instance, f"Eliminar consultorio {instance.nombre}", request)
+        anotar(usuario_actual, "ELIMINAR", instance, f"Eliminar consultorio {instance.nombre}", request)
 
 # ═══════════════════════════════════════════════════════════════
 # 👤 SEÑALES DE USUARIOS
@@ -283,19 +297,18 @@ def auditar_consultorio_delete(sender, instance, **kwargs):
 @receiver(post_save, sender=Usuario)
 def auditar_usuario(sender, instance, created, **kwargs):
     """Auditar creación y modificación de usuarios"""
-    from .audit_generic import get_current_user
     usuario_actual = get_current_user()
     
     if usuario_actual and usuario_actual != instance:
         if created:
-            registrar(
+            anotar(
                 usuario_actual,
                 "crear_usuario",
                 instance,
                 f"Usuario {instance.get_full_name()} creado con rol {instance.get_rol_display()}"
             )
         else:
-            registrar(
+            anotar(
                 usuario_actual,
                 "editar_usuario",
                 instance,
@@ -312,3 +325,14 @@ def procesar_auditoria_para_notificaciones(sender, instance, created, **kwargs):
     if created:
         # Notificar a administradores sobre acciones importantes
         NotificationManager.notificar_auditoria_admin(instance)
+
+# ═══════════════════════════════════════════════════════════════
+# 🔢 CONTADOR DE NOTIFICACIONES NO LEÍDAS
+# ═══════════════════════════════════════════════════════════════
+@receiver(post_save, sender=Notificacion)
+def contador_notificacion_guardada(sender, instance, created, **kwargs):
+    contador_notificaciones.notificacion_guardada(instance, created)
+
+@receiver(post_delete, sender=Notificacion)
+def contador_notificacion_eliminada(sender, instance, **kwargs):
+    contador_notificaciones.notificacion_eliminada(instance)
@@ -7,3 +7,11 @@ def url_replace(request, field, value):
     query = request.GET.copy()
     query[field] = value
     return query.urlencode()
+
+
+@register.simple_tag
+def url_sin(request, *fields):
+    query = request.GET.copy()
+    for field in fields:
+        query.pop(field, None)
+    return query.urlencode()
@@ -17,3 +17,11 @@ def pytest_configure():
         'ATOMIC_REQUESTS': False,
     }
     django.setup()
+
+
+@pytest.fixture(autouse=True)
+def _limpiar_cache():
+    # La caché LocMem sobrevive entre tests y los ids se reutilizan
+    from django.core.cache import cache
+    cache.clear()
+    yield
@@ -0,0 +1,50 @@
+import datetime as dt
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+
+from consultorio_API.auditoria_archivo import archivar, buscar, limite_meses
+from consultorio_API.models import Auditoria, Usuario
+
+
+def _registro(usuario, accion, descripcion, fecha):
+    entrada = Auditoria.objects.create(
+        usuario=usuario, accion=accion, descripcion=descripcion,
+        content_type=ContentType.objects.get_for_model(usuario), object_id=str(usuario.pk),
+    )
+    Auditoria.objects.filter(pk=entrada.pk).update(fecha=fecha)
+    return entrada
+
+
+@pytest.mark.django_db
+def test_archiva_meses_viejos_y_los_busca(tmp_path):
+    usuario = Usuario.objects.create(username="aud_arch", rol="medico")
+    _registro(usuario, "crear_cita", "Cita C-1 creada", dt.datetime(2024, 1, 10, 9, 0))
+    _registro(usuario, "editar_cita", "Cita C-1 movida", dt.datetime(2024, 1, 31, 23, 0))
+    _registro(usuario, "crear_cita", "Cita C-2 creada", dt.datetime(2024, 2, 5, 12, 0))
+    reciente = _registro(usuario, "crear_cita", "Cita C-3 creada", dt.datetime(2024, 6, 1, 8, 0))
+
+    antes_de = limite_meses(3, ahora=dt.datetime(2024, 6, 15))
+    assert antes_de == dt.datetime(2024, 3, 1)
+    assert archivar(antes_de, tmp_path, batch_size=2) == 3
+
+    assert list(Auditoria.objects.values_list("pk", flat=True)) == [reciente.pk]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "auditoria-2024-01.jsonl.gz", "auditoria-2024-02.jsonl.gz",
+    ]
+
+    assert [f["descripcion"] for f in buscar(tmp_path, accion="CREAR")] == [
+        "Cita C-1 creada", "Cita C-2 creada",
+    ]
+    assert [f["descripcion"] for f in buscar(tmp_path, desde=dt.date(2024, 1, 31), hasta=dt.date(2024, 1, 31))] == [
+        "Cita C-1 movida",
+    ]
+    assert list(buscar(tmp_path, usuario="otro")) == []
+
+    salida = StringIO()
+    call_command("buscar_auditoria", directorio=str(tmp_path), texto="c-2", stdout=salida, stderr=StringIO())
+    filas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+    assert [(f["usuario__username"], f["accion"]) for f in filas] == [("aud_arch", "crear_cita")]
@@ -0,0 +1,61 @@
+import pytest
+
+from consultorio_API import auditoria_cola
+from consultorio_API.auditoria_utils import registrar
+from consultorio_API.models import Auditoria, Notificacion, Usuario
+
+
+@pytest.mark.django_db
+def test_registrar_en_el_acto_sin_modo_asincrono():
+    usuario = Usuario.objects.create(username="aud_sync", rol="medico")
+    registrar(usuario, "editar_usuario", usuario, "x")
+    assert Auditoria.objects.filter(accion="editar_usuario").count() == 1
+
+
+@pytest.mark.django_db
+def test_cola_escribe_por_lotes_al_confirmar(settings, monkeypatch, django_capture_on_commit_callbacks):
+    settings.AUDITORIA_ASINCRONA = True
+    monkeypatch.setattr(auditoria_cola, "_iniciar_hilo", lambda: None)
+    usuario = Usuario.objects.create(username="aud_async", rol="medico")
+    Usuario.objects.create(username="aud_admin", rol="admin")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for i in range(5):
+            registrar(usuario, "editar_usuario", usuario, f"cambio {i}")
+        registrar(usuario, "crear_usuario", usuario, "alta")
+        assert not Auditoria.objects.exists()
+    assert not Auditoria.objects.exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert auditoria_cola.vaciar() == 6
+    assert Auditoria.objects.filter(accion="editar_usuario").count() == 5
+    # Las acciones críticas se guardan una a una y siguen notificando
+    assert Notificacion.objects.filter(categoria="auditoria").count() == 1
+    assert auditoria_cola.vaciar() == 0
+
+
+@pytest.mark.django_db
+def test_lote_fallido_se_reintenta_fila_por_fila(settings, monkeypatch, django_capture_on_commit_callbacks):
+    settings.AUDITORIA_ASINCRONA = True
+    monkeypatch.setattr(auditoria_cola, "_iniciar_hilo", lambda: None)
+    usuario = Usuario.objects.create(username="aud_lote", rol="medico")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for descripcion in ("ok 1", "mala", "ok 2"):
+            registrar(usuario, "editar_usuario", usuario, descripcion)
+
+    def bulk_roto(*args, **kwargs):
+        raise RuntimeError("lote roto")
+
+    save_original = Auditoria.save
+
+    def save_selectivo(self, *args, **kwargs):
+        if self.descripcion == "mala":
+            raise RuntimeError("fila mala")
+        return save_original(self, *args, **kwargs)
+
+    monkeypatch.setattr(Auditoria.objects, "bulk_create", bulk_roto)
+    monkeypatch.setattr(Auditoria, "save", save_selectivo)
+
+    assert auditoria_cola.vaciar() == 2
+    assert sorted(Auditoria.objects.filter(accion="editar_usuario").values_list("descripcion", flat=True)) == ["ok 1", "ok 2"]
@@ -0,0 +1,57 @@
+import datetime as dt
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+
+from consultorio_API import auditoria_estadisticas
+from consultorio_API.models import Auditoria, Usuario
+
+
+def _registro(usuario, accion, fecha, ip=None):
+    entrada = Auditoria.objects.create(
+        usuario=usuario, accion=accion, ip_address=ip,
+        content_type=ContentType.objects.get_for_model(usuario), object_id=str(usuario.pk),
+    )
+    Auditoria.objects.filter(pk=entrada.pk).update(fecha=fecha)
+
+
+@pytest.mark.django_db
+def test_resumen_con_serie_semanal_en_una_consulta(django_assert_num_queries):
+    ana = Usuario.objects.create(username="est_ana", first_name="Ana", rol="admin")
+    beto = Usuario.objects.create(username="est_beto", first_name="Beto", rol="medico")
+    hoy = dt.date(2031, 3, 10)
+    _registro(ana, "crear_cita", dt.datetime(2031, 3, 10, 9, 0), ip="10.0.0.1")
+    _registro(ana, "editar_cita", dt.datetime(2031, 3, 9, 23, 59))
+    _registro(beto, "editar_cita", dt.datetime(2031, 3, 9, 8, 0))
+    _registro(beto, "editar_cita", dt.datetime(2031, 3, 3, 0, 0))
+    _registro(beto, "editar_cita", dt.datetime(2031, 3, 2, 23, 0))  # fuera de la semana
+
+    # Totales, dos GROUP BY que sirven al top y al filtro, acciones, IPs,
+    # serie semanal y las dos listas de filtro
+    with django_assert_num_queries(8):
+        resumen = auditoria_estadisticas.calcular(hoy)
+
+    stats = resumen["stats"]
+    assert (stats["total_registros"], stats["registros_hoy"]) == (5, 1)
+    assert [u["usuario__username"] for u in stats["usuarios_activos"]] == ["est_beto", "est_ana"]
+    assert stats["acciones_comunes"][0] == {"accion": "editar_cita", "total": 4}
+    assert stats["ips_activas"] == [{"ip_address": "10.0.0.1", "total": 1}]
+    assert [(d["fecha"].day, d["count"]) for d in stats["actividad_diaria"]] == [
+        (3, 1), (4, 0), (5, 0), (6, 0), (7, 0), (8, 0), (9, 2),
+    ]
+    assert resumen["usuarios_filtro"] == [ana, beto]
+    assert [m.model for m in resumen["modelos_filtro"]] == ["usuario"]
+
+
+@pytest.mark.django_db
+def test_panel_usa_resumen_en_cache(django_assert_num_queries):
+    usuario = Usuario.objects.create(username="est_cache", rol="admin")
+    _registro(usuario, "crear_cita", dt.datetime(2031, 3, 10, 9, 0))
+    assert auditoria_estadisticas.obtener()["stats"]["total_registros"] == 1
+
+    _registro(usuario, "crear_cita", dt.datetime(2031, 3, 10, 9, 5))
+    with django_assert_num_queries(0):
+        assert auditoria_estadisticas.obtener()["stats"]["total_registros"] == 1
+
+    auditoria_estadisticas.invalidar()
+    assert auditoria_estadisticas.obtener()["stats"]["total_registros"] == 2
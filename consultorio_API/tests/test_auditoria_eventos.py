@@ -0,0 +1,73 @@
+import datetime as dt
+
+import pytest
+from django.db import transaction
+
+from consultorio_API.auditoria_eventos import anotar
+from consultorio_API.models import Auditoria, Cita, Consultorio, Paciente, Usuario
+
+
+def _base():
+    consultorio = Consultorio.objects.create(nombre="CAE")
+    usuario = Usuario.objects.create(username="asis_cae", rol="asistente", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PAE", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="e@p.com", direccion="x", consultorio=consultorio)
+    return consultorio, usuario, paciente
+
+
+@pytest.mark.django_db
+def test_un_registro_por_cita_con_diff(django_capture_on_commit_callbacks):
+    consultorio, usuario, paciente = _base()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cita = Cita.objects.create(numero_cita="AE1", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime(2031, 3, 3, 9, 0), creado_por=usuario)
+        cita.estado = "confirmada"
+        cita.actualizado_por = usuario
+        cita.save()
+        assert not Auditoria.objects.filter(object_id=str(cita.pk)).exists()
+
+    registros = list(Auditoria.objects.filter(object_id=str(cita.pk)))
+    assert len(registros) == 1
+    registro = registros[0]
+    assert registro.accion == "crear_cita"
+    assert registro.cambios["acciones"] == ["crear_cita", "editar_cita", "cambiar_estado_cita"]
+    assert registro.cambios["campos"] == {"estado": ["programada", "confirmada"]}
+
+
+@pytest.mark.django_db
+def test_anotaciones_de_una_transaccion_revertida_se_descartan(django_capture_on_commit_callbacks):
+    consultorio, usuario, paciente = _base()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        try:
+            with transaction.atomic():
+                anotar(usuario, "editar_consultorio", consultorio, "no llega")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        anotar(usuario, "editar_consultorio", consultorio, "sí llega")
+
+    assert list(Auditoria.objects.values_list("descripcion", flat=True)) == ["sí llega"]
+
+
+@pytest.mark.django_db
+def test_cambios_sin_select_previo(django_capture_on_commit_callbacks):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    consultorio, usuario, paciente = _base()
+    Cita.objects.create(numero_cita="AE2", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime(2031, 3, 4, 9, 0))
+    cita = Cita.objects.get(numero_cita="AE2")
+    assert cita.campos_cambiados() == {}
+
+    cita.estado = "cancelada"
+    cita.actualizado_por = usuario
+    with django_capture_on_commit_callbacks(execute=True):
+        with CaptureQueriesContext(connection) as consultas:
+            cita.save()
+    lecturas = [q["sql"] for q in consultas if q["sql"].startswith("SELECT") and 'FROM "consultorio_API_cita"' in q["sql"]]
+    assert lecturas == []
+    assert cita.campos_cambiados() == {}  # la instantánea se renueva al guardar
+
+    registro = Auditoria.objects.get(object_id=str(cita.pk))
+    assert registro.accion == "cancelar_cita"
+    assert registro.cambios["campos"] == {"estado": ["programada", "cancelada"]}
@@ -0,0 +1,68 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from consultorio_API import cache_consultorio
+from consultorio_API.models import Usuario, Paciente, Consultorio, Cita
+
+
+@pytest.mark.django_db
+def test_cola_virtual_data_cacheada_e_invalidada(client, django_assert_num_queries, django_capture_on_commit_callbacks):
+    consultorio = Consultorio.objects.create(nombre="CC1")
+    asistente = Usuario.objects.create(username="asis_cc1", rol="asistente", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PC1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="c@p.com", direccion="x", consultorio=consultorio)
+    manana = timezone.now() + timezone.timedelta(days=1)
+    Cita.objects.create(numero_cita="CC1", paciente=paciente, consultorio=consultorio, fecha_hora=manana, duracion=30)
+
+    client.force_login(asistente)
+    url = reverse("cola_virtual_data") + f"?fecha={manana.date():%Y-%m-%d}"
+    assert client.get(url).json()["stats"]["total"] == 1
+
+    # Segunda petición: sólo sesión, usuario y consultorio; la cola sale de caché
+    with django_assert_num_queries(3):
+        assert client.get(url).json()["stats"]["total"] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Cita.objects.create(numero_cita="CC2", paciente=paciente, consultorio=consultorio, fecha_hora=manana, duracion=30)
+    assert client.get(url).json()["stats"]["total"] == 2
+
+
+@pytest.mark.django_db
+def test_cache_no_se_invalida_por_otro_consultorio(django_capture_on_commit_callbacks):
+    consultorio = Consultorio.objects.create(nombre="CC2")
+    otro = Consultorio.objects.create(nombre="CC3")
+    asistente = Usuario.objects.create(username="asis_cc2", rol="asistente", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PC2", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="c2@p.com", direccion="x", consultorio=otro)
+
+    antes = cache_consultorio.clave("x", asistente, consultorio_id=consultorio.pk, ambitos=[])
+    with django_capture_on_commit_callbacks(execute=True):
+        Cita.objects.create(numero_cita="CC3", paciente=paciente, consultorio=otro, fecha_hora=timezone.now(), duracion=30)
+    assert cache_consultorio.clave("x", asistente, consultorio_id=consultorio.pk, ambitos=[]) == antes
+
+
+@pytest.mark.django_db
+def test_generacion_perdida_no_revalida_entradas_viejas(django_capture_on_commit_callbacks):
+    consultorio = Consultorio.objects.create(nombre="CC4")
+    asistente = Usuario.objects.create(username="asis_cc4", rol="asistente", consultorio=consultorio)
+
+    inicial = cache_consultorio.clave("x", asistente, consultorio_id=consultorio.pk, ambitos=[])
+    cache_consultorio.invalidar(cache_consultorio.ambito_consultorio(consultorio.pk))
+    invalidada = cache_consultorio.clave("x", asistente, consultorio_id=consultorio.pk, ambitos=[])
+    assert invalidada != inicial
+
+    # Si la generación se descarta, la nueva no coincide con ninguna anterior
+    cache_consultorio._cache_generaciones().clear()
+    assert cache_consultorio.clave("x", asistente, consultorio_id=consultorio.pk, ambitos=[]) not in (inicial, invalidada)
+
+
+@pytest.mark.django_db
+def test_cita_de_otro_consultorio_no_invalida_la_cola(django_capture_on_commit_callbacks):
+    consultorio = Consultorio.objects.create(nombre="CC5")
+    otro = Consultorio.objects.create(nombre="CC6")
+    asistente = Usuario.objects.create(username="asis_cc5", rol="asistente", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PC5", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="c5@p.com", direccion="x", consultorio=otro)
+    ambitos = cache_consultorio.ambitos_usuario(asistente) + [cache_consultorio.CONSULTAS_ESPERA]
+
+    antes = cache_consultorio.clave("cola", asistente, consultorio_id=consultorio.pk, ambitos=ambitos)
+    with django_capture_on_commit_callbacks(execute=True):
+        Cita.objects.create(numero_cita="CC5", paciente=paciente, consultorio=otro, fecha_hora=timezone.now(), duracion=30)
+    assert cache_consultorio.clave("cola", asistente, consultorio_id=consultorio.pk, ambitos=ambitos) == antes
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from consultorio_API import catalogo_compilado, catalogo_excel
+
+
+def _libro(ruta, articulos):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Catalogo de Articulos"])
+    for nombre, clave, precio in articulos:
+        ws.append([])
+        ws.append([nombre])
+        ws.append(["Clave:", clave, "Existencia:", 5])
+        ws.append(["Departamento:", "Farmacia", "Precio:", precio])
+        ws.append(["Categoría:", "Analgésicos"])
+    wb.save(ruta)
+
+
+@pytest.fixture
+def catalogo(tmp_path, settings, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    excel = tmp_path / "Catalogo de Artículos.xlsx"
+    _libro(excel, [("Paracetamol 500 mg", "7501", 12.5), ("Ibuprofeno 400 mg", "7502", 30)])
+    monkeypatch.setattr(catalogo_excel, "EXCEL_PATH", excel)
+
+    parseos = []
+
+    def _contar(path):
+        parseos.append(path)
+        return catalogo_excel.parsear_excel(path)
+
+    monkeypatch.setattr(catalogo_excel, "_load_all_items",
+                        lambda: catalogo_compilado.cargar(catalogo_excel.EXCEL_PATH, _contar))
+    catalogo_compilado.olvidar()
+    yield excel, parseos
+    catalogo_compilado.olvidar()
+
+
+def test_catalogo_compilado_se_reutiliza_hasta_que_cambia_el_excel(catalogo):
+    excel, parseos = catalogo
+
+    items = catalogo_excel.buscar_articulos()["items"]
+    assert [(i["nombre"], i["clave"], i["precio"]) for i in items] == [
+        ("Paracetamol 500 mg", "7501", 12.5), ("Ibuprofeno 400 mg", "7502", 30.0),
+    ]
+    assert catalogo_compilado.ruta_compilado(excel).exists()
+
+    # Otro worker (memoria vacía) lee el compilado sin parsear; tocar el mtime tampoco
+    catalogo_excel.limpiar_cache_catalogo()
+    os.utime(excel, ns=(0, 10**18))
+    assert catalogo_excel.buscar_articulos("ibupro")["total"] == 1
+    assert len(parseos) == 1
+    # ...y el mtime nuevo queda en el compilado para no volver a hashear
+    ruta = catalogo_compilado.ruta_compilado(excel)
+    assert catalogo_compilado._meta(ruta)["mtime_ns"] == str(10**18)
+
+    _libro(excel, [("Amoxicilina 500 mg", "7503", 80)])
+    assert catalogo_excel.buscar_articulos()["items"][0]["clave"] == "7503"
+    assert len(parseos) == 2
+
+
+def test_indice_ordena_por_relevancia_y_coincide_con_el_recorrido_lineal():
+    from consultorio_API.catalogo_busqueda import IndiceCatalogo
+
+    items = [
+        {"nombre": "Jarabe para la tos", "clave": "100", "departamento": "Farmacia", "categoria": "Paracetamol", "precio": 10.0},
+        {"nombre": "Tabletas Paracetamol 1 g", "clave": "101", "departamento": "Farmacia", "categoria": "Analgésicos", "precio": 25.0},
+        {"nombre": "Paracetamol 500 mg", "clave": "102", "departamento": "Farmacia", "categoria": "Analgésicos", "precio": 100.0},
+        {"nombre": "Gasas estériles", "clave": "100200", "departamento": "Curación", "categoria": "Material", "precio": 8.5},
+    ]
+    items += [{"nombre": f"Artículo {n}", "clave": str(5000 + n), "departamento": "Bodega",
+               "categoria": f"Grupo {n % 7}", "precio": float(n)} for n in range(300)]
+    indice = IndiceCatalogo(items)
+
+    assert [it["clave"] for it in indice.buscar("PARACETAMOL")] == ["102", "101", "100"]
+    assert indice.buscar("100")[0]["clave"] == "100"
+    assert indice.buscar("esteril")[0]["clave"] == "100200"
+    assert indice.buscar("xyz") == []
+
+    def lineal(q):
+        s = catalogo_excel._norm_text(q)
+        return [it for it in items if any(s in catalogo_excel._norm_text(it[c]) for c in
+                                          ("nombre", "clave", "departamento", "categoria"))
+                or (s.replace(".", "").isdigit() and abs(it["precio"] - catalogo_excel._tof(q)) < 1e-9)]
+
+    for q in ("a", "ar", "grupo 3", "culo 2", "8.5", "25", "bodega", "50", "ción"):
+        assert sorted(map(id, indice.buscar(q))) == sorted(map(id, lineal(q))), q
+
+
+def test_parser_streaming_igual_al_grid(tmp_path, settings):
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from consultorio_API.management.commands.benchmark_catalogo import libro_sintetico
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    ruta = libro_sintetico(tmp_path / "sintetico.xlsx", 40, hojas=3)
+    # Artículo pegado al final de la hoja, con el nombre justo arriba
+    corto = tmp_path / "corto.xlsx"
+    _libro(corto, [("Naproxeno", "7600", 15)])
+
+    for libro in (ruta, corto):
+        grid = catalogo_excel.parsear_excel(libro, streaming=False)
+        assert grid and catalogo_excel.parsear_excel(libro) == grid
+    assert list(catalogo_excel.iter_articulos(corto))[0]["nombre"] == "Naproxeno"
+
+    salida = StringIO()
+    call_command("benchmark_catalogo", "--archivo", str(ruta), stdout=salida)
+    assert "Mismo resultado en ambos modos" in salida.getvalue()
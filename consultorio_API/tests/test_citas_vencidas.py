@@ -0,0 +1,34 @@
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from consultorio_API.models import Usuario, Paciente, Consulta, Consultorio, Cita, Auditoria, ResumenDiario
+
+
+@pytest.mark.django_db
+def test_barrido_marca_vencidas_en_lotes(django_assert_max_num_queries):
+    consultorio = Consultorio.objects.create(nombre="CV1")
+    medico = Usuario.objects.create(username="doc_cv1", rol="medico", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PV1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="v@p.com", direccion="x", consultorio=consultorio)
+    ahora = timezone.now()
+    vencidas = [
+        Cita.objects.create(numero_cita=f"V{i}", paciente=paciente, consultorio=consultorio, fecha_hora=ahora - timezone.timedelta(hours=i + 1), duracion=30, medico_asignado=medico)
+        for i in range(5)
+    ]
+    reciente = Cita.objects.create(numero_cita="V-REC", paciente=paciente, consultorio=consultorio, fecha_hora=ahora - timezone.timedelta(minutes=5), duracion=30)
+    Consulta.objects.create(paciente=paciente, medico=medico, cita=vencidas[0], tipo="con_cita", estado="espera")
+    Auditoria.objects.all().delete()
+
+    # Sin señales por fila: las consultas dependen de los lotes, no de las citas
+    with django_assert_max_num_queries(30):
+        call_command("marcar_citas_vencidas")
+
+    assert Cita.objects.filter(estado="no_asistio").count() == 5
+    reciente.refresh_from_db()
+    assert reciente.estado == "programada"
+    assert Consulta.objects.get(cita=vencidas[0]).estado == "cancelada"
+    assert Auditoria.objects.filter(accion="cambiar_estado_cita").count() == 5
+    assert Auditoria.objects.filter(accion="cancelar_consulta").count() == 1
+
+    incremental = sorted(ResumenDiario.objects.exclude(citas=0, consultas=0).values_list("medico_id", "fecha", "estado", "citas", "consultas"), key=str)
+    call_command("reconstruir_resumenes")
+    assert sorted(ResumenDiario.objects.exclude(citas=0, consultas=0).values_list("medico_id", "fecha", "estado", "citas", "consultas"), key=str) == incremental
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from datetime import date
+
+import pytest
+from django.utils import timezone
+from consultorio_API import cola_eventos
+from consultorio_API.models import Usuario, Paciente, Consultorio, Cita
+
+
+def test_publicar_desde_otro_hilo_llega_al_suscriptor():
+    async def escuchar():
+        suscripcion = cola_eventos.suscribir(99, date(2030, 1, 1))
+        try:
+            hilo = threading.Thread(target=cola_eventos.publicar, args=(99, {"tipo": "nueva", "fecha": "2030-01-01"}))
+            hilo.start()
+            hilo.join()
+            cola_eventos.publicar(99, {"tipo": "nueva", "fecha": "2030-01-02"})  # otro día: se ignora
+            cola_eventos.publicar(None, {"tipo": "consulta_en_espera", "fecha": None})
+            return [await suscripcion.siguiente(1), await suscripcion.siguiente(1), await suscripcion.siguiente(0.05)]
+        finally:
+            cola_eventos.cancelar(suscripcion)
+
+    recibidos = asyncio.run(escuchar())
+    assert [e and e["tipo"] for e in recibidos] == ["nueva", "consulta_en_espera", None]
+
+
+@pytest.mark.django_db
+def test_deltas_de_cita(monkeypatch, django_capture_on_commit_callbacks):
+    publicados = []
+    monkeypatch.setattr(cola_eventos, "publicar", lambda consultorio_id, evento: publicados.append((consultorio_id, evento)))
+
+    consultorio = Consultorio.objects.create(nombre="CE1")
+    medico = Usuario.objects.create(username="doc_ce1", rol="medico", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PE1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="e@p.com", direccion="x", consultorio=consultorio)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cita = Cita.objects.create(numero_cita="E1", paciente=paciente, consultorio=consultorio, fecha_hora=timezone.now(), duracion=30)
+    with django_capture_on_commit_callbacks(execute=True):
+        cita.medico_asignado = medico
+        cita.save()
+    with django_capture_on_commit_callbacks(execute=True):
+        cita.estado = "en_espera"
+        cita.save()
+    with django_capture_on_commit_callbacks(execute=True):
+        cita.save()  # sin cambios: no hay delta
+
+    assert [(c, e["tipo"], e.get("desde"), e["grupo"]) for c, e in publicados] == [
+        (consultorio.pk, "nueva", None, "sin_asignar"),
+        (consultorio.pk, "movida", "sin_asignar", "asignadas"),
+        (consultorio.pk, "estado", "asignadas", "en_espera"),
+    ]
+
+
+@pytest.mark.django_db
+def test_stream_wsgi_entrega_deltas_sin_esperar_al_final(client, monkeypatch, settings):
+    from django.urls import reverse
+    from consultorio_API import views
+
+    monkeypatch.setattr(views, "COLA_SSE_HEARTBEAT", 0.05)
+    consultorio = Consultorio.objects.create(nombre="CE2")
+    medico = Usuario.objects.create(username="doc_ce2", rol="medico", consultorio=consultorio)
+    client.force_login(medico)
+
+    # Fuera de runserver el stream WSGI está apagado: el navegador sondea
+    settings.COLA_SSE_WSGI = False
+    assert client.get(reverse("cola_virtual_eventos")).status_code == 204
+
+    settings.COLA_SSE_WSGI = True
+    respuesta = client.get(reverse("cola_virtual_eventos") + "?fecha=todas")
+    partes = iter(respuesta.streaming_content)
+    assert next(partes) == b"retry: 5000\n\n"
+    # Sin fecha filtra nada: llegan deltas de cualquier día
+    cola_eventos.publicar(consultorio.pk, {"tipo": "nueva", "fecha": "2031-02-03"})
+    assert b'"2031-02-03"' in next(partes)
+    assert next(partes) == b": ping\n\n"
+    respuesta.close()
+    assert not cola_eventos._suscripciones.get(consultorio.pk)
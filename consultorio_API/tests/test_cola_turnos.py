@@ -0,0 +1,38 @@
+import pytest
+from django.utils import timezone
+from consultorio_API.cola_turnos import construir_cola
+from consultorio_API.models import Usuario, Paciente, Consulta, Consultorio, Cita
+
+
+@pytest.mark.django_db
+def test_cola_reparte_citas_del_dia(django_assert_num_queries):
+    consultorio = Consultorio.objects.create(nombre="CT1")
+    medico = Usuario.objects.create(username="doc_ct1", rol="medico", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PT1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="t@p.com", direccion="x", consultorio=consultorio)
+    ahora = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def cita(numero, horas, **extra):
+        return Cita.objects.create(numero_cita=numero, paciente=paciente, consultorio=consultorio, fecha_hora=ahora + timezone.timedelta(hours=horas), duracion=30, **extra)
+
+    cita("T1", 1)
+    cita("T2", 2, medico_asignado=medico, estado="en_espera")
+    cita("T3", 3, medico_asignado=medico, estado="en_atencion")
+    cita("T4", -2, medico_asignado=medico, estado="completada")
+    cita("T5", -1)  # ya pasó: fuera de las próximas
+    cita("T6", 2, estado="cancelada")
+    cita("T7", 30)  # otro día
+    Consulta.objects.create(paciente=paciente, medico=medico, tipo="sin_cita", estado="espera")
+
+    with django_assert_num_queries(2):
+        cola = construir_cola(Cita.objects.all(), consultorio, ahora.date(), ahora=ahora)
+
+    assert [c.numero_cita for c in cola.citas_proximas] == ["T1", "T2", "T3"]
+    assert cola.stats == {
+        "total": 3, "sin_asignar": 1, "asignadas": 2,
+        "en_espera": 1, "en_atencion": 1, "completadas": 1,
+    }
+    assert len(cola.consultas) == 1
+
+    filtrada = construir_cola(Cita.objects.all(), consultorio, ahora.date(), estado="en_espera", ahora=ahora)
+    assert filtrada.stats["total"] == 1
+    assert filtrada.stats["completadas"] == 0
@@ -0,0 +1,134 @@
+import datetime as dt
+
+import pytest
+from django.urls import reverse
+from consultorio_API.disponibilidad import cargar_agenda
+from consultorio_API.models import Usuario, Paciente, Consultorio, Cita, HorarioMedico
+
+
+def _base():
+    consultorio = Consultorio.objects.create(nombre="CD1", horario_apertura=dt.time(8, 0), horario_cierre=dt.time(12, 0))
+    consultorio.refresh_from_db()
+    medico = Usuario.objects.create(username="doc_cd1", rol="medico", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PD1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="d@p.com", direccion="x", consultorio=consultorio)
+    return consultorio, medico, paciente
+
+
+@pytest.mark.django_db
+def test_huecos_por_intervalos_en_varios_dias(django_assert_num_queries):
+    consultorio, medico, paciente = _base()
+    lunes = dt.date(2031, 1, 6)
+    Cita.objects.create(numero_cita="D1", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime.combine(lunes, dt.time(9, 0)), duracion=60)
+    Cita.objects.create(numero_cita="D2", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime.combine(lunes, dt.time(10, 15)), duracion=30, estado="cancelada")
+
+    with django_assert_num_queries(2):
+        agenda = cargar_agenda(consultorio, lunes, lunes + dt.timedelta(days=6))
+
+    opciones = [(o.hora.strftime("%H:%M"), o.libre) for o in agenda.opciones(lunes, 30, 30)]
+    assert opciones == [
+        ("08:00", True), ("08:30", True), ("09:00", False), ("09:30", False),
+        ("10:00", True), ("10:30", True), ("11:00", True), ("11:30", True),
+    ]
+    # 08:45 choca con la cita de las 09:00: no se ofrece
+    assert "08:45" not in [o.hora.strftime("%H:%M") for o in agenda.opciones(lunes, 30, 15)]
+    assert not agenda.esta_libre(dt.datetime.combine(lunes, dt.time(8, 45)), 30)
+
+    huecos = list(agenda.huecos(240, 60))
+    assert [h.inicio.date() for h in huecos] == [lunes + dt.timedelta(days=i) for i in range(1, 7)]
+
+
+@pytest.mark.django_db
+def test_turnos_del_medico_recortan_la_jornada():
+    consultorio, medico, paciente = _base()
+    HorarioMedico.objects.create(medico=medico, consultorio=consultorio, dia="martes", hora_inicio=dt.time(10, 0), hora_fin=dt.time(14, 0))
+    martes, miercoles = dt.date(2031, 1, 7), dt.date(2031, 1, 8)
+
+    agenda = cargar_agenda(consultorio, martes, miercoles, medico=medico)
+    assert agenda.jornada(martes) == [(600, 720)]
+    assert agenda.jornada(miercoles) == []
+
+    # Sin médico: el martes sólo hay atención en el turno, el miércoles rige el consultorio
+    agenda = cargar_agenda(consultorio, martes, miercoles)
+    assert agenda.jornada(martes) == [(600, 720)]
+    assert agenda.jornada(miercoles) == [(480, 720)]
+
+
+@pytest.mark.django_db
+def test_ajax_horarios_disponibles_usa_el_motor(client):
+    consultorio, medico, paciente = _base()
+    dia = dt.date(2031, 1, 6)
+    Cita.objects.create(numero_cita="D3", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime.combine(dia, dt.time(9, 0)), duracion=30)
+
+    client.force_login(medico)
+    data = client.get(reverse("ajax_horarios_disponibles"), {"medico_id": medico.pk, "fecha": dia.isoformat(), "duracion": 30}).json()
+    horarios = {h["value"]: h["estado"] for h in data["horarios"]}
+    assert horarios["09:10"] == "ocupado"
+    assert horarios["09:30"] == "libre"
+    assert "08:45" not in horarios
+    assert data["total"] == len(data["horarios"])
+
+
+@pytest.mark.django_db
+def test_ajax_proximos_horarios_salta_dias_llenos(client, django_assert_max_num_queries):
+    consultorio, medico, paciente = _base()
+    lunes = dt.date(2031, 1, 6)
+    # Lunes y martes llenos
+    for i, dia in enumerate((lunes, lunes + dt.timedelta(days=1))):
+        Cita.objects.create(numero_cita=f"PX{i}", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime.combine(dia, dt.time(8, 0)), duracion=240)
+
+    client.force_login(medico)
+    url = reverse("ajax_proximos_horarios")
+    # sesión, usuario, consultorio + agenda (turnos y citas del rango)
+    with django_assert_max_num_queries(5):
+        data = client.get(url, {"consultorio_id": consultorio.pk, "desde": lunes.isoformat(), "duracion": 60, "n": 3, "paso": 60}).json()
+
+    assert [h["value"] for h in data["horarios"]] == ["2031-01-08T08:00", "2031-01-08T09:00", "2031-01-08T10:00"]
+
+
+@pytest.mark.django_db
+def test_rejilla_de_medicos_en_dos_consultas(client, django_assert_num_queries):
+    consultorio, medico, paciente = _base()
+    otro = Usuario.objects.create(username="doc_cd2", rol="medico", first_name="Otro", consultorio=consultorio)
+    lunes = dt.date(2031, 1, 6)
+    for doc in (medico, otro):
+        HorarioMedico.objects.create(medico=doc, consultorio=consultorio, dia="lunes", hora_inicio=dt.time(9, 0), hora_fin=dt.time(11, 0))
+    Cita.objects.create(numero_cita="G1", paciente=paciente, consultorio=consultorio, medico_asignado=medico, fecha_hora=dt.datetime.combine(lunes, dt.time(9, 10)), duracion=40)
+
+    with django_assert_num_queries(2):
+        data = client.get("/ajax/horarios/", {"fecha": lunes.isoformat(), "consultorio_id": consultorio.pk}).json()
+
+    bloques = {h["medico_id"]: h["bloques"] for h in data["horarios"]}
+    assert bloques[medico.pk] == [
+        {"hora": "09:00", "ocupado": True, "paciente": "PD1"},
+        {"hora": "09:30", "ocupado": True, "paciente": None},
+        {"hora": "10:00", "ocupado": False, "paciente": None},
+        {"hora": "10:30", "ocupado": False, "paciente": None},
+    ]
+    assert not any(b["ocupado"] for b in bloques[otro.pk])
+
+    respuesta = client.get("/ajax/horarios/", {"fecha": lunes.isoformat(), "consultorio_id": "abc"})
+    assert respuesta.status_code == 400
+
+
+@pytest.mark.django_db
+def test_editar_cita_fuera_del_turno_conserva_su_hora():
+    from consultorio_API.forms import CitaForm
+
+    consultorio, medico, paciente = _base()
+    martes = dt.date(2031, 1, 7)
+    # Agendada a las 08:30, antes de que se registrara el turno de 10 a 14
+    cita = Cita.objects.create(numero_cita="D9", paciente=paciente, consultorio=consultorio, fecha_hora=dt.datetime.combine(martes, dt.time(8, 30)), duracion=30)
+    HorarioMedico.objects.create(medico=medico, consultorio=consultorio, dia="martes", hora_inicio=dt.time(10, 0), hora_fin=dt.time(14, 0))
+
+    assert cargar_agenda(consultorio, martes).jornada(martes) == [(600, 720)]
+    assert cargar_agenda(consultorio, martes, excluir_id=cita.pk).jornada(martes) == [(510, 540), (600, 720)]
+
+    datos = {
+        "consultorio": consultorio.pk, "paciente": paciente.pk, "fecha": "2031-01-07",
+        "hora": "08:30", "duracion": "30", "tipo_cita": cita.tipo_cita, "prioridad": cita.prioridad,
+        "motivo": "control",
+    }
+    form = CitaForm(data=datos, instance=cita)
+    assert ("08:30", "8:30 AM") in form.fields["hora"].choices
+    form.is_valid()
+    assert "hora" not in form.errors
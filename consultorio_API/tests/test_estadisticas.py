@@ -0,0 +1,54 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from consultorio_API.models import Usuario, Paciente, Consulta, Consultorio, Cita
+from consultorio_API.estadisticas import calcular_estadisticas, calcular_graficas
+
+
+def _datos_base():
+    consultorio = Consultorio.objects.create(nombre="CE")
+    medico = Usuario.objects.create(username="doce", rol="medico", first_name="Doc", consultorio=consultorio)
+    admin = Usuario.objects.create(username="adme", rol="admin", is_superuser=True)
+    paciente = Paciente.objects.create(nombre_completo="PE", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="pe@p.com", direccion="x", consultorio=consultorio)
+    ahora = timezone.now()
+    Cita.objects.create(numero_cita="E1", paciente=paciente, consultorio=consultorio, fecha_hora=ahora, duracion=30, estado="programada")
+    Cita.objects.create(numero_cita="E2", paciente=paciente, consultorio=consultorio, fecha_hora=ahora, duracion=30, estado="completada")
+    Cita.objects.create(numero_cita="E3", paciente=paciente, consultorio=consultorio, fecha_hora=ahora - timezone.timedelta(days=1), duracion=30, estado="cancelada")
+    Consulta.objects.create(paciente=paciente, medico=medico, tipo="sin_cita", estado="finalizada", fecha_atencion=ahora)
+    Consulta.objects.create(paciente=paciente, medico=medico, tipo="sin_cita", estado="espera")
+    return admin, medico
+
+
+@pytest.mark.django_db
+def test_estadisticas_admin(django_assert_num_queries):
+    admin, _ = _datos_base()
+    with django_assert_num_queries(3):
+        stats = calcular_estadisticas(admin)
+    assert stats.citas_hoy == 2
+    assert stats.citas_ayer == 1
+    assert stats.citas_hoy_diff == "+1"
+    assert stats.consultas_finalizadas == 1
+    assert stats.consultas_pendientes == 1
+    assert stats.pacientes_totales == 1
+
+
+@pytest.mark.django_db
+def test_graficas_desde_resumen(django_assert_num_queries):
+    _, medico = _datos_base()
+    paciente = Paciente.objects.get(nombre_completo="PE")
+    hace_dos = timezone.now() - timezone.timedelta(days=2)
+    Consulta.objects.create(paciente=paciente, medico=medico, tipo="sin_cita", estado="finalizada", fecha_atencion=hace_dos)
+    with django_assert_num_queries(2):
+        graficas = calcular_graficas(medico)
+    assert graficas.data_estados == [1, 0, 0, 1, 1, 0]
+    assert len(graficas.data_dias) == 30
+    assert graficas.data_dias[-2] == 1
+
+
+@pytest.mark.django_db
+def test_dashboard_admin_renderiza(client):
+    admin, _ = _datos_base()
+    client.force_login(admin)
+    resp = client.get(reverse("dashboard_admin"))
+    assert resp.status_code == 200
+    assert resp.context["stats"].citas_hoy == 2
@@ -0,0 +1,85 @@
+import csv
+import datetime as dt
+import gzip
+import io
+import json
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.urls import reverse
+
+from consultorio_API.models import Auditoria, Cita, Consultorio, Paciente, Usuario
+
+
+def _contenido(response):
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_exportar_citas_en_streaming_con_filtros(client):
+    consultorio = Consultorio.objects.create(nombre="CX")
+    admin = Usuario.objects.create(username="exp_admin", rol="admin")
+    paciente = Paciente.objects.create(nombre_completo="PX", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="px@p.com", direccion="x", consultorio=consultorio)
+    for i, estado in enumerate(["programada", "cancelada", "programada"]):
+        Cita.objects.create(numero_cita=f"X{i}", paciente=paciente, consultorio=consultorio,
+                            fecha_hora=dt.datetime(2031, 4, 1 + i, 9, 0), duracion=30, estado=estado)
+    client.force_login(admin)
+
+    response = client.get(reverse("exportar_citas_csv"), {"estado": "programada", "fecha_hasta": "2031-04-02"})
+    assert response.streaming
+    filas = list(csv.reader(io.StringIO(_contenido(response).decode("utf-8"))))
+    assert filas[0][0] == "Número Cita"
+    assert [f[0] for f in filas[1:]] == ["X0"]
+
+    response = client.get(reverse("exportar_citas_csv"), {"formato": "jsonl", "estado": "programada"})
+    assert response["Content-Disposition"].endswith('.jsonl"')
+    lineas = _contenido(response).decode("utf-8").splitlines()
+    assert [json.loads(l)["numero_cita"] for l in lineas] == ["X0", "X2"]
+
+
+@pytest.mark.django_db
+def test_exportar_auditoria_filtrada_y_comprimida(client):
+    admin = Usuario.objects.create(username="exp_aud", first_name="Ana", rol="admin")
+    tipo = ContentType.objects.get_for_model(admin)
+    for accion in ("crear_cita", "editar_cita", "crear_cita"):
+        Auditoria.objects.create(usuario=admin, accion=accion, content_type=tipo, object_id=str(admin.pk))
+    client.force_login(admin)
+
+    response = client.get(
+        reverse("auditoria_exportar_csv"), {"accion": "crear", "formato": "jsonl", "gzip": "1"},
+        HTTP_ACCEPT_ENCODING="gzip, deflate",
+    )
+    assert response["Content-Encoding"] == "gzip"
+    lineas = gzip.decompress(_contenido(response)).decode("utf-8").splitlines()
+    assert [json.loads(l)["accion"] for l in lineas] == ["crear_cita", "crear_cita"]
+
+    # Sin Accept-Encoding se envía sin comprimir
+    response = client.get(reverse("auditoria_exportar_csv"), {"gzip": "1"})
+    assert not response.has_header("Content-Encoding")
+    filas = list(csv.reader(io.StringIO(_contenido(response).decode("utf-8"))))
+    assert sorted(f[3] for f in filas[1:] if f[3].endswith("_cita")) == ["crear_cita", "crear_cita", "editar_cita"]
+
+
+@pytest.mark.django_db
+def test_exportacion_por_tramos_con_fechas_repetidas(django_assert_num_queries):
+    from django.test import RequestFactory
+    from consultorio_API import exportacion
+
+    consultorio = Consultorio.objects.create(nombre="CT")
+    admin = Usuario.objects.create(username="exp_tramos", rol="admin")
+    paciente = Paciente.objects.create(nombre_completo="PT", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="pt@p.com", direccion="x", consultorio=consultorio)
+    for i in range(7):
+        # Varias citas a la misma hora: el desempate es el id
+        Cita.objects.create(numero_cita=f"T{i}", paciente=paciente, consultorio=consultorio,
+                            fecha_hora=dt.datetime(2031, 5, 1, 9 + i // 3, 0), duracion=30)
+    request = RequestFactory().get("/")
+    request.user = admin
+
+    response = exportacion.respuesta_exportacion(
+        request, exportacion.citas_exportables(request), exportacion.COLUMNAS_CITAS,
+        "citas", orden=exportacion.ORDEN_CITAS, chunk_size=2,
+    )
+    with django_assert_num_queries(4):  # 7 filas en tramos de 2
+        filas = list(csv.reader(io.StringIO(_contenido(response).decode("utf-8"))))[1:]
+    assert sorted(f[0] for f in filas) == [f"T{i}" for i in range(7)]
+    assert len(filas) == 7
@@ -0,0 +1,213 @@
+import datetime as dt
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from consultorio_API.models import Cita, Consultorio, Notificacion, Paciente, Usuario
+
+
+def _inserts(capturadas, tabla):
+    return [q for q in capturadas if q["sql"].startswith("INSERT") and tabla in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_cita_creada_notifica_con_un_solo_insert(settings, django_capture_on_commit_callbacks):
+    settings.NOTIFICACIONES_RESUMEN = {}
+    consultorio = Consultorio.objects.create(nombre="CN")
+    otro = Consultorio.objects.create(nombre="CN2")
+    for i in range(5):
+        Usuario.objects.create(username=f"n_admin{i}", rol="admin")
+    for i in range(4):
+        Usuario.objects.create(username=f"n_asis{i}", rol="asistente", consultorio=consultorio)
+    Usuario.objects.create(username="n_asis_otro", rol="asistente", consultorio=otro)
+    Usuario.objects.create(username="n_inactivo", rol="admin", is_active=False)
+    medico = Usuario.objects.create(username="n_med", rol="medico", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PN", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="n@p.com", direccion="x", consultorio=consultorio)
+
+    def _crear(numero):
+        with CaptureQueriesContext(connection) as capturadas:
+            with django_capture_on_commit_callbacks(execute=True):
+                Cita.objects.create(numero_cita=numero, paciente=paciente, consultorio=consultorio,
+                                    medico_asignado=medico, fecha_hora=dt.datetime(2031, 5, 1, 9, 0), duracion=30)
+        return capturadas
+
+    capturadas = _crear("N1")
+    assert len(_inserts(capturadas, "notificacion")) == 1
+    assert Notificacion.objects.filter(object_id__isnull=False).count() == 10
+    assert Notificacion.objects.filter(destinatario=medico, titulo="Cita Asignada").count() == 1
+
+    # El directorio queda en caché: la segunda cita no consulta usuarios
+    capturadas = _crear("N2")
+    assert not [q for q in capturadas if 'FROM "consultorio_API_usuario"' in q["sql"]]
+
+    # Dar de baja a un admin invalida el directorio
+    admin = Usuario.objects.get(username="n_admin0")
+    admin.is_active = False
+    admin.save()
+    _crear("N3")
+    assert Notificacion.objects.filter(mensaje__contains="#N3").count() == 9
+
+
+@pytest.mark.django_db
+def test_contador_no_leidas_sin_sql(client, django_capture_on_commit_callbacks, django_assert_num_queries):
+    from consultorio_API import contador_notificaciones
+    from consultorio_API.notifications import NotificationManager
+
+    admin = Usuario.objects.create(username="c_admin", rol="admin")
+    medico = Usuario.objects.create(username="c_med", rol="medico")
+    assert contador_notificaciones.no_leidas(medico.id) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        NotificationManager.enviar_notificaciones(
+            NotificationManager.construir_notificacion(medico.id, "info", f"T{i}", "m") for i in range(3)
+        )
+        suelta = NotificationManager.crear_notificacion(medico, "info", "T3", "m")
+    with django_assert_num_queries(0):
+        assert contador_notificaciones.no_leidas(medico.id) == 4
+
+    with django_capture_on_commit_callbacks(execute=True):
+        suelta.marcar_como_leido()
+    with django_capture_on_commit_callbacks(execute=True):
+        Notificacion.objects.filter(destinatario=medico, titulo="T0").get().delete()
+    with django_assert_num_queries(0):
+        assert contador_notificaciones.no_leidas(medico.id) == 2
+
+    client.force_login(medico)
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse("marcar_todas_notificaciones_leidas"))
+    assert client.get(reverse("notificaciones_count")).json() == {"count": 0}
+    assert Notificacion.objects.filter(destinatario=medico, leido=False).count() == 0
+
+
+@pytest.mark.django_db
+def test_resumen_acumula_eventos_por_rol(settings, django_capture_on_commit_callbacks):
+    settings.NOTIFICACIONES_RESUMEN = {"admin": 3600}
+    consultorio = Consultorio.objects.create(nombre="Consultorio A")
+    admins = [Usuario.objects.create(username=f"r_admin{i}", rol="admin") for i in range(3)]
+    asistente = Usuario.objects.create(username="r_asis", rol="asistente", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PR", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="r@p.com", direccion="x", consultorio=consultorio)
+
+    for i in range(12):
+        with django_capture_on_commit_callbacks(execute=True):
+            Cita.objects.create(numero_cita=f"R{i}", paciente=paciente, consultorio=consultorio,
+                                fecha_hora=dt.datetime(2031, 6, 1, 8, 0) + dt.timedelta(minutes=30 * i), duracion=30)
+
+    # Cada admin tiene una sola fila acumulada; el asistente (sin resumen), una por cita
+    resumen = Notificacion.objects.get(destinatario=admins[0], categoria="citas")
+    assert (resumen.total, resumen.mensaje) == (12, "12 nuevas citas en Consultorio A")
+    assert Notificacion.objects.filter(destinatario__rol="admin").count() == 3
+    assert Notificacion.objects.filter(destinatario=asistente).count() == 12
+
+    # Leída la fila, el siguiente evento abre un resumen nuevo
+    resumen.marcar_como_leido()
+    with django_capture_on_commit_callbacks(execute=True):
+        Cita.objects.create(numero_cita="R12", paciente=paciente, consultorio=consultorio,
+                            fecha_hora=dt.datetime(2031, 6, 2, 8, 0), duracion=30)
+    nueva = Notificacion.objects.filter(destinatario=admins[0], leido=False).get()
+    assert (nueva.total, nueva.titulo) == (1, "Nueva Cita Creada")
+
+
+@pytest.mark.django_db
+def test_recordatorios_por_lote_e_idempotentes(settings):
+    from consultorio_API.recordatorios import enviar_recordatorios
+
+    settings.NOTIFICACIONES_RESUMEN = {}
+    consultorio = Consultorio.objects.create(nombre="CR")
+    for i in range(3):
+        Usuario.objects.create(username=f"r_admin{i}", rol="admin")
+    medico = Usuario.objects.create(username="r_med", rol="medico", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PR", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="r@p.com", direccion="x", consultorio=consultorio)
+    ahora = dt.datetime(2031, 5, 1, 8, 0)
+
+    def _cita(numero, horas, estado="confirmada"):
+        return Cita.objects.create(numero_cita=numero, paciente=paciente, consultorio=consultorio,
+                                   medico_asignado=medico, estado=estado, duracion=30,
+                                   fecha_hora=ahora + dt.timedelta(hours=horas))
+
+    manana = _cita("R1", 20)
+    _cita("R2", 1.5)
+    _cita("R3", 1, estado="programada")
+    _cita("R4", 30)
+
+    with CaptureQueriesContext(connection) as capturadas:
+        assert enviar_recordatorios(ahora=ahora) == 2
+    assert len(_inserts(capturadas, "notificacion")) == 1
+    assert len([q for q in capturadas if q["sql"].startswith("UPDATE") and "cita" in q["sql"]]) == 1
+    assert Notificacion.objects.filter(categoria="recordatorio").count() == 8
+    assert Notificacion.objects.filter(destinatario=medico, mensaje__contains="20:00").count() == 0
+    assert Cita.objects.filter(recordatorio_enviado=True, fecha_recordatorio=ahora).count() == 2
+
+    # Otra pasada no repite; luego se abren la ventana de 2 h de R1 y la de 24 h de R4
+    assert enviar_recordatorios(ahora=ahora + dt.timedelta(minutes=5)) == 0
+    assert enviar_recordatorios(ahora=ahora + dt.timedelta(hours=18, minutes=30)) == 2
+    assert Notificacion.objects.filter(object_id=str(manana.pk), categoria="recordatorio").count() == 8
+
+
+@pytest.mark.django_db
+def test_purga_por_lotes_y_estadisticas():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    from consultorio_API.notifications import NotificationManager
+
+    usuario = Usuario.objects.create(username="p_med", rol="medico")
+    viejas = dt.datetime.now() - dt.timedelta(days=60)
+    for i in range(7):
+        Notificacion.objects.create(destinatario=usuario, tipo="info", titulo=f"L{i}", mensaje="m",
+                                    categoria="citas" if i % 2 else "sistema", leido=True)
+    Notificacion.objects.create(destinatario=usuario, tipo="info", titulo="NL", mensaje="m", categoria="citas")
+    Notificacion.objects.create(destinatario=usuario, tipo="info", titulo="Reciente", mensaje="m", leido=True)
+    Notificacion.objects.exclude(titulo="Reciente").update(fecha=viejas)
+
+    stats = NotificationManager.obtener_estadisticas_usuario(usuario)
+    assert stats["total"] == 9 and stats["no_leidas"] == 1
+    assert stats["por_categoria"]["citas"] == {"total": 4, "no_leidas": 1}
+
+    salida = StringIO()
+    call_command("purgar_notificaciones", "--dry-run", "--batch-size", "3", stdout=salida)
+    assert "7 notificaciones se borrarían en 3 lotes" in salida.getvalue()
+    assert Notificacion.objects.count() == 9
+
+    salida = StringIO()
+    call_command("purgar_notificaciones", "--batch-size", "3", "--pausa", "0", stdout=salida)
+    assert "7 notificaciones borradas en 3 lotes" in salida.getvalue()
+    assert set(Notificacion.objects.values_list("titulo", flat=True)) == {"NL", "Reciente"}
+
+
+@pytest.mark.django_db
+def test_contador_descarta_recuento_desfasado(monkeypatch):
+    from consultorio_API import cache_consultorio, contador_notificaciones
+
+    medico = Usuario.objects.create(username="c_carrera", rol="medico")
+    cache = cache_consultorio.obtener_cache()
+    contador_notificaciones._clave(medico.id)  # la generación ya existe
+    add_original = cache.add
+
+    def add_con_carrera(*args, **kwargs):
+        # Otra petición crea una notificación entre el COUNT y el add; su
+        # ajuste no encuentra el contador y no suma nada
+        Notificacion.objects.create(destinatario=medico, tipo="info", titulo="C", mensaje="m")
+        return add_original(*args, **kwargs)
+
+    monkeypatch.setattr(cache, "add", add_con_carrera)
+    assert contador_notificaciones.no_leidas(medico.id) == 1
+    monkeypatch.setattr(cache, "add", add_original)
+    assert contador_notificaciones.no_leidas(medico.id) == 1
+
+
+@pytest.mark.django_db
+def test_contador_sin_incr_atomico_se_recuenta(monkeypatch, django_capture_on_commit_callbacks):
+    from consultorio_API import cache_consultorio, contador_notificaciones
+
+    medico = Usuario.objects.create(username="c_archivo", rol="medico")
+    assert contador_notificaciones.no_leidas(medico.id) == 0
+    monkeypatch.setattr(cache_consultorio, "incr_atomico", lambda cache: False)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Notificacion.objects.create(destinatario=medico, tipo="info", titulo="A", mensaje="m")
+    # Un backend de archivos no suma: borra el contador y la lectura recuenta
+    assert cache_consultorio.obtener_cache().get(contador_notificaciones._clave(medico.id)) is None
+    assert contador_notificaciones.no_leidas(medico.id) == 1
@@ -0,0 +1,99 @@
+import pytest
+from django.urls import reverse
+
+from consultorio_API.models import Consultorio, Paciente, Usuario
+from consultorio_API.paginacion import TOTAL_ACOTADO, TOTAL_ESTIMADO, TOTAL_EXACTO, etiqueta_total, paginar_por_cursor, total_aproximado
+
+ORDEN = ("nombre_completo", "id")
+
+
+def _pacientes(n):
+    consultorio = Consultorio.objects.create(nombre="CP")
+    for i in range(n):
+        # Nombres repetidos: el desempate por id mantiene un orden total
+        Paciente.objects.create(nombre_completo=f"P{i // 3:02d}", fecha_nacimiento="2000-01-01", sexo="M",
+                                telefono="1", correo=f"p{i}@p.com", direccion="x", consultorio=consultorio)
+    return Paciente.objects.all()
+
+
+@pytest.mark.django_db
+def test_cursor_recorre_ida_y_vuelta_sin_count(django_assert_num_queries):
+    qs = _pacientes(11)
+    esperado = list(qs.order_by(*ORDEN).values_list("pk", flat=True))
+
+    vistos, paginas, cursor = [], [], None
+    while True:
+        with django_assert_num_queries(1):
+            pagina = paginar_por_cursor(qs, ORDEN, cursor, 4)
+            filas = [p.pk for p in pagina]
+        vistos += filas
+        paginas.append(filas)
+        if not pagina.has_next():
+            break
+        cursor = pagina.cursor_siguiente
+    assert vistos == esperado
+    assert [len(p) for p in paginas] == [4, 4, 3]
+
+    # Hacia atrás desde la última página
+    anterior = paginar_por_cursor(qs, ORDEN, pagina.cursor_anterior, 4)
+    assert [p.pk for p in anterior] == paginas[1]
+    assert anterior.has_previous() and anterior.has_next()
+    primera = paginar_por_cursor(qs, ORDEN, anterior.cursor_anterior, 4)
+    assert [p.pk for p in primera] == paginas[0]
+    assert not primera.has_previous()
+
+
+@pytest.mark.django_db
+def test_total_aproximado_acota_el_conteo():
+    qs = _pacientes(7)
+    assert total_aproximado(qs, limite=10) == (7, TOTAL_EXACTO)
+    assert total_aproximado(qs, limite=5) == (5, TOTAL_ACOTADO)
+    assert [etiqueta_total(5, t) for t in (TOTAL_EXACTO, TOTAL_ACOTADO, TOTAL_ESTIMADO)] == ["5", "5+", "≈5"]
+
+
+@pytest.mark.django_db
+def test_lista_pacientes_pagina_con_cursor(client):
+    _pacientes(20)
+    admin = Usuario.objects.create(username="pag_admin", rol="admin")
+    client.force_login(admin)
+
+    resp = client.get(reverse("pacientes_lista"))
+    pagina = resp.context["page_obj"]
+    assert len(pagina) == 15 and pagina.has_next()
+
+    resp = client.get(reverse("pacientes_lista"), {"cursor": pagina.cursor_siguiente})
+    assert len(resp.context["page_obj"]) == 5
+    assert not resp.context["page_obj"].has_next()
+
+    # Un cursor alterado vuelve a la primera página en lugar de fallar
+    resp = client.get(reverse("pacientes_lista"), {"cursor": "no-es-un-cursor"})
+    assert resp.status_code == 200 and len(resp.context["page_obj"]) == 15
+
+
+@pytest.mark.django_db
+def test_lista_de_citas_pagina_cada_pestana(client):
+    import datetime as dt
+    from consultorio_API.models import Cita
+
+    consultorio = Consultorio.objects.create(nombre="CPC")
+    admin = Usuario.objects.create(username="pag_citas", rol="admin")
+    paciente = Paciente.objects.create(nombre_completo="PPC", fecha_nacimiento="2000-01-01", sexo="M", telefono="1",
+                                       correo="ppc@p.com", direccion="x", consultorio=consultorio)
+    for i in range(23):
+        Cita.objects.create(numero_cita=f"PG{i:02d}", paciente=paciente, consultorio=consultorio,
+                            fecha_hora=dt.datetime(2031, 6, 1, 8) + dt.timedelta(minutes=30 * i), duracion=30)
+    Cita.objects.create(numero_cita="PGC", paciente=paciente, consultorio=consultorio,
+                        fecha_hora=dt.datetime(2031, 6, 2, 8), duracion=30, estado="cancelada")
+    client.force_login(admin)
+
+    response = client.get(reverse("citas_lista"))
+    grupos = response.context["grupos"]
+    assert len(grupos["sin_asignar"]) == 20 and grupos["sin_asignar"].has_next()
+    assert [c.numero_cita for c in grupos["canceladas"]] == ["PGC"]
+    assert response.context["conteos"]["sin_asignar"] == 23
+    assert b"cursor_sin_asignar=" in response.content
+
+    siguiente = client.get(reverse("citas_lista"), {"cursor_sin_asignar": grupos["sin_asignar"].cursor_siguiente})
+    assert [c.numero_cita for c in siguiente.context["grupos"]["sin_asignar"]] == ["PG20", "PG21", "PG22"]
+    # Las demás pestañas no se mueven
+    assert [c.numero_cita for c in siguiente.context["grupos"]["canceladas"]] == ["PGC"]
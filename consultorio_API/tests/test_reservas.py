@@ -0,0 +1,89 @@
+import datetime as dt
+import threading
+
+import pytest
+from django.db import connection, connections
+
+from consultorio_API.models import BloqueoAgenda, Cita, Consultorio, Paciente
+from consultorio_API.reservas import HorarioOcupado, cita_que_solapa, reservar_cita
+
+
+def _base():
+    consultorio = Consultorio.objects.create(nombre="CR1", horario_apertura=dt.time(8, 0), horario_cierre=dt.time(18, 0))
+    paciente = Paciente.objects.create(nombre_completo="PR1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="r@p.com", direccion="x", consultorio=consultorio)
+    return consultorio, paciente
+
+
+def _cita(consultorio, paciente, numero, inicio, duracion=30, **extra):
+    return Cita(numero_cita=numero, paciente=paciente, consultorio=consultorio, fecha_hora=inicio, duracion=duracion, **extra)
+
+
+@pytest.mark.django_db
+def test_reserva_rechaza_solapes_y_acepta_contiguas(django_assert_num_queries):
+    consultorio, paciente = _base()
+    dia = dt.date(2031, 2, 3)
+    larga = reservar_cita(_cita(consultorio, paciente, "R1", dt.datetime.combine(dia, dt.time(9, 0)), 120))
+    assert BloqueoAgenda.objects.filter(consultorio=consultorio, fecha=dia).exists()
+
+    # La cita de 2 h empieza antes de la ventana de una cita corta y aún la ocupa
+    with django_assert_num_queries(1):
+        assert cita_que_solapa(consultorio, dt.datetime.combine(dia, dt.time(10, 30)), 30) == larga
+
+    with pytest.raises(HorarioOcupado) as exc:
+        reservar_cita(_cita(consultorio, paciente, "R2", dt.datetime.combine(dia, dt.time(10, 45)), 30))
+    assert "PR1 de 09:00 a 11:00" in exc.value.message
+    assert not Cita.objects.filter(numero_cita="R2").exists()
+
+    reservar_cita(_cita(consultorio, paciente, "R3", dt.datetime.combine(dia, dt.time(11, 0)), 30))
+    reservar_cita(_cita(consultorio, paciente, "R4", dt.datetime.combine(dia, dt.time(10, 0)), 30, estado="cancelada"))
+
+    # Editar una cita no choca consigo misma
+    larga.duracion = 90
+    reservar_cita(larga)
+    assert Cita.objects.get(pk=larga.pk).duracion == 90
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(connection.vendor == "sqlite", reason="SQLite no soporta SELECT ... FOR UPDATE")
+def test_reservas_concurrentes_no_duplican_horario():
+    consultorio, paciente = _base()
+    inicio = dt.datetime(2031, 2, 4, 9, 0)
+    hilos = 8
+    barrera = threading.Barrier(hilos)
+    resultados = []
+
+    def _reservar(i):
+        try:
+            barrera.wait()
+            reservar_cita(_cita(consultorio, paciente, f"RC{i}", inicio + dt.timedelta(minutes=5 * i), 30))
+            resultados.append("ok")
+        except HorarioOcupado:
+            resultados.append("ocupado")
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=_reservar, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Todos los horarios piden 30 min dentro de los mismos 35 min: sólo una gana
+    assert sorted(resultados) == ["ok"] + ["ocupado"] * (hilos - 1)
+    assert Cita.objects.filter(consultorio=consultorio).count() == 1
+
+
+@pytest.mark.django_db
+def test_fila_de_bloqueo_se_crea_fuera_del_bloqueo():
+    from django.core.exceptions import ValidationError
+    from django.db import IntegrityError, transaction
+
+    consultorio, paciente = _base()
+    reservar_cita(_cita(consultorio, paciente, "RB1", dt.datetime(2031, 2, 5, 23, 30), 60))
+    # La cita cruza la medianoche: un bloqueo por día
+    assert set(BloqueoAgenda.objects.values_list("fecha", flat=True)) == {dt.date(2031, 2, 5), dt.date(2031, 2, 6)}
+
+    with pytest.raises(ValidationError):
+        _cita(consultorio, paciente, "RB2", dt.datetime(2031, 2, 7, 9, 0), 300).full_clean()
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Cita.objects.filter(numero_cita="RB1").update(duracion=300)
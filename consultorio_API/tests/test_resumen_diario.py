@@ -0,0 +1,71 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from consultorio_API.models import Usuario, Paciente, Consulta, Consultorio, Cita, ResumenDiario
+
+
+def _filas():
+    campos = ("consultorio_id", "medico_id", "fecha", "estado", "citas", "consultas")
+    filas = ResumenDiario.objects.exclude(citas=0, consultas=0).values_list(*campos)
+    return sorted(filas, key=str)
+
+
+@pytest.mark.django_db
+def test_resumen_incremental_coincide_con_reconstruccion():
+    consultorio = Consultorio.objects.create(nombre="CR1")
+    medico = Usuario.objects.create(username="docr1", rol="medico", first_name="Doc", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PR1", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="r@p.com", direccion="x", consultorio=consultorio)
+    ahora = timezone.now()
+
+    c1 = Cita.objects.create(numero_cita="R1", paciente=paciente, consultorio=consultorio, fecha_hora=ahora, duracion=30)
+    c2 = Cita.objects.create(numero_cita="R2", paciente=paciente, consultorio=consultorio, fecha_hora=ahora, duracion=30)
+    Cita.objects.create(numero_cita="R3", paciente=paciente, consultorio=consultorio, fecha_hora=ahora - timezone.timedelta(days=3), duracion=30)
+
+    c1 = Cita.objects.get(pk=c1.pk)
+    c1.medico_asignado = medico
+    c1.estado = "confirmada"
+    c1.save()
+    c2.fecha_hora = ahora + timezone.timedelta(days=1)
+    c2.save()
+
+    consulta = Consulta.objects.create(paciente=paciente, medico=medico, cita=c1, tipo="con_cita", estado="espera")
+    consulta.estado = "finalizada"
+    consulta.fecha_atencion = ahora
+    consulta.save()
+    Cita.objects.get(numero_cita="R3").delete()
+
+    incremental = _filas()
+    call_command("reconstruir_resumenes")
+    assert _filas() == incremental
+
+    hoy = ahora.date()
+    fila = ResumenDiario.objects.get(medico=medico, fecha=hoy, estado="completada")
+    assert fila.citas == 1
+    assert ResumenDiario.objects.get(medico=medico, fecha=hoy, estado="finalizada").consultas == 1
+
+
+@pytest.mark.django_db
+def test_consultas_stats_ajax_lee_resumen(client):
+    consultorio = Consultorio.objects.create(nombre="CR2")
+    medico = Usuario.objects.create(username="docr2", rol="medico", first_name="Doc", consultorio=consultorio)
+    paciente = Paciente.objects.create(nombre_completo="PR2", fecha_nacimiento="2000-01-01", sexo="M", telefono="1", correo="r2@p.com", direccion="x", consultorio=consultorio)
+    Consulta.objects.create(paciente=paciente, medico=medico, tipo="sin_cita", estado="espera")
+    Consulta.objects.create(paciente=paciente, medico=medico, tipo="sin_cita", estado="finalizada", fecha_atencion=timezone.now())
+
+    client.force_login(medico)
+    data = client.get(reverse("ajax_consultas_stats")).json()
+    assert data["pendientes"] == 1
+    assert data["finalizadas"] == 1
+    assert data["total"] == 2
+    assert data["hoy"] == 2
+
+
+@pytest.mark.django_db
+def test_clave_sin_medico_no_admite_filas_duplicadas():
+    from django.db import IntegrityError, transaction
+
+    hoy = timezone.now().date()
+    ResumenDiario.objects.create(fecha=hoy, estado="programada", citas=1)
+    with pytest.raises(IntegrityError), transaction.atomic():
+        ResumenDiario.objects.create(fecha=hoy, estado="programada", citas=1)
@@ -57,6 +57,7 @@ urlpatterns = [
     path('citas/<uuid:cita_id>/liberar/', viewscitas.liberar_cita, name='liberar_cita'),
     path('citas/mis-citas/', viewscitas.mis_citas_asignadas, name='mis_citas_asignadas'),
     path('citas/calendario/', viewscitas.citas_calendario, name='citas_calendario'),
+    path('citas/calendario/data/', viewscitas.citas_calendario_data, name='citas_calendario_data'),
     
     # CONSULTAS
     path('consultas/', views.ConsultaListView.as_view(), name='consultas_lista'),
@@ -153,6 +154,9 @@ urlpatterns = [
           path('ajax/horarios-disponibles/',
         viewscitas.ajax_horarios_disponibles,
         name='ajax_horarios_disponibles'),
+    path('ajax/horarios-proximos/',
+        viewscitas.ajax_proximos_horarios,
+        name='ajax_proximos_horarios'),
         path('ajax/citas-previas/',
          viewscitas.ajax_citas_previas,
          name='ajax_citas_previas'),
@@ -162,6 +166,7 @@ urlpatterns = [
     # COLA VIRTUAL - NUEVAS RUTAS
     path('cola-virtual/', views.cola_virtual, name='cola_virtual'),
     path('cola-virtual/data/', views.cola_virtual_data, name='cola_virtual_data'),
+    path('cola-virtual/eventos/', views.cola_virtual_eventos, name='cola_virtual_eventos'),
 
     path('signos/<int:pk>/editar/', views.signos_editar, name='signos_editar'), # Added
     path('signos/<int:pk>/eliminar/', views.signos_eliminar, name='signos_eliminar'), # Added
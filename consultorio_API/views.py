@@ -3,10 +3,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import UserPassesTestMixin, LoginRequiredMixin
 from django.contrib import messages
 from django.contrib.auth import logout
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Sum
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import get_template, render_to_string
-from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.urls import reverse_lazy, reverse
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -27,20 +27,33 @@ from django.utils.timezone import localtime
 from django.forms import inlineformset_factory
 from django.views.generic.edit import FormView
 from django.core.paginator import Paginator
+import asyncio
 import json
+import time as time_module
 import csv
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.contenttypes.models import ContentType
 from .models import (
     Antecedente, Auditoria, HorarioMedico, MedicamentoActual, MedicamentoRecetado,
     Notificacion, Receta, SignosVitales, Usuario, Paciente, Cita, Consulta,
-    Expediente, Consultorio
+    Expediente, Consultorio, ResumenDiario
 )
 from .forms import *
 from .utils import redirect_next
 from django.utils.http import url_has_allowed_host_and_scheme
 from .pdf.receta_reportlab import build_receta_pdf
 from .catalogo_excel import catalogo_disponible, limpiar_cache_catalogo
+from . import auditoria_estadisticas, cache_consultorio, cola_eventos, contador_notificaciones
+from .cola_turnos import construir_cola
+from .exportacion import exportar_auditoria, exportar_citas
+from .paginacion import PaginacionCursorMixin, etiqueta_total, paginar_grupos, total_aproximado
+from .reservas import HorarioOcupado, reservar_cita
+from .estadisticas import (
+    calcular_estadisticas, calcular_graficas, citas_por_rol, consultas_por_rol,
+    estadisticas_citas, estadisticas_consultas,
+)
 
 
 def doctor_tiene_consulta_en_progreso(medico):
@@ -125,74 +138,15 @@ class BaseDashboardView(LoginRequiredMixin, View):
 
     def get_queryset_citas(self, user):
         """Filtrar citas según el rol del usuario - CORREGIDO"""
-        qs = Cita.objects.select_related("paciente", "medico_asignado", "consultorio")
-        if user.rol == "medico":
-            qs = qs.filter(Q(consultorio=user.consultorio) | Q(medico_asignado=user))
-        elif user.rol == "asistente" and user.consultorio:
-            qs = qs.filter(consultorio=user.consultorio)
-        return qs
+        return citas_por_rol(user).select_related("paciente", "medico_asignado", "consultorio")
 
     def get_queryset_consultas(self, user):
         """Filtrar consultas según el rol del usuario"""
-        qs = Consulta.objects.select_related("paciente", "medico")
-        if user.rol == "medico":
-            qs = qs.filter(medico=user)
-        elif user.rol == "asistente" and user.consultorio:
-            qs = qs.filter(medico__consultorio=user.consultorio)
-        return qs
+        return consultas_por_rol(user).select_related("paciente", "medico")
 
     def get_estadisticas(self, user):
-        hoy = timezone.now().date()
-        ayer = hoy - timedelta(days=1)
-        inicio_semana = hoy - timedelta(days=hoy.weekday())
-        inicio_mes = hoy.replace(day=1)
-        
-        # Citas de hoy
-        citas_hoy = self.get_queryset_citas(user).filter(fecha_hora__date=hoy).count()
-        citas_ayer = self.get_queryset_citas(user).filter(fecha_hora__date=ayer).count()
-        citas_hoy_diff = f"+{citas_hoy - citas_ayer}" if citas_hoy >= citas_ayer else f"{citas_hoy - citas_ayer}"
-        
-        # Consultas finalizadas esta semana
-        consultas_finalizadas = self.get_queryset_consultas(user).filter(
-            estado="finalizada",
-            fecha_atencion__date__gte=inicio_semana
-        ).count()
-        
-        # Consultas pendientes
-        consultas_pendientes = self.get_queryset_consultas(user).filter(
-            estado__in=["espera", "en_progreso"]
-        ).count()
-        
-        # Pacientes totales y nuevos este mes
-        pacientes_qs = Paciente.objects.all()
-        if user.rol == "medico" and user.consultorio:
-            pacientes_qs = pacientes_qs.filter(consultorio=user.consultorio)
-        elif user.rol == "asistente" and user.consultorio:
-            pacientes_qs = pacientes_qs.filter(consultorio=user.consultorio)
-        
-        pacientes_totales = pacientes_qs.count()
-        
-        # CORREGIDO: Usar el campo correcto o eliminar el filtro temporal
-        try:
-            if hasattr(Paciente, 'fecha_creacion'):
-                pacientes_nuevos = pacientes_qs.filter(fecha_creacion__date__gte=inicio_mes).count()
-            elif hasattr(Paciente, 'created_at'):
-                pacientes_nuevos = pacientes_qs.filter(created_at__date__gte=inicio_mes).count()
-            elif hasattr(Paciente, 'date_joined'):
-                pacientes_nuevos = pacientes_qs.filter(date_joined__date__gte=inicio_mes).count()
-            else:
-                pacientes_nuevos = 0
-        except:
-            pacientes_nuevos = 0
-        
-        return {
-            'citas_hoy': citas_hoy,
-            'citas_hoy_diff': citas_hoy_diff,
-            'consultas_finalizadas': consultas_finalizadas,
-            'consultas_pendientes': consultas_pendientes,
-            'pacientes_totales': pacientes_totales,
-            'pacientes_nuevos': pacientes_nuevos,
-        }
+        """KPIs del dashboard resueltos con agregados condicionales."""
+        return calcular_estadisticas(user)
 
     def get_eventos_calendario(self, user):
         """Generar eventos para el calendario - CORREGIDO"""
@@ -273,45 +227,13 @@ class BaseDashboardView(LoginRequiredMixin, View):
         return actividades[:5]
 
     def get_datos_graficas(self, user):
-        """Generar datos para las gráficas"""
-        # Gráfica de estados
-        estados_count = self.get_queryset_citas(user).values('estado').annotate(
-            total=Count('id')
-        )
-        
-        estado_map = ['programada', 'confirmada', 'en_espera', 'completada', 'cancelada', 'no_asistio']
-        estado_labels = ['Programadas', 'Confirmadas', 'En Espera', 'Completadas', 'Canceladas', 'No Asistió']
-        estado_data = []
-        
-        for estado in estado_map:
-            count = next((x['total'] for x in estados_count if x['estado'] == estado), 0)
-            estado_data.append(count)
-
-        # Gráfica de consultas por día (últimos 30 días)
-        hace_30 = timezone.now() - timedelta(days=30)
-        consultas_por_dia = self.get_queryset_consultas(user).filter(
-            estado="finalizada",
-            fecha_atencion__date__gte=hace_30.date()
-        ).extra(
-            select={'dia': 'DATE(fecha_atencion)'}
-        ).values('dia').annotate(
-            total=Count('id')
-        )
-
-        # Crear lista de días
-        dias = []
-        data_dias = []
-        for i in range(30):
-            dia = (hace_30 + timedelta(days=i)).date()
-            dias.append(dia.strftime('%d/%m'))
-            count = next((x['total'] for x in consultas_por_dia if str(x['dia']) == str(dia)), 0)
-            data_dias.append(count)
-
+        """Generar datos para las gráficas (desde el resumen diario)"""
+        graficas = calcular_graficas(user)
         return {
-            'labels_estados': estado_labels,
-            'data_estados': estado_data,
-            'labels_dias': dias,
-            'data_dias': data_dias
+            'labels_estados': graficas.labels_estados,
+            'data_estados': graficas.data_estados,
+            'labels_dias': graficas.labels_dias,
+            'data_dias': graficas.data_dias,
         }
 
     def get(self, request):
@@ -562,11 +484,12 @@ class PacienteDetallePermisoMixin(UserPassesTestMixin):
         return redirect_next(self.request, "pacientes_lista")
 
 
-class PacienteListView(PacientePermisoMixin, ListView):
+class PacienteListView(PacientePermisoMixin, PaginacionCursorMixin, ListView):
     model = Paciente
     template_name = "PAGES/pacientes/lista.html"
     context_object_name = "pacientes"
     paginate_by = 15
+    orden_cursor = ("nombre_completo", "id")
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -968,36 +891,6 @@ def cola_virtual_data(request):
 # 📅 CITAS - SISTEMA POR CONSULTORIO
 # ═══════════════════════════════════════════════════════════════
 
-def marcar_citas_vencidas():
-    """Marca como 'no asistió' las citas vencidas y cancela su consulta.
-
-    Una cita se considera vencida diez minutos después de la hora
-    programada. Esto aplica también a citas reprogramadas.
-    """
-    ahora = timezone.now()
-    limite = ahora - timedelta(minutes=10)
-    citas = (
-        Cita.objects.filter(
-            fecha_hora__lt=limite,
-            estado__in=["programada", "confirmada", "reprogramada"],
-        )
-        .select_related("consulta")
-    )
-
-    for cita in citas:
-        cita.estado = "no_asistio"
-        cita.fecha_cancelacion = ahora
-        cita.motivo_cancelacion = "No asistió a la cita"
-        cita.save()
-
-        # ✅ También cancelamos la consulta asociada si la cita cambia a “no asistió”
-        if hasattr(cita, "consulta") and cita.consulta:
-            consulta = cita.consulta
-            consulta.estado = "cancelada"
-            if hasattr(consulta, "motivo_cancelacion"):
-                consulta.motivo_cancelacion = "No asistió a la cita"
-            consulta.save()
-
 class CitaPermisoMixin(UserPassesTestMixin):
     def test_func(self):
         return self.request.user.is_authenticated and self.request.user.rol in ('medico', 'asistente', 'admin')
@@ -1006,7 +899,6 @@ class CitaPermisoMixin(UserPassesTestMixin):
 @login_required
 def lista_citas(request):
     """Lista de citas filtrada por consultorio del usuario"""
-    marcar_citas_vencidas()
     user = request.user
     
     # ✅ USAR LA FUNCIÓN REUTILIZABLE
@@ -1063,10 +955,9 @@ def lista_citas(request):
         'canceladas': citas.filter(estado__in=['cancelada', 'no_asistio']),
     }
     
-    # Paginación
-    paginator = Paginator(citas, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Una página por pestaña, por cursor (sin OFFSET)
+    conteos = {nombre: qs.count() for nombre, qs in grupos.items()}
+    grupos = paginar_grupos(grupos, ('fecha_hora', 'id'), request.GET, 20)
     
     # Permisos
     permisos = {
@@ -1089,10 +980,10 @@ def lista_citas(request):
         medicos_disponibles = Usuario.objects.none()
     
     context = {
-        'page_obj': page_obj,
         'filtro_form': filtro_form,
         'stats': stats,
         'grupos': grupos,
+        'conteos': conteos,
         'permisos': permisos,
         'medicos_disponibles': medicos_disponibles,
         'usuario': user,
@@ -1124,18 +1015,11 @@ def crear_cita(request):
                 elif request.user.rol == 'medico' and request.user.consultorio:
                     cita.consultorio = request.user.consultorio
                 
-                # Validar conflictos de horario antes de guardar
-                conflictos = validar_conflictos_horario(
-                    cita.consultorio,
-                    cita.fecha_hora,
-                    cita.duracion,
-                    excluir_cita_id=None
-                )
-                
-                if conflictos:
-                    form.add_error(None, f"Conflicto de horario detectado: {conflictos}")
+                try:
+                    reservar_cita(cita)
+                except HorarioOcupado as e:
+                    form.add_error(None, f"Conflicto de horario detectado: {e.message}")
                 else:
-                    cita.save()
                     messages.success(request, f'Cita {cita.numero_cita} creada exitosamente.')
                     
                     # Crear notificación para médicos del consultorio
@@ -1180,17 +1064,11 @@ def crear_cita_para_paciente(request, paciente_id):
                 elif request.user.rol == 'medico' and request.user.consultorio:
                     cita.consultorio = request.user.consultorio
 
-                conflictos = validar_conflictos_horario(
-                    cita.consultorio,
-                    cita.fecha_hora,
-                    cita.duracion,
-                    excluir_cita_id=None
-                )
-
-                if conflictos:
-                    form.add_error(None, f"Conflicto de horario detectado: {conflictos}")
+                try:
+                    reservar_cita(cita)
+                except HorarioOcupado as e:
+                    form.add_error(None, f"Conflicto de horario detectado: {e.message}")
                 else:
-                    cita.save()
                     messages.success(request, f'Cita {cita.numero_cita} creada exitosamente.')
                     crear_notificacion_nueva_cita(cita)
                     return redirect_next(request, 'paciente_detalle', pk=paciente.id)
@@ -1779,36 +1657,6 @@ def get_color_by_estado(estado):
     return colors.get(estado, '#6c757d')
 
 
-def validar_conflictos_horario(consultorio, fecha_hora, duracion, excluir_cita_id=None):
-    """Valida si hay conflictos de horario para una cita"""
-    try:
-        inicio_cita = fecha_hora
-        fin_cita = fecha_hora + timedelta(minutes=duracion)
-        
-        # Buscar citas que se solapen en el mismo consultorio
-        citas_existentes = Cita.objects.filter(
-            consultorio=consultorio,
-            fecha_hora__date=fecha_hora.date(),
-            estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']
-        )
-        
-        if excluir_cita_id:
-            citas_existentes = citas_existentes.exclude(id=excluir_cita_id)
-        
-        for cita_existente in citas_existentes:
-            inicio_existente = cita_existente.fecha_hora
-            fin_existente = cita_existente.fecha_hora + timedelta(minutes=cita_existente.duracion)
-            
-            # Verificar solapamiento
-            if (inicio_cita < fin_existente and fin_cita > inicio_existente):
-                return f"Se solapa con cita de {cita_existente.paciente.nombre_completo} de {inicio_existente.strftime('%H:%M')} a {fin_existente.strftime('%H:%M')}"
-        
-        return None
-        
-    except Exception as e:
-        return f"Error al validar conflictos: {str(e)}"
-
-
 def crear_notificacion_nueva_cita(cita):
     """Crea notificación para médicos del consultorio sobre nueva cita"""
     try:
@@ -1884,7 +1732,9 @@ class ConsultaListView(LoginRequiredMixin, ListView):
     model = Consulta
     template_name = "PAGES/consultas/lista.html"
     context_object_name = "consultas"
-    paginate_by = 50
+    # La plantilla muestra una pestaña por estado: se pagina cada una por cursor
+    por_pagina = 50
+    orden_cursor = ("-fecha_creacion", "-id")
 
     def get_queryset(self):
         user = self.request.user
@@ -1944,14 +1794,18 @@ class ConsultaListView(LoginRequiredMixin, ListView):
             "sin_cita": consultas_sin_cita.count(),
         }
 
-        # Agrupaciones para pestañas
+        # Agrupaciones para pestañas, una página por pestaña
+        paginas = paginar_grupos({
+            "pendientes": consultas.filter(estado="espera"),
+            "en_progreso": consultas.filter(estado="en_progreso"),
+            "finalizadas": consultas.filter(estado="finalizada"),
+            "canceladas": consultas.filter(estado="cancelada"),
+        }, self.orden_cursor, self.request.GET, self.por_pagina)
         ctx.update({
-            "consultas_pendientes": consultas.filter(estado="espera"),
-            "consultas_en_progreso": consultas.filter(estado="en_progreso"),
-            "consultas_finalizadas": consultas.filter(estado="finalizada"),
-            "consultas_canceladas": consultas.filter(estado="cancelada"),
-            "consultas_con_cita": consultas_con_cita,
-            "consultas_sin_cita": consultas_sin_cita,
+            "consultas_pendientes": paginas["pendientes"],
+            "consultas_en_progreso": paginas["en_progreso"],
+            "consultas_finalizadas": paginas["finalizadas"],
+            "consultas_canceladas": paginas["canceladas"],
         })
 
         # Médicos con consulta en progreso para ocultar botón "Atender"
@@ -1959,10 +1813,11 @@ class ConsultaListView(LoginRequiredMixin, ListView):
             consultas.filter(estado="en_progreso", medico__isnull=False)
             .values_list("medico_id", flat=True)
         )
-        for con in consultas:
-            con.medico_en_otro_progreso = (
-                con.medico_id in medicos_ocupados and con.estado != "en_progreso"
-            )
+        for pagina in paginas.values():
+            for con in pagina:
+                con.medico_en_otro_progreso = (
+                    con.medico_id in medicos_ocupados and con.estado != "en_progreso"
+                )
 
         # Médicos disponibles para filtros
         if usuario.consultorio and usuario.rol != "admin":
@@ -1995,66 +1850,9 @@ class ConsultaListView(LoginRequiredMixin, ListView):
 
 @login_required
 def exportar_citas_csv(request):
-    """Exportar citas a CSV"""
+    """Exportar citas a CSV o JSONL (streaming)"""
     try:
-        user = request.user
-        
-        # Filtrar citas según rol
-        if user.rol == 'admin':
-            citas = Cita.objects.all()
-        elif user.rol == 'medico':
-            citas = Cita.objects.filter(
-                Q(consultorio=user.consultorio) | Q(medico_asignado=user)
-            )
-        elif user.rol == 'asistente':
-            citas = Cita.objects.filter(consultorio=user.consultorio)
-        else:
-            citas = Cita.objects.none()
-        
-        # Aplicar filtros de fecha si existen
-        fecha_desde = request.GET.get('fecha_desde')
-        fecha_hasta = request.GET.get('fecha_hasta')
-        
-        if fecha_desde:
-            try:
-                fecha = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                citas = citas.filter(fecha_hora__date__gte=fecha)
-            except ValueError:
-                pass
-        
-        if fecha_hasta:
-            try:
-                fecha = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                citas = citas.filter(fecha_hora__date__lte=fecha)
-            except ValueError:
-                pass
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="citas_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Número Cita', 'Paciente', 'Consultorio', 'Médico Asignado', 'Médico Preferido',
-            'Fecha y Hora', 'Duración', 'Estado', 'Tipo', 'Prioridad', 'Motivo'
-        ])
-        
-        for cita in citas.select_related('paciente', 'consultorio', 'medico_asignado', 'medico_preferido'):
-            writer.writerow([
-                cita.numero_cita,
-                cita.paciente.nombre_completo,
-                cita.consultorio.nombre if cita.consultorio else '',
-                cita.medico_asignado.get_full_name() if cita.medico_asignado else 'Sin asignar',
-                cita.medico_preferido.get_full_name() if cita.medico_preferido else '',
-                cita.fecha_hora.strftime('%d/%m/%Y %H:%M'),
-                f"{cita.duracion} min",
-                cita.get_estado_display(),
-                cita.get_tipo_cita_display(),
-                cita.get_prioridad_display(),
-                cita.motivo or ''
-            ])
-        
-        return response
-        
+        return exportar_citas(request)
     except Exception as e:
         messages.error(request, f'Error al exportar: {str(e)}')
 
@@ -2199,59 +1997,19 @@ def cola_virtual(request):
         messages.error(request, 'No tienes consultorio asignado.')
         return redirect_next(request, 'home')
     
-    # Consultas en espera (con y sin cita)
-    consultas = (
-        Consulta.objects
-        .filter(estado='espera')
-        .select_related('paciente', 'medico')
-        .order_by('fecha_creacion')
-    )
-
-    # ✅ OBTENER SOLO CITAS PRÓXIMAS - APLICAR TODOS LOS FILTROS ANTES DEL SLICE
-    ahora = timezone.now()
-    citas = get_citas_queryset(user)
-
-    # Aplicar filtros base
-    citas_proximas = citas.filter(
-        consultorio=consultorio,
-        fecha_hora__gte=ahora,  # Solo citas futuras
-        estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']  # Solo estados activos
+    # Una sola carga de las citas del día, repartida en memoria por turno
+    cola = construir_cola(
+        get_citas_queryset(user), consultorio, fecha, estado=request.GET.get('estado')
     )
-    
-    # ✅ Filtro por estado ANTES del slice
-    estado_filtro = request.GET.get('estado')
-    if estado_filtro:
-        citas_proximas = citas_proximas.filter(estado=estado_filtro)
-    
-    # ✅ Ordenar y aplicar slice AL FINAL
-    citas_proximas = citas_proximas.order_by('fecha_hora')[:20]  # Limitar a 20 citas próximas
-    
-    # Calcular estadísticas (sin slice para contar correctamente)
-    citas_stats = citas.filter(
-        consultorio=consultorio,
-        fecha_hora__gte=ahora,
-        estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']
-    )
-    
-    if estado_filtro:
-        citas_stats = citas_stats.filter(estado=estado_filtro)
-    
-    stats = {
-        'total': citas_stats.count(),
-        'sin_asignar': citas_stats.filter(medico_asignado__isnull=True).count(),
-        'asignadas': citas_stats.filter(medico_asignado__isnull=False).count(),
-        'en_espera': citas_stats.filter(estado='en_espera').count(),
-        'en_atencion': citas_stats.filter(estado='en_atencion').count(),
-        'completadas': citas_stats.filter(estado='completada').count(),
-    }
+    citas_proximas = cola.citas_proximas
     
     context = {
         'fecha': fecha,
         'consultorio': consultorio,
         'consultorios': consultorios,
-        'consultas': consultas,
+        'consultas': cola.consultas,
         'citas_proximas': citas_proximas,  # ✅ Solo citas próximas
-        'stats': stats,
+        'stats': cola.stats,
         'usuario': user,
         'now': timezone.now(),
         'total_citas': len(citas_proximas),  # Usar len() porque ya es una lista
@@ -2260,6 +2018,10 @@ def cola_virtual(request):
     return render(request, 'PAGES/citas/cola_virtual.html', context)
 
 
+# Segundos que se reutiliza la respuesta de cola_virtual_data
+COLA_CACHE_TIMEOUT = 60
+
+
 @login_required
 def cola_virtual_data(request):
     """Vista AJAX para actualizar datos de la cola virtual"""
@@ -2279,69 +2041,129 @@ def cola_virtual_data(request):
         if not consultorio:
             return JsonResponse({'success': False, 'error': 'No hay consultorio asignado'})
         
-        # Consultas en espera (con y sin cita)
-        consultas = (
-            Consulta.objects
-            .filter(estado='espera')
-            .select_related('paciente', 'medico')
-            .order_by('fecha_creacion')
-        )
-
-        # ✅ OBTENER SOLO CITAS PRÓXIMAS - APLICAR TODOS LOS FILTROS ANTES DEL SLICE
-        ahora = timezone.now()
-        citas = get_citas_queryset(user)
-        
-        # Aplicar filtros base
-        citas_proximas = citas.filter(
-            consultorio=consultorio,
-            fecha_hora__gte=ahora,  # Solo citas futuras
-            estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']  # Solo estados activos
-        )
-        
-        # ✅ Filtro por estado ANTES del slice
         estado_filtro = request.GET.get('estado')
-        if estado_filtro:
-            citas_proximas = citas_proximas.filter(estado=estado_filtro)
         
-        # ✅ Ordenar y aplicar slice AL FINAL
-        citas_proximas = citas_proximas.order_by('fecha_hora')[:20]  # Limitar a 20 citas próximas
-        
-        # Calcular estadísticas (sin slice para contar correctamente)
-        citas_stats = citas.filter(
-            consultorio=consultorio,
-            fecha_hora__gte=ahora,
-            estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']
+        def _datos():
+            cola = construir_cola(get_citas_queryset(user), consultorio, fecha, estado=estado_filtro)
+            html = render_to_string('PAGES/citas/partials/turnos_cola.html', {
+                'citas_proximas': cola.citas_proximas,
+                'consultas': cola.consultas,
+                'usuario': user,
+            })
+            return {'html': html, 'stats': cola.stats}
+        
+        # Las consultas en espera son de todos los consultorios, así que la
+        # entrada depende también de su ámbito; el TTL corto cubre que las
+        # citas "próximas" dependen de la hora actual.
+        clave = cache_consultorio.clave(
+            'cola_virtual_data', user, consultorio_id=consultorio.pk, fecha=fecha,
+            ambitos=cache_consultorio.ambitos_usuario(user) + [cache_consultorio.CONSULTAS_ESPERA],
+            estado=estado_filtro or '',
         )
-        
-        if estado_filtro:
-            citas_stats = citas_stats.filter(estado=estado_filtro)
-        
-        stats = {
-            'total': citas_stats.count(),
-            'sin_asignar': citas_stats.filter(medico_asignado__isnull=True).count(),
-            'asignadas': citas_stats.filter(medico_asignado__isnull=False).count(),
-            'en_espera': citas_stats.filter(estado='en_espera').count(),
-            'en_atencion': citas_stats.filter(estado='en_atencion').count(),
-            'completadas': citas_stats.filter(estado='completada').count(),
-        }
-        
-        # Renderizar HTML de las citas próximas
-        html = render_to_string('PAGES/citas/partials/turnos_cola.html', {
-            'citas_proximas': citas_proximas,
-            'consultas': consultas,
-            'usuario': user,
-        })
+        datos = cache_consultorio.obtener_o_calcular(clave, _datos, timeout=COLA_CACHE_TIMEOUT)
         
         return JsonResponse({
             'success': True,
-            'html': html,
-            'stats': stats
+            'html': datos['html'],
+            'stats': datos['stats']
         })
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+# Segundos entre comentarios de keep-alive del stream de la cola
+COLA_SSE_HEARTBEAT = 20
+# Duración máxima de un stream; el navegador se reconecta solo. Acota las
+# suscripciones de clientes que se desconectaron sin que el servidor lo note.
+COLA_SSE_DURACION = 300
+
+
+def _consultorio_cola(request):
+    """
+    (consultorio_id, fecha) que puede seguir el usuario, o None.
+    ``fecha=todas`` sigue todos los días (fecha None).
+    """
+    user = request.user
+    if not user.is_authenticated or user.rol not in ['medico', 'asistente', 'admin']:
+        return None
+    if user.rol == 'admin' and request.GET.get('consultorio'):
+        consultorio = Consultorio.objects.filter(pk=request.GET['consultorio']).first()
+    else:
+        consultorio = user.consultorio
+    if not consultorio:
+        return None
+    if request.GET.get('fecha') == 'todas':
+        return consultorio.pk, None
+    try:
+        fecha = datetime.strptime(request.GET.get('fecha', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha = timezone.now().date()
+    return consultorio.pk, fecha
+
+
+def _sse(evento):
+    if evento is None:
+        return ': ping\n\n'
+    return f"event: cola\ndata: {json.dumps(evento)}\n\n"
+
+
+def _stream_cola_async(consultorio_id, fecha):
+    async def stream():
+        suscripcion = cola_eventos.suscribir(consultorio_id, fecha)
+        try:
+            yield 'retry: 5000\n\n'
+            loop = asyncio.get_running_loop()
+            fin = loop.time() + COLA_SSE_DURACION
+            while loop.time() < fin:
+                yield _sse(await suscripcion.siguiente(COLA_SSE_HEARTBEAT))
+        finally:
+            cola_eventos.cancelar(suscripcion)
+    return stream()
+
+
+def _stream_cola_sync(consultorio_id, fecha):
+    # Bajo WSGI el generador ocupa el hilo de la petición mientras dura; si
+    # el cliente se fue, el siguiente ping falla y el finally suelta la suscripción
+    suscripcion = cola_eventos.suscribir(consultorio_id, fecha, sincrona=True)
+    try:
+        yield 'retry: 5000\n\n'
+        fin = time_module.monotonic() + COLA_SSE_DURACION
+        while time_module.monotonic() < fin:
+            yield _sse(suscripcion.esperar(COLA_SSE_HEARTBEAT))
+    finally:
+        cola_eventos.cancelar(suscripcion)
+
+
+def cola_virtual_eventos(request):
+    """
+    Server-Sent Events de la cola virtual: envía sólo los deltas (cita nueva,
+    cambio de estado, cambio de grupo, eliminación) de un consultorio y día.
+
+    Bajo ASGI el stream es un generador asíncrono; bajo WSGI (runserver) uno
+    síncrono, porque Django 4.2 consumiría completo un iterador asíncrono
+    antes de enviar nada. Con ``COLA_SSE_WSGI = False`` (por defecto fuera
+    de runserver) la vista responde 204 bajo WSGI y el navegador usa el
+    sondeo periódico.
+    """
+    destino = _consultorio_cola(request)
+    if destino is None:
+        return HttpResponseForbidden('No tienes acceso a la cola virtual.')
+    consultorio_id, fecha = destino
+
+    if isinstance(request, ASGIRequest):
+        stream = _stream_cola_async(consultorio_id, fecha)
+    elif getattr(settings, 'COLA_SSE_WSGI', False):
+        stream = _stream_cola_sync(consultorio_id, fecha)
+    else:
+        return HttpResponse(status=204)  # EventSource no reintenta tras un 204
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no acumular el stream
+    return response
+
+
 
 # ═══════════════════════════════════════════════════════════════
 # 🏥 VISTAS DE CONSULTAS FALTANTES
@@ -3420,12 +3242,16 @@ class AuditMiddleware(MiddlewareMixin):
 
     def __call__(self, request):
         from .audit_generic import set_current_request
+        from . import auditoria_eventos
         set_current_request(request)
+        auditoria_eventos.abrir_peticion()
         
         try:
             response = self.get_response(request)
             return response
         finally:
+            # Una sola fila de auditoría por objeto tocado en la petición
+            auditoria_eventos.cerrar_peticion()
             # Limpiar el request del thread local después de la respuesta
             set_current_request(None)
 
@@ -3434,11 +3260,13 @@ class AuditMiddleware(MiddlewareMixin):
 # 📊 AUDITORÍA MEJORADA
 # ═══════════════════════════════════════════════════════════════
 
-class AuditoriaListView(AdminRequiredMixin, ListView):
+class AuditoriaListView(AdminRequiredMixin, PaginacionCursorMixin, ListView):
     model = Auditoria
     template_name = "PAGES/auditoria/panel.html"
     context_object_name = "registros"
     paginate_by = 25
+    orden_cursor = ("-fecha", "-id")
+    mostrar_total = True
 
     def get_queryset(self):
         qs = Auditoria.objects.select_related('usuario', 'content_type').order_by('-fecha')
@@ -3461,7 +3289,8 @@ class AuditoriaListView(AdminRequiredMixin, ListView):
             try:
                 from datetime import datetime
                 fecha = datetime.strptime(fecha_desde, '%Y-%m-%d')
-                qs = qs.filter(fecha__date__gte=fecha.date())
+                # Rango sobre la columna (no fecha__date) para usar el índice
+                qs = qs.filter(fecha__gte=fecha)
             except ValueError:
                 pass
         
@@ -3469,7 +3298,7 @@ class AuditoriaListView(AdminRequiredMixin, ListView):
             try:
                 from datetime import datetime
                 fecha = datetime.strptime(fecha_hasta, '%Y-%m-%d')
-                qs = qs.filter(fecha__date__lte=fecha.date())
+                qs = qs.filter(fecha__lt=fecha + timedelta(days=1))
             except ValueError:
                 pass
         
@@ -3481,77 +3310,24 @@ class AuditoriaListView(AdminRequiredMixin, ListView):
         
         return qs
 
+    def get(self, request, *args, **kwargs):
+        # El auto-refresco del panel sólo necesita el conteo con los filtros
+        if request.GET.get('solo_conteo'):
+            total, tipo = total_aproximado(self.get_queryset())
+            return JsonResponse({'total': total, 'tipo': tipo, 'etiqueta': etiqueta_total(total, tipo)})
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        
-        # Estadísticas generales
-        total_registros = Auditoria.objects.count()
-        hoy = timezone.now().date()
-        registros_hoy = Auditoria.objects.filter(fecha__date=hoy).count()
-        
-        # Top usuarios más activos
-        from django.db.models import Count
-        usuarios_activos = Auditoria.objects.values(
-            'usuario__first_name', 'usuario__last_name', 'usuario__username'
-        ).annotate(
-            total=Count('id')
-        ).order_by('-total')[:10]
-        
-        # Acciones más comunes
-        acciones_comunes = Auditoria.objects.values('accion').annotate(
-            total=Count('id')
-        ).order_by('-total')[:10]
-        
-        # Modelos más modificados
-        modelos_modificados = Auditoria.objects.values(
-            'content_type__model'
-        ).annotate(
-            total=Count('id')
-        ).order_by('-total')[:10]
-        
-        # IPs más activas
-        ips_activas = Auditoria.objects.exclude(
-            ip_address__isnull=True
-        ).values('ip_address').annotate(
-            total=Count('id')
-        ).order_by('-total')[:10]
-        
-        # Actividad por día (últimos 7 días)
-        from datetime import timedelta
-        hace_7_dias = hoy - timedelta(days=7)
-        actividad_diaria = []
-        
-        for i in range(7):
-            dia = hace_7_dias + timedelta(days=i)
-            count = Auditoria.objects.filter(fecha__date=dia).count()
-            actividad_diaria.append({
-                'fecha': dia,
-                'count': count
-            })
-        
-        # Usuarios para filtro
-        usuarios_filtro = Usuario.objects.filter(
-            id__in=Auditoria.objects.values_list('usuario_id', flat=True).distinct()
-        ).order_by('first_name', 'last_name')
-        
-        # Modelos para filtro
-        modelos_filtro = ContentType.objects.filter(
-            id__in=Auditoria.objects.values_list('content_type_id', flat=True).distinct()
-        ).order_by('model')
-        
+
+        # Estadísticas y listas de filtro desde el resumen en caché
+        resumen = auditoria_estadisticas.obtener()
+
         ctx.update({
             'usuario': self.request.user,
-            'stats': {
-                'total_registros': total_registros,
-                'registros_hoy': registros_hoy,
-                'usuarios_activos': usuarios_activos,
-                'acciones_comunes': acciones_comunes,
-                'modelos_modificados': modelos_modificados,
-                'ips_activas': ips_activas,
-                'actividad_diaria': actividad_diaria,
-            },
-            'usuarios_filtro': usuarios_filtro,
-            'modelos_filtro': modelos_filtro,
+            'stats': resumen['stats'],
+            'usuarios_filtro': resumen['usuarios_filtro'],
+            'modelos_filtro': resumen['modelos_filtro'],
             'filtros_actuales': {
                 'usuario': self.request.GET.get('usuario', ''),
                 'accion': self.request.GET.get('accion', ''),
@@ -3603,38 +3379,14 @@ def auditoria_detalle_ajax(request, auditoria_id):
 
 @login_required
 def auditoria_exportar_csv(request):
-    """Exportar registros de auditoría a CSV"""
+    """Exportar registros de auditoría (con los filtros del panel) a CSV o JSONL"""
     if request.user.rol != 'admin':
         messages.error(request, 'No tienes permisos para exportar auditoría.')
         return redirect_next(request, 'auditoria_lista')
-    
-    import csv
-    from django.http import HttpResponse
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="auditoria.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Fecha', 'Usuario', 'Rol', 'Acción', 'Objeto', 'Descripción', 
-        'IP', 'Navegador'
-    ])
-    
-    registros = Auditoria.objects.select_related('usuario', 'content_type').order_by('-fecha')
-    
-    for registro in registros:
-        writer.writerow([
-            registro.fecha.strftime('%d/%m/%Y %H:%M:%S'),
-            registro.usuario.get_full_name(),
-            registro.usuario.get_rol_display(),
-            registro.accion,
-            f"{registro.content_type.model} #{registro.object_id}",
-            registro.descripcion,
-            registro.ip_address or '',
-            registro.user_agent[:100] if registro.user_agent else '',
-        ])
-    
-    return response
+
+    vista = AuditoriaListView()
+    vista.setup(request)
+    return exportar_auditoria(request, vista.get_queryset())
 
 
 
@@ -3646,11 +3398,12 @@ class NotificacionPermisoMixin:
         return super().dispatch(request, *args, **kwargs)
 
 
-class NotificacionListView(NotificacionPermisoMixin, ListView):
+class NotificacionListView(NotificacionPermisoMixin, PaginacionCursorMixin, ListView):
     model = Notificacion
     template_name = "PAGES/notificaciones/lista.html"
     context_object_name = "notificaciones"
     paginate_by = 20
+    orden_cursor = ("-fecha", "-id")
 
     def get_queryset(self):
         qs = Notificacion.objects.filter(
@@ -3706,13 +3459,11 @@ def marcar_notificacion_leida(request, notificacion_id):
         notificacion = get_object_or_404(Notificacion, id=notificacion_id)
         
         # Verificar permisos
-        if request.user.rol != 'admin' and notificacion.usuario != request.user:
+        if request.user.rol != 'admin' and notificacion.destinatario_id != request.user.id:
             return JsonResponse({'success': False, 'error': 'Sin permisos'})
         
-        # Marcar como leída
-        notificacion.leido = True
-        notificacion.fecha_leido = timezone.now()  # ← CORREGIDO
-        notificacion.save()
+        # Marcar como leída (la señal descuenta el contador del badge)
+        notificacion.marcar_como_leido()
         
         return JsonResponse({
             'success': True,
@@ -3766,6 +3517,12 @@ def marcar_todas_notificaciones_leidas(request):
             leido=True,
             fecha_leido=timezone.now()  # ← CORREGIDO
         )
+
+        # update() no emite señales: ajustar los contadores del badge
+        if user.rol == 'admin':
+            contador_notificaciones.invalidar_todos()
+        else:
+            contador_notificaciones.reiniciar(user.id)
         
         return JsonResponse({
             'success': True,
@@ -3785,10 +3542,7 @@ def marcar_todas_notificaciones_leidas(request):
 def notificaciones_count_ajax(request):
     """Obtener conteo de notificaciones no leídas (para el badge)"""
     try:
-        count = Notificacion.objects.filter(
-            destinatario=request.user,
-            leido=False
-        ).count()
+        count = contador_notificaciones.no_leidas(request.user.id)
         
         return JsonResponse({'count': count})
     except Exception as e:
@@ -3853,6 +3607,13 @@ def receta_pdf_view(request, receta_id):
 # ═══════════════════════════════════════════════════════════════
 
 def obtener_horarios_disponibles(request):
+    """
+    Rejilla de bloques de 30 minutos por médico para una fecha.
+
+    Trae los turnos del día y todas las citas de esos médicos en dos
+    consultas y las reparte en los bloques en memoria. Acepta
+    ``consultorio_id`` para limitarse a un consultorio.
+    """
     fecha_str = request.GET.get("fecha")
     if not fecha_str:
         return JsonResponse({"error": "Fecha no proporcionada"}, status=400)
@@ -3862,6 +3623,13 @@ def obtener_horarios_disponibles(request):
     except ValueError:
         return JsonResponse({"error": "Formato de fecha inválido"}, status=400)
 
+    consultorio_id = request.GET.get("consultorio_id")
+    if consultorio_id:
+        try:
+            consultorio_id = int(consultorio_id)
+        except ValueError:
+            return JsonResponse({"error": "Consultorio inválido"}, status=400)
+
     dias_map = {
         "monday": "lunes", "tuesday": "martes", "wednesday": "miércoles",
         "thursday": "jueves", "friday": "viernes",
@@ -3869,56 +3637,48 @@ def obtener_horarios_disponibles(request):
     }
     dia_semana = dias_map[fecha.strftime("%A").lower()]
     intervalo = timedelta(minutes=30)
-    horarios = []
 
-    for horario in HorarioMedico.objects.filter(dia=dia_semana):
-        medico = horario.medico
-        consultorio = horario.consultorio
-        hora_actual = datetime.combine(fecha, horario.hora_inicio)
-        hora_fin = datetime.combine(fecha, horario.hora_fin)
+    turnos = HorarioMedico.objects.filter(dia=dia_semana).select_related("medico", "consultorio")
+    if consultorio_id:
+        turnos = turnos.filter(consultorio_id=consultorio_id)
+    turnos = list(turnos)
 
-        citas = Cita.objects.filter(
-            medico_asignado=medico,
-            fecha_hora__date=fecha
-        )
+    # Una sola consulta para las citas de todos los médicos del día
+    ocupados = defaultdict(set)       # medico_id -> {"HH:MM", ...}
+    pacientes = defaultdict(dict)     # medico_id -> {"HH:MM": paciente de la primera cita que inicia ahí}
+    citas = Cita.objects.filter(
+        medico_asignado_id__in={t.medico_id for t in turnos},
+        fecha_hora__date=fecha,
+    ).values_list("medico_asignado_id", "fecha_hora", "duracion", "paciente__nombre_completo")
+    for medico_id, inicio, duracion, paciente in citas:
+        fin = inicio + timedelta(minutes=duracion)
+        bloque = inicio.replace(minute=(inicio.minute // 30) * 30, second=0, microsecond=0)
+        pacientes[medico_id].setdefault(bloque.strftime("%H:%M"), paciente)
+        while bloque < fin:
+            ocupados[medico_id].add(bloque.strftime("%H:%M"))
+            bloque += intervalo
 
-        bloques_ocupados = set()
-        for cita in citas:
-            inicio = cita.fecha_hora
-            fin = inicio + timedelta(minutes=cita.duracion)
-            bloque = inicio.replace(minute=(inicio.minute // 30) * 30, second=0, microsecond=0)
-            while bloque < fin:
-                bloques_ocupados.add(bloque.time().strftime("%H:%M"))
-                bloque += intervalo
+    horarios = []
+    for horario in turnos:
+        medico = horario.medico
+        cursor = datetime.combine(fecha, horario.hora_inicio)
+        hora_fin = datetime.combine(fecha, horario.hora_fin)
 
         bloques = []
-        cursor = hora_actual
         while cursor + intervalo <= hora_fin:
-            hora_str = cursor.time().strftime("%H:%M")
-            ocupado = hora_str in bloques_ocupados
-
-            paciente_nombre = None
-            if ocupado:
-                cita = Cita.objects.filter(
-                    medico_asignado=medico,
-                    fecha_hora__date=fecha,
-                    fecha_hora__time__gte=cursor.time(),
-                    fecha_hora__time__lt=(cursor + intervalo).time()
-                ).first()
-                if cita:
-                    paciente_nombre = cita.paciente.nombre_completo
-
+            hora_str = cursor.strftime("%H:%M")
+            ocupado = hora_str in ocupados[medico.id]
             bloques.append({
                 "hora": hora_str,
                 "ocupado": ocupado,
-                "paciente": paciente_nombre
+                "paciente": pacientes[medico.id].get(hora_str) if ocupado else None,
             })
             cursor += intervalo
 
         horarios.append({
             "medico_id": medico.id,
             "medico": medico.get_full_name(),
-            "consultorio": consultorio.nombre,
+            "consultorio": horario.consultorio.nombre,
             "bloques": bloques,
         })
 
@@ -3968,18 +3728,26 @@ def consultas_stats_ajax(request):
     if not consultorio:
         return JsonResponse({'error': 'No tienes consultorio asignado'}, status=400)
     
-    consultas = Consulta.objects.filter(medico__consultorio=consultorio)
+    clave = cache_consultorio.clave(
+        'consultas_stats_ajax', usuario, consultorio_id=consultorio.pk,
+        fecha=timezone.now().date(), ambitos=[],
+    )
+    totales = cache_consultorio.obtener_o_calcular(
+        clave,
+        lambda: estadisticas_consultas(
+            ResumenDiario.objects.filter(consultorio=consultorio),
+            Consulta.objects.filter(medico__consultorio=consultorio),
+        ),
+    )
     
     stats = {
-        'pendientes': consultas.filter(estado='espera').count(),
-        'en_progreso': consultas.filter(estado='en_progreso').count(),
-        'finalizadas': consultas.filter(estado='finalizada').count(),
-        'canceladas': consultas.filter(estado='cancelada').count(),
-        'total': consultas.count(),
-        'hoy': consultas.filter(fecha_creacion__date=timezone.now().date()).count(),
-        'esta_semana': consultas.filter(
-            fecha_creacion__gte=timezone.now() - timedelta(days=7)
-        ).count()
+        'pendientes': totales['espera'],
+        'en_progreso': totales['en_progreso'],
+        'finalizadas': totales['finalizada'],
+        'canceladas': totales['cancelada'],
+        'total': totales['total'],
+        'hoy': totales['hoy'],
+        'esta_semana': totales['semana'],
     }
     
     return JsonResponse(stats)
@@ -3994,37 +3762,55 @@ def dashboard_stats(request):
     if not consultorio:
         return JsonResponse({'error': 'No tienes consultorio asignado'}, status=400)
     
-    consultas = Consulta.objects.filter(medico__consultorio=consultorio)
+    clave = cache_consultorio.clave(
+        'dashboard_stats', usuario, consultorio_id=consultorio.pk,
+        fecha=timezone.now().date(), ambitos=[],
+    )
+    return JsonResponse(
+        cache_consultorio.obtener_o_calcular(clave, lambda: _dashboard_stats_data(consultorio))
+    )
+
+
+def _dashboard_stats_data(consultorio):
+    resumen = ResumenDiario.objects.filter(consultorio=consultorio)
+    totales = estadisticas_consultas(
+        resumen, Consulta.objects.filter(medico__consultorio=consultorio)
+    )
     
     stats = {
-        'total_consultas': consultas.count(),
-        'consultas_hoy': consultas.filter(fecha_creacion__date=timezone.now().date()).count(),
-        'consultas_pendientes': consultas.filter(estado='espera').count(),
-        'consultas_en_progreso': consultas.filter(estado='en_progreso').count(),
-        'consultas_finalizadas': consultas.filter(estado='finalizada').count(),
-        'consultas_canceladas': consultas.filter(estado='cancelada').count(),
+        'total_consultas': totales['total'],
+        'consultas_hoy': totales['hoy'],
+        'consultas_pendientes': totales['espera'],
+        'consultas_en_progreso': totales['en_progreso'],
+        'consultas_finalizadas': totales['finalizada'],
+        'consultas_canceladas': totales['cancelada'],
     }
     
+    # Un solo GROUP BY (médico, estado) sobre el resumen para todos los médicos
+    por_medico = defaultdict(lambda: defaultdict(int))
+    for fila in resumen.values('medico_id', 'estado').annotate(total=Sum('consultas')).order_by():
+        por_medico[fila['medico_id']][fila['estado']] += fila['total']
+    
     medicos_stats = []
     medicos = Usuario.objects.filter(rol='medico', consultorio=consultorio, is_active=True)
     
     for medico in medicos:
-        medico_consultas = consultas.filter(medico=medico)
+        conteos = por_medico[medico.pk]
         medicos_stats.append({
             'medico': medico.get_full_name(),
-            'total': medico_consultas.count(),
-            'pendientes': medico_consultas.filter(estado='espera').count(),
-            'en_progreso': medico_consultas.filter(estado='en_progreso').count(),
-            'finalizadas': medico_consultas.filter(estado='finalizada').count(),
+            'total': sum(conteos.values()),
+            'pendientes': conteos['espera'],
+            'en_progreso': conteos['en_progreso'],
+            'finalizadas': conteos['finalizada'],
         })
     
-    return JsonResponse({
+    return {
         'stats': stats,
         'medicos_stats': medicos_stats,
         'consultorio': {
             'nombre': consultorio.nombre if hasattr(consultorio, 'nombre') else str(consultorio),
         }
-    })
+    }
 
 
 @login_required
@@ -4032,27 +3818,23 @@ def dashboard_citas_stats(request):
     """Estadísticas específicas para citas en el dashboard"""
     user = request.user
     queryset = Cita.objects.all()
+    resumen = ResumenDiario.objects.all()
     
     if user.rol == 'medico':
         queryset = queryset.filter(medico_asignado=user)
+        resumen = resumen.filter(medico=user)
     elif user.rol == 'asistente' and user.consultorio:
         queryset = queryset.filter(consultorio=user.consultorio)
+        resumen = resumen.filter(consultorio=user.consultorio)
     
-    hoy = timezone.now().date()
-    
-    stats = {
-        'total_citas': queryset.count(),
-        'citas_hoy': queryset.filter(fecha_hora__date=hoy).count(),
-        'citas_pendientes': queryset.filter(estado__in=['programada', 'confirmada']).count(),
-        'citas_completadas': queryset.filter(estado='completada').count(),
-        'citas_canceladas': queryset.filter(estado='cancelada').count(),
-        'citas_en_espera': queryset.filter(estado='en_espera').count(),
-        'por_estado': dict(queryset.values('estado').annotate(count=Count('id')).values_list('estado', 'count')),
-        'por_tipo': dict(queryset.values('tipo_cita').annotate(count=Count('id')).values_list('tipo_cita', 'count')),
-        'por_prioridad': dict(queryset.values('prioridad').annotate(count=Count('id')).values_list('prioridad', 'count')),
-    }
-    
-    return JsonResponse(stats)
+    clave = cache_consultorio.clave(
+        'dashboard_citas_stats', user,
+        consultorio_id=user.consultorio_id if user.rol == 'asistente' else None,
+        fecha=timezone.now().date(),
+    )
+    return JsonResponse(
+        cache_consultorio.obtener_o_calcular(clave, lambda: estadisticas_citas(resumen, queryset))
+    )
 
 
 class ConsultaCancelarView(LoginRequiredMixin, View):
@@ -4124,10 +3906,12 @@ class CitaListView(CitaPermisoMixin, ListView):
     model = Cita
     template_name = 'PAGES/citas/lista.html'
     context_object_name = 'citas'
-    paginate_by = 20
+    # La plantilla muestra una pestaña por grupo: se pagina cada una por cursor
+    por_pagina = 20
+    orden_cursor = ('fecha_hora', 'id')
 
     def get_queryset(self):
-        marcar_citas_vencidas()
+        # Las citas vencidas las marca el barrido (citas_vencidas), no la lista
         user = self.request.user
 
         # 1. Filtrar por consultorio del usuario / 5. Admin ve todas, otros solo su consultorio
@@ -4139,23 +3923,7 @@ class CitaListView(CitaPermisoMixin, ListView):
             queryset = Cita.objects.none()
 
         # Aplicar filtros del formulario
-        filtro_form = CitaFiltroForm(self.request.GET, user=user)
-        if filtro_form.is_valid():
-            cd = filtro_form.cleaned_data
-            
-            if cd.get('buscar'):
-                queryset = queryset.filter(
-                    Q(paciente__nombre_completo__icontains=cd['buscar']) |
-                    Q(numero_cita__icontains=cd['buscar']) |
-                    Q(motivo__icontains=cd['buscar'])
-                )
-            
-            if cd.get('fecha'):
-                queryset = queryset.filter(fecha_hora__date=cd['fecha'])
-            if cd.get('estado'):
-                queryset = queryset.filter(estado=cd['estado'])
-            if cd.get('medico'):
-                queryset = queryset.filter(medico_asignado=cd['medico'])
+        queryset = CitaFiltroForm(self.request.GET, user=user).filtrar(queryset)
 
         return queryset.select_related(
             'paciente', 'consultorio', 'medico_asignado', 'medico_preferido'
@@ -4222,7 +3990,13 @@ class CitaListView(CitaPermisoMixin, ListView):
 
         context.update({
             'filtro_form': CitaFiltroForm(self.request.GET, user=user),
-            'grupos': grupos,
+            'grupos': paginar_grupos(grupos, self.orden_cursor, self.request.GET, self.por_pagina),
+            'conteos': {
+                'sin_asignar': stats['sin_asignar'],
+                'asignadas': stats['asignadas'],
+                'completadas': stats['completadas'],
+                'canceladas': grupos['canceladas'].count(),
+            },
             'stats': stats,
             'citas_urgentes': citas_urgentes,
             'permisos': permisos,
@@ -4352,26 +4126,23 @@ def ajax_dashboard_stats(request):
     
     if user.rol == 'admin':
         citas = Cita.objects.all()
+        resumen = ResumenDiario.objects.all()
     elif user.rol in ('medico', 'asistente'):
         citas = Cita.objects.filter(consultorio=user.consultorio)
+        resumen = ResumenDiario.objects.filter(consultorio=user.consultorio)
     else:
         citas = Cita.objects.none()
+        resumen = ResumenDiario.objects.none()
     
-    hoy = timezone.now().date()
-    
-    stats = {
-        'total_citas': citas.count(),
-        'citas_hoy': citas.filter(fecha_hora__date=hoy).count(),
-        'citas_pendientes': citas.filter(estado__in=['programada', 'confirmada']).count(),
-        'citas_completadas': citas.filter(estado='completada').count(),
-        'citas_canceladas': citas.filter(estado='cancelada').count(),
-        'citas_en_espera': citas.filter(estado='en_espera').count(),
-        'por_estado': dict(citas.values('estado').annotate(count=Count('id')).values_list('estado', 'count')),
-        'por_tipo': dict(citas.values('tipo_cita').annotate(count=Count('id')).values_list('tipo_cita', 'count')),
-        'por_prioridad': dict(citas.values('prioridad').annotate(count=Count('id')).values_list('prioridad', 'count')),
-    }
-    
-    return JsonResponse(stats)
+    clave = cache_consultorio.clave(
+        'ajax_dashboard_stats', user,
+        consultorio_id=user.consultorio_id if user.rol != 'admin' else None,
+        fecha=timezone.now().date(),
+        ambitos=[] if user.rol != 'admin' else None,
+    )
+    return JsonResponse(
+        cache_consultorio.obtener_o_calcular(clave, lambda: estadisticas_citas(resumen, citas))
+    )
 
 
 class CitaPermisoMixin(UserPassesTestMixin):
@@ -4442,25 +4213,14 @@ class CitaCreateView(NextRedirectMixin, CitaPermisoMixin, CreateView):
             )
             return self.form_invalid(form)
         
-        # Validar conflictos de horario en el consultorio
-        conflictos = Cita.objects.filter(
-            consultorio=cita.consultorio,
-            fecha_hora__date=cita.fecha_hora.date(),
-            fecha_hora__time=cita.fecha_hora.time(),
-            estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']
-        ).exclude(pk=cita.pk if cita.pk else None)
-        
-        if conflictos.exists():
-            messages.warning(
-                self.request,
-                f'Ya existe una cita programada en {cita.consultorio.nombre} '
-                f'para {cita.fecha_hora.strftime("%d/%m/%Y a las %H:%M")}. '
-                f'Se creará como cita adicional.'
-            )
-        
-        # Asignar usuario creador
+        # Asignar usuario creador y reservar con bloqueo de la agenda del día
         cita.creado_por = user
-        cita.save()
+        try:
+            reservar_cita(cita)
+        except HorarioOcupado as e:
+            form.add_error(None, f"Conflicto de horario detectado: {e.message}")
+            return self.form_invalid(form)
+        self.object = cita
         
         messages.success(
             self.request, 
@@ -4468,7 +4228,7 @@ class CitaCreateView(NextRedirectMixin, CitaPermisoMixin, CreateView):
             f'Los médicos del consultorio podrán tomarla.'
         )
         
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
         if self.request.user.rol == "asistente":
@@ -4533,8 +4293,14 @@ class CitaUpdateView(NextRedirectMixin, CitaPermisoMixin, UpdateView):
         return False
 
     def form_valid(self, form):
+        try:
+            self.object = form.save()
+        except HorarioOcupado as e:
+            # Otra reserva ocupó el horario después de validar el formulario
+            form.add_error(None, f"Conflicto de horario detectado: {e.message}")
+            return self.form_invalid(form)
         messages.success(self.request, f'Cita {self.object.numero_cita} actualizada exitosamente.')
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -15,9 +15,14 @@ from datetime import datetime, timedelta, time
 import json
 import csv
 from consultorio_API.utils_horarios import obtener_horarios_disponibles_para_select
+from .disponibilidad import proximos_huecos
+from .reservas import HorarioOcupado, reservar_cita
+from .exportacion import exportar_citas
+from .paginacion import paginar_grupos
 from django.urls import reverse_lazy
 from .utils import redirect_next
 from .views import NextRedirectMixin
+from . import cache_consultorio
 from django.views.decorators.http import require_POST
 
 # Importaciones de modelos
@@ -139,10 +144,9 @@ def lista_citas(request):
         'canceladas': citas.filter(estado__in=['cancelada', 'no_asistio']),
     }
     
-    # Paginación
-    paginator = Paginator(citas, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Una página por pestaña, por cursor (sin OFFSET)
+    conteos = {nombre: qs.count() for nombre, qs in grupos.items()}
+    grupos = paginar_grupos(grupos, ('fecha_hora', 'id'), request.GET, 20)
     
     # Permisos
     permisos = {
@@ -165,10 +169,10 @@ def lista_citas(request):
         medicos_disponibles = Usuario.objects.none()
     
     context = {
-        'page_obj': page_obj,
         'filtro_form': filtro_form,
         'stats': stats,
         'grupos': grupos,
+        'conteos': conteos,
         'permisos': permisos,
         'medicos_disponibles': medicos_disponibles,
         'usuario': user,
@@ -200,18 +204,11 @@ def crear_cita(request):
                 elif request.user.rol == 'medico' and request.user.consultorio:
                     cita.consultorio = request.user.consultorio
                 
-                # Validar conflictos de horario antes de guardar
-                conflictos = validar_conflictos_horario(
-                    cita.consultorio,
-                    cita.fecha_hora,
-                    cita.duracion,
-                    excluir_cita_id=None
-                )
-                
-                if conflictos:
-                    form.add_error(None, f"Conflicto de horario detectado: {conflictos}")
+                try:
+                    reservar_cita(cita)
+                except HorarioOcupado as e:
+                    form.add_error(None, f"Conflicto de horario detectado: {e.message}")
                 else:
-                    cita.save()
                     messages.success(request, f'Cita {cita.numero_cita} creada exitosamente.')
                     
                     # Crear notificación para médicos del consultorio
@@ -266,19 +263,11 @@ def editar_cita(request, cita_id):
             cita_editada = form.save(commit=False)
             cita_editada.actualizado_por = request.user
 
-            conflictos = validar_conflictos_horario(
-                cita_editada.consultorio,
-                cita_editada.fecha_hora,
-                cita_editada.duracion,
-                excluir_cita_id=cita.id,
-            )
-            if conflictos:
-                form.add_error(
-                    None,
-                    f"Conflicto de horario detectado: {conflictos}",
-                )
+            try:
+                reservar_cita(cita_editada)
+            except HorarioOcupado as e:
+                form.add_error(None, f"Conflicto de horario detectado: {e.message}")
             else:
-                cita_editada.save()
                 messages.success(
                     request,
                     f"Cita {cita.numero_cita} actualizada correctamente.",
@@ -368,9 +357,13 @@ def reprogramar_cita(request, cita_id):
     if request.method == 'POST':
         form = ReprogramarCitaForm(request.POST, cita=cita)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Cita reprogramada correctamente.')
-            return redirect_next(request, 'citas_detalle', pk=cita.id)
+            try:
+                form.save()
+            except HorarioOcupado as e:
+                form.add_error(None, f"Conflicto de horario detectado: {e.message}")
+            else:
+                messages.success(request, 'Cita reprogramada correctamente.')
+                return redirect_next(request, 'citas_detalle', pk=cita.id)
     else:
         form = ReprogramarCitaForm(cita=cita)
 
@@ -980,30 +973,40 @@ def citas_calendario_data(request):
             except ValueError:
                 pass
         
-        # Preparar datos para FullCalendar
-        events = []
-        for cita in citas.select_related('paciente', 'consultorio', 'medico_asignado'):
-            color = get_color_by_estado(cita.estado)
+        # Preparar datos para FullCalendar (cacheado por rol, consultorio y rango)
+        def _eventos():
+            events = []
+            for cita in citas.select_related('paciente', 'consultorio', 'medico_asignado'):
+                color = get_color_by_estado(cita.estado)
             
-            events.append({
-                'id': str(cita.id),
-                'title': f"{cita.paciente.nombre_completo}",
-                'start': cita.fecha_hora.isoformat(),
-                'end': (cita.fecha_hora + timedelta(minutes=cita.duracion)).isoformat(),
-                'backgroundColor': color,
-                'borderColor': color,
-                'extendedProps': {
-                    'numero_cita': cita.numero_cita,
-                    'paciente': cita.paciente.nombre_completo,
-                    'consultorio': cita.consultorio.nombre,
-                    'medico': cita.medico_asignado.get_full_name() if cita.medico_asignado else 'Sin asignar',
-                    'estado': cita.get_estado_display(),
-                    'motivo': cita.motivo or '',
-                    'telefono': cita.telefono_contacto or '',
-                    'duracion': cita.duracion,
-                    'sin_medico': not cita.medico_asignado,
-                }
-            })
+                events.append({
+                    'id': str(cita.id),
+                    'title': f"{cita.paciente.nombre_completo}",
+                    'start': cita.fecha_hora.isoformat(),
+                    'end': (cita.fecha_hora + timedelta(minutes=cita.duracion)).isoformat(),
+                    'backgroundColor': color,
+                    'borderColor': color,
+                    'extendedProps': {
+                        'numero_cita': cita.numero_cita,
+                        'paciente': cita.paciente.nombre_completo,
+                        'consultorio': cita.consultorio.nombre,
+                        'medico': cita.medico_asignado.get_full_name() if cita.medico_asignado else 'Sin asignar',
+                        'estado': cita.get_estado_display(),
+                        'motivo': cita.motivo or '',
+                        'telefono': cita.telefono_contacto or '',
+                        'duracion': cita.duracion,
+                        'sin_medico': not cita.medico_asignado,
+                    }
+                })
+            return events
+
+        clave = cache_consultorio.clave(
+            'citas_calendario_data', user,
+            consultorio_id=consultorio_id,
+            ambitos=[] if consultorio_id else None,
+            medico=medico_id, start=start, end=end,
+        )
+        events = cache_consultorio.obtener_o_calcular(clave, _eventos)
         
         return JsonResponse(events, safe=False)
         
@@ -1029,6 +1032,15 @@ def ajax_horarios_disponibles(request):
         fecha    = request.GET.get("fecha")
         duracion = int(request.GET.get("duracion", 30))
         cita_id  = request.GET.get("cita_id")
+        mid      = request.GET.get("medico_id") or request.GET.get("medico")
+
+        medico = None
+        if mid:
+            try:
+                medico = Usuario.objects.get(pk=int(mid), rol="medico")
+            except (Usuario.DoesNotExist, ValueError):
+                return JsonResponse({"error": "Médico no encontrado"}, status=404)
+            cid = cid or medico.consultorio_id
 
         if not (cid and fecha):
             return JsonResponse({"error": "Faltan parámetros"}, status=400)
@@ -1044,9 +1056,82 @@ def ajax_horarios_disponibles(request):
             return JsonResponse({"error": "Formato de fecha inválido"}, status=400)
 
         horarios = obtener_horarios_disponibles_para_select(
-            consultorio, fecha_obj, duracion, cita_id
+            consultorio, fecha_obj, duracion, cita_id, medico=medico
+        )
+
+        return JsonResponse(
+            {"success": True, "total": len(horarios), "horarios": horarios}
         )
 
+    except Exception as exc:
+        return JsonResponse({"error": str(exc)}, status=500)
+
+
+# Límites del buscador de próximos horarios
+MAX_HUECOS = 50
+MAX_DIAS_BUSQUEDA = 90
+
+
+@login_required
+@require_http_methods(["GET"])
+def ajax_proximos_horarios(request):
+    """
+    Próximos horarios libres en las semanas siguientes (una sola consulta).
+
+    Parámetros: consultorio_id y/o medico_id, duracion, desde (AAAA-MM-DD,
+    por defecto hoy), n (default 10), paso (default 15), dias (default 28).
+
+    Devuelve:
+      {success: True,
+       total:   10,
+       horarios:[{fecha, hora, value, text}, …]}
+    """
+    try:
+        cid = request.GET.get("consultorio_id")
+        mid = request.GET.get("medico_id")
+        try:
+            duracion = int(request.GET.get("duracion", 30))
+            cantidad = min(int(request.GET.get("n", 10)), MAX_HUECOS)
+            paso = int(request.GET.get("paso", 15))
+            dias = min(int(request.GET.get("dias", 28)), MAX_DIAS_BUSQUEDA)
+        except ValueError:
+            return JsonResponse({"error": "Parámetros numéricos inválidos"}, status=400)
+        if min(duracion, cantidad, paso, dias) <= 0:
+            return JsonResponse({"error": "Parámetros numéricos inválidos"}, status=400)
+
+        medico = None
+        if mid:
+            try:
+                medico = Usuario.objects.get(pk=int(mid), rol="medico")
+            except (Usuario.DoesNotExist, ValueError):
+                return JsonResponse({"error": "Médico no encontrado"}, status=404)
+            cid = cid or medico.consultorio_id
+
+        if not cid:
+            return JsonResponse({"error": "Faltan parámetros"}, status=400)
+        try:
+            consultorio = Consultorio.objects.get(pk=int(cid))
+        except (Consultorio.DoesNotExist, ValueError):
+            return JsonResponse({"error": "Consultorio no encontrado"}, status=404)
+
+        desde = request.GET.get("desde")
+        try:
+            desde = datetime.strptime(desde, "%Y-%m-%d").date() if desde else timezone.now().date()
+        except ValueError:
+            return JsonResponse({"error": "Formato de fecha inválido"}, status=400)
+
+        huecos = proximos_huecos(
+            consultorio, duracion, desde, cantidad, medico=medico, paso=paso, dias=dias
+        )
+        horarios = [
+            {
+                "fecha": h.inicio.date().isoformat(),
+                "hora": h.inicio.strftime("%H:%M"),
+                "value": h.inicio.strftime("%Y-%m-%dT%H:%M"),
+                "text": h.inicio.strftime("%d/%m/%Y %I:%M %p"),
+            }
+            for h in huecos
+        ]
         return JsonResponse(
             {"success": True, "total": len(horarios), "horarios": horarios}
         )
@@ -1218,66 +1303,9 @@ def cambiar_estado_cita(request, cita_id):
 
 @login_required
 def exportar_citas_csv(request):
-    """Exportar citas a CSV - CORREGIDA"""
+    """Exportar citas a CSV o JSONL (streaming)"""
     try:
-        user = request.user
-        
-        # Filtrar citas según rol
-        if user.rol == 'admin':
-            citas = Cita.objects.all()
-        elif user.rol == 'medico':
-            citas = Cita.objects.filter(
-                Q(consultorio=user.consultorio) | Q(medico_asignado=user)
-            )
-        elif user.rol == 'asistente':
-            citas = Cita.objects.filter(consultorio=user.consultorio)
-        else:
-            citas = Cita.objects.none()
-        
-        # Aplicar filtros de fecha si existen
-        fecha_desde = request.GET.get('fecha_desde')
-        fecha_hasta = request.GET.get('fecha_hasta')
-        
-        if fecha_desde:
-            try:
-                fecha = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                citas = citas.filter(fecha_hora__date__gte=fecha)
-            except ValueError:
-                pass
-        
-        if fecha_hasta:
-            try:
-                fecha = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                citas = citas.filter(fecha_hora__date__lte=fecha)
-            except ValueError:
-                pass
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="citas_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Número Cita', 'Paciente', 'Consultorio', 'Médico Asignado', 'Médico Preferido',
-            'Fecha y Hora', 'Duración', 'Estado', 'Tipo', 'Prioridad', 'Motivo'
-        ])
-        
-        for cita in citas.select_related('paciente', 'consultorio', 'medico_asignado', 'medico_preferido'):
-            writer.writerow([
-                cita.numero_cita,
-                cita.paciente.nombre_completo,
-                cita.consultorio.nombre if cita.consultorio else '',
-                cita.medico_asignado.get_full_name() if cita.medico_asignado else 'Sin asignar',
-                cita.medico_preferido.get_full_name() if cita.medico_preferido else '',
-                cita.fecha_hora.strftime('%d/%m/%Y %H:%M'),
-                f"{cita.duracion} min",
-                cita.get_estado_display(),
-                cita.get_tipo_cita_display(),
-                cita.get_prioridad_display(),
-                cita.motivo or ''
-            ])
-        
-        return response
-        
+        return exportar_citas(request)
     except Exception as e:
         messages.error(request, f'Error al exportar: {str(e)}')
 
@@ -1365,36 +1393,6 @@ def get_color_by_estado(estado):
     return colors.get(estado, '#6c757d')
 
 
-def validar_conflictos_horario(consultorio, fecha_hora, duracion, excluir_cita_id=None):
-    """Valida si hay conflictos de horario para una cita"""
-    try:
-        inicio_cita = fecha_hora
-        fin_cita = fecha_hora + timedelta(minutes=duracion)
-        
-        # Buscar citas que se solapen en el mismo consultorio
-        citas_existentes = Cita.objects.filter(
-            consultorio=consultorio,
-            fecha_hora__date=fecha_hora.date(),
-            estado__in=['programada', 'confirmada', 'en_espera', 'en_atencion', 'reprogramada']
-        )
-        
-        if excluir_cita_id:
-            citas_existentes = citas_existentes.exclude(id=excluir_cita_id)
-        
-        for cita_existente in citas_existentes:
-            inicio_existente = cita_existente.fecha_hora
-            fin_existente = cita_existente.fecha_hora + timedelta(minutes=cita_existente.duracion)
-            
-            # Verificar solapamiento
-            if (inicio_cita < fin_existente and fin_cita > inicio_existente):
-                return f"Se solapa con cita de {cita_existente.paciente.nombre_completo} de {inicio_existente.strftime('%H:%M')} a {fin_existente.strftime('%H:%M')}"
-        
-        return None
-        
-    except Exception as e:
-        return f"Error al validar conflictos: {str(e)}"
-
-
 def crear_notificacion_nueva_cita(cita):
     """Crea notificación para médicos del consultorio sobre nueva cita"""
     try:
@@ -3,6 +3,11 @@ ASGI config for consultorio_medico project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las actualizaciones en vivo de la cola virtual (``cola_virtual_eventos``,
+Server-Sent Events) mantienen la conexión abierta; sírvalas con este
+callable, p. ej. ``uvicorn consultorio_medico.asgi:application``. El
+pub/sub de la cola vive en memoria, así que use un solo proceso.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
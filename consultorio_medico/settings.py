@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -109,6 +110,96 @@ REST_FRAMEWORK = {
 }
 
 
+# Cache
+# Por defecto, caché en archivos: la comparten todos los procesos del mismo
+# servidor. En producción con varios servidores apunte a un backend
+# compartido, p. ej.:
+#   CONSULTORIO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CONSULTORIO_CACHE_LOCATION=redis://127.0.0.1:6379/1
+#   CONSULTORIO_CACHE_GENERACIONES_LOCATION=redis://127.0.0.1:6379/2
+
+_CACHE_BACKEND = os.environ.get(
+    'CONSULTORIO_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'CONSULTORIO_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache'),
+        ),
+    },
+    # Generaciones de invalidación de la caché de dashboard/cola: pocas
+    # claves, sin expiración y fuera del descarte por MAX_ENTRIES de 'default'
+    'generaciones': {
+        'BACKEND': _CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'CONSULTORIO_CACHE_GENERACIONES_LOCATION',
+            os.path.join(BASE_DIR, 'cache_generaciones'),
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+CONSULTORIO_CACHE_GENERACIONES_ALIAS = 'generaciones'
+
+# Segundos que viven las respuestas cacheadas de dashboard/cola; además se
+# invalidan al guardar citas o consultas del consultorio.
+CONSULTORIO_CACHE_TIMEOUT = 300
+
+# Segundos que vive el contador de notificaciones no leídas de cada usuario
+# (se ajusta al crear/leer notificaciones; al expirar se recuenta)
+NOTIFICACIONES_CONTADOR_TTL = 3600
+
+# Días que se conservan las notificaciones leídas. Purgar fuera de horario:
+#   0 3 * * * python manage.py purgar_notificaciones --hasta 07:00
+NOTIFICACIONES_RETENCION_DIAS = 30
+
+# Modo resumen por rol: segundos de ventana en que los eventos del mismo grupo
+# (p. ej. citas nuevas de un consultorio) se acumulan en una sola notificación
+# sin leer ("12 nuevas citas en Consultorio A"). 0 o ausente: una por evento.
+NOTIFICACIONES_RESUMEN = {
+    'admin': 3600,
+    'asistente': 0,
+    'medico': 0,
+}
+
+# Recordatorios de citas: horas de anticipación con que se avisa (uno por
+# cada una) y segundos entre pasadas de ``enviar_recordatorios --bucle``.
+RECORDATORIOS_ANTICIPACION_HORAS = (24, 2)
+RECORDATORIOS_INTERVALO = 300
+
+# Cola virtual en vivo (SSE) bajo WSGI: cada pestaña abierta ocupa un worker
+# (o hilo) mientras dura el stream, así que sólo se activa por defecto con
+# runserver. Con False la vista responde 204 y las páginas usan el sondeo
+# periódico (bajo ASGI siempre hay stream). Fuerce con COLA_SSE_WSGI=1/0.
+_RUNSERVER = len(sys.argv) > 1 and sys.argv[1] == 'runserver'
+COLA_SSE_WSGI = os.environ.get('COLA_SSE_WSGI', '1' if _RUNSERVER else '0') == '1'
+
+# Segundos entre barridos de citas vencidas dentro del proceso web (hilo en
+# segundo plano). Ponga 0 si se ejecuta por cron:
+#   */5 * * * * python manage.py marcar_citas_vencidas
+CITAS_VENCIDAS_INTERVALO = int(os.environ.get('CITAS_VENCIDAS_INTERVALO', '300'))
+# El hilo sólo arranca con runserver. En otro servidor (gunicorn, waitress...)
+# actívelo con CITAS_VENCIDAS_EN_PROCESO=1 en un único proceso, o use el cron.
+CITAS_VENCIDAS_EN_PROCESO = os.environ.get('CITAS_VENCIDAS_EN_PROCESO', '0') == '1'
+
+# Auditoría diferida: los registros se insertan por lotes desde un hilo en
+# segundo plano en lugar de dentro de cada petición (ver auditoria_cola.py).
+AUDITORIA_ASINCRONA = os.environ.get('AUDITORIA_ASINCRONA', '1') == '1'
+AUDITORIA_LOTE = 200          # filas por bulk_create
+AUDITORIA_INTERVALO = 2.0     # segundos máximos que espera una fila en la cola
+AUDITORIA_ESTADISTICAS_TTL = 60  # segundos que dura el resumen del panel
+
+# Archivos mensuales (JSONL comprimido) de la auditoría antigua:
+#   python manage.py archivar_auditoria --meses 12
+AUDITORIA_ARCHIVO_DIR = os.environ.get(
+    'AUDITORIA_ARCHIVO_DIR', os.path.join(BASE_DIR, 'archivo_auditoria')
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -179,3 +270,6 @@ TEMPLATES[0]["OPTIONS"]["context_processors"].append(
 
 from pathlib import Path
 CATALOGO_EXCEL_PATH = Path(BASE_DIR) / "Catalogo de Artículos.xlsx"
+# Catálogo ya parseado que comparten los workers. Por defecto, junto al Excel
+# ("<excel>.catalogo.sqlite3"); se regenera solo cuando el Excel cambia.
+CATALOGO_COMPILADO_PATH = None
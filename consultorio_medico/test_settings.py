@@ -10,3 +10,17 @@ DATABASES = {
 MIGRATION_MODULES = {
     'consultorio_API': None,
 }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'generaciones': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'generaciones',
+    },
+}
+
+CITAS_VENCIDAS_INTERVALO = 0
+
+AUDITORIA_ASINCRONA = False
@@ -0,0 +1,55 @@
+// Actualizaciones en vivo de la cola virtual (Server-Sent Events)
+//
+// escucharCola(url, alCambiar, respaldoMs) abre un EventSource contra
+// cola_virtual_eventos y llama a alCambiar(delta) con cada delta recibido.
+// Mientras el stream no está abierto (sin soporte de SSE, error, conexión
+// que no abre en ESPERA_APERTURA_MS) usa el sondeo periódico llamando a
+// alCambiar(null) cada respaldoMs. Con el stream abierto el sondeo sigue,
+// más lento (cada respaldoMs * FACTOR_SONDEO_ABIERTO): los deltas sólo llegan
+// de cambios hechos en el mismo proceso del servidor, no de otros workers ni
+// del barrido de citas vencidas por cron.
+
+const ESPERA_APERTURA_MS = 5000;
+const FACTOR_SONDEO_ABIERTO = 5;
+
+function escucharCola(url, alCambiar, respaldoMs) {
+  let sondeo = null;
+
+  function iniciarSondeo(ms) {
+    clearInterval(sondeo);
+    sondeo = setInterval(() => alCambiar(null), ms);
+  }
+
+  if (!window.EventSource) {
+    iniciarSondeo(respaldoMs);
+    return;
+  }
+
+  const fuente = new EventSource(url, { withCredentials: true });
+  let abierto = false;
+  const sinApertura = setTimeout(() => iniciarSondeo(respaldoMs), ESPERA_APERTURA_MS);
+  fuente.addEventListener('open', () => {
+    clearTimeout(sinApertura);
+    abierto = true;
+    iniciarSondeo(respaldoMs * FACTOR_SONDEO_ABIERTO);
+  });
+  fuente.addEventListener('cola', event => {
+    alCambiar(JSON.parse(event.data));
+  });
+  fuente.addEventListener('error', () => {
+    // Se reconecta solo (o quedó CLOSED): mientras tanto, sondeo normal
+    if (abierto || !sondeo) {
+      abierto = false;
+      iniciarSondeo(respaldoMs);
+    }
+  });
+}
+
+// Agrupa varios deltas seguidos en una sola recarga
+function recargaDiferida(ms) {
+  let pendiente = null;
+  return () => {
+    clearTimeout(pendiente);
+    pendiente = setTimeout(() => window.location.reload(), ms);
+  };
+}